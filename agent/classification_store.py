@@ -0,0 +1,107 @@
+"""Web-presence classifications kept per ABN, shared across sessions and workers.
+
+`classify_business_from_web` asks Haiku whether a business is a trade and
+which categories it fits, from its Google listing, reviews and website
+excerpt. The same ABN comes through again on retries, in improve mode after
+onboarding and when support replays a session, with unchanged signals. The
+result is stored against the ABN with a hash of those signals (and of the
+category list and classifier version), so the next session answers from the
+store. When the signals change, the hash no longer matches and the business
+is classified afresh, replacing the stored row.
+
+One SQLite file (CLASSIFICATION_DB_PATH) serves every worker on the host;
+rows older than CLASSIFICATION_TTL_DAYS are ignored and overwritten.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from agent.config import CLASSIFICATION_DB_PATH, CLASSIFICATION_TTL_DAYS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    abn        TEXT PRIMARY KEY,
+    signals    TEXT NOT NULL,
+    result     TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def signals_hash(*parts: str) -> str:
+    """Hash of the classifier inputs; any change means the stored result no longer applies."""
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def normalise_abn(abn: str) -> str:
+    return "".join(ch for ch in abn or "" if ch.isdigit())
+
+
+class ClassificationStore:
+    """Latest classification per ABN. Thread-safe; one shared connection."""
+
+    def __init__(self, path: str | Path, ttl_seconds: float):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None,
+                                     timeout=5)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def get(self, abn: str, signals: str) -> dict | None:
+        """The stored result for `abn` if it was made from the same signals and hasn't expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM classifications WHERE abn = ? AND signals = ? AND updated_at > ?",
+                (abn, signals, time.time() - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, abn: str, signals: str, result: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO classifications (abn, signals, result, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(abn) DO UPDATE SET signals = excluded.signals, result = excluded.result, "
+                "updated_at = excluded.updated_at",
+                (abn, signals, json.dumps(result), time.time()),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+
+_store: ClassificationStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ClassificationStore | None:
+    """The process's ClassificationStore; None when CLASSIFICATION_DB_PATH is unset or unusable."""
+    global _store
+    if not CLASSIFICATION_DB_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ClassificationStore(CLASSIFICATION_DB_PATH, CLASSIFICATION_TTL_DAYS * 86400)
+            except sqlite3.Error as e:
+                logger.warning(f"[CLASSIFY] Store at {CLASSIFICATION_DB_PATH} unavailable: {e}")
+                return None
+    return _store
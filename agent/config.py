@@ -28,6 +28,81 @@ SS_API_TOKEN = os.getenv("SS_API_TOKEN", "") or os.getenv("SERVICE_SEEKING_API_T
 SS_API_URL = os.getenv("SS_API_URL", "") or os.getenv("SERVICE_SEEKING_API_URL", "")
 SS_API_BASIC_AUTH = os.getenv("SS_API_BASIC_AUTH", "") or os.getenv("SERVICE_SEEKING_API_BASIC_AUTH", "")
 
+# Upstream base URLs — point these at scripts/fixture_server.py for offline, deterministic runs
+ABR_BASE_URL = os.getenv("ABR_BASE_URL", "https://abr.business.gov.au").rstrip("/")
+NSW_TRADES_BASE_URL = os.getenv("NSW_TRADES_BASE_URL", "https://api.onegov.nsw.gov.au").rstrip("/")
+GOOGLE_PLACES_BASE_URL = os.getenv("GOOGLE_PLACES_BASE_URL", "https://places.googleapis.com").rstrip("/")
+BRAVE_SEARCH_BASE_URL = os.getenv("BRAVE_SEARCH_BASE_URL", "https://api.search.brave.com").rstrip("/")
+VBA_BASE_URL = os.getenv("VBA_BASE_URL", "https://bams.vba.vic.gov.au").rstrip("/")
+WA_DMIRS_BASE_URL = os.getenv("WA_DMIRS_BASE_URL", "https://occupationallicensing.dmirs.wa.gov.au").rstrip("/")
+
+# Session storage — "memory" (single worker), "sqlite" (workers on one host), "redis" (shared)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.sqlite")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Rate limit counters — "memory" (per worker) or "redis" (shared via REDIS_URL)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+# Uploaded images (content-addressed; must be shared storage when running several hosts)
+BLOB_DIR = os.getenv("BLOB_DIR", "data/blobs")
+BLOB_RETENTION_DAYS = float(os.getenv("BLOB_RETENTION_DAYS", "7"))
+
+# Multi-worker mode: uvicorn forks WEB_CONCURRENCY workers. Large read-only datasets then belong in
+# one memory-mapped file shared by all of them (agent/shared_data.py); "" = per-process dicts
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+SHARED_DATA_PATH = os.getenv("SHARED_DATA_PATH", "")
+
+# Background enrichment of the top N ABR candidates while the user picks one (0 = off, the default).
+# Opt-in: every candidate costs the full set of paid Google Places/Brave/LLM calls, wasted when the
+# user picks a different business
+ENRICH_SPECULATIVE_CANDIDATES = int(os.getenv("ENRICH_SPECULATIVE_CANDIDATES", "0"))
+
+# Turn logs (logs/{session_id}.jsonl) — rotated into numbered segments by size or idleness
+TURN_LOG_MAX_BYTES = int(os.getenv("TURN_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+TURN_LOG_ROTATE_IDLE_SECONDS = float(os.getenv("TURN_LOG_ROTATE_IDLE_SECONDS", "3600"))
+TURN_LOG_COMPRESS = os.getenv("TURN_LOG_COMPRESS", "1") == "1"
+
+# LLM calls: "live", "record" (save responses) or "replay" (answer from saved responses)
+LLM_MODE = os.getenv("LLM_MODE", "live")
+LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "data/llm_cassette")
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "0")  # seconds, or "recorded"
+
+# LLM response cache for calls made with llm_cache=True: in-memory LRU entries, their
+# lifetime in seconds, and an optional directory shared by workers and restarts
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+
+# Web-presence classifications stored per ABN (agent/classification_store.py); "" = off
+CLASSIFICATION_DB_PATH = os.getenv("CLASSIFICATION_DB_PATH", "data/classifications.sqlite")
+CLASSIFICATION_TTL_DAYS = float(os.getenv("CLASSIFICATION_TTL_DAYS", "30"))
+
+# Event-loop watchdog: log and count stalls longer than this (0 = off)
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+
+# Admission control: chat turns in flight at once, how many may queue and for how long (then 503)
+MAX_INFLIGHT_TURNS = int(os.getenv("MAX_INFLIGHT_TURNS", "32"))
+TURN_QUEUE_MAX = int(os.getenv("TURN_QUEUE_MAX", "64"))
+TURN_QUEUE_TIMEOUT = float(os.getenv("TURN_QUEUE_TIMEOUT", "10"))
+
+# Per-upstream concurrency budgets (agent/limits.py): "service=n,..." over UPSTREAM_DEFAULT_LIMIT.
+# Services: abr, nsw, google, brave, vba, wa, ss, web (website probes/scrapes), anthropic (LLM)
+UPSTREAM_DEFAULT_LIMIT = int(os.getenv("UPSTREAM_DEFAULT_LIMIT", "16"))
+UPSTREAM_LIMITS = {
+    name.strip(): int(n)
+    for name, _, n in (
+        item.partition("=") for item in os.getenv(
+            "UPSTREAM_LIMITS", "google=24,brave=8,vba=4,wa=4,web=32,anthropic=24",
+        ).split(",")
+    )
+    if name.strip() and n.strip()
+}
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+
+# Response compression (gzip, or brotli when installed) for bodies of at least this many bytes (0 = off)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
 # CORS — comma-separated allowed origins (default: localhost only)
 ALLOWED_ORIGINS = [
     o.strip() for o in os.getenv("ALLOWED_ORIGINS", f"http://localhost:{PORT}").split(",") if o.strip()
@@ -51,6 +126,19 @@ def validate_env():
         "BRAVE_SEARCH_API_KEY": BRAVE_SEARCH_API_KEY,
         "GOOGLE_PLACES_API_KEY": GOOGLE_PLACES_API_KEY,
     }
+    if WEB_CONCURRENCY > 1:
+        if SESSION_BACKEND == "memory":
+            logger.critical(f"WEB_CONCURRENCY={WEB_CONCURRENCY} needs SESSION_BACKEND=sqlite or redis — "
+                            "in-memory sessions are invisible to the other workers. Cannot start.")
+            sys.exit(1)
+        if RATE_LIMIT_BACKEND == "memory":
+            logger.warning("RATE_LIMIT_BACKEND=memory with several workers — each worker counts separately")
+        if not SHARED_DATA_PATH:
+            logger.warning("SHARED_DATA_PATH not set — every worker loads its own copy of the QBCC/suburb data")
+        logger.warning(f"WEB_CONCURRENCY={WEB_CONCURRENCY}: /metrics, /api/debug/profile, /api/debug/loop-stalls and "
+                       "/api/debug-trace answer from whichever worker takes the request — metrics carry a "
+                       "worker label; debug data covers one worker only")
+
     missing = [k for k, v in optional.items() if not v]
     if missing:
         logger.warning(f"Optional keys not set: {', '.join(missing)} — related features will be disabled")
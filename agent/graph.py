@@ -15,9 +15,13 @@ from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
 from agent.state import OnboardingState
+from agent.progress import emit as _emit_progress, ainvoke_json, ainvoke_text, progress_sink
+from agent import classification_store, spans
+from agent.llm import cached as _cached, wrap as _wrap_llm
+from agent.limits import limited as _limited
 
 logger = logging.getLogger(__name__)
-from agent.config import ANTHROPIC_API_KEY, MODEL_FAST
+from agent.config import ANTHROPIC_API_KEY, MODEL_FAST, ENRICH_SPECULATIVE_CANDIDATES
 from agent.tools import (
     abr_lookup, enrich_abr_with_entity_names, get_category_taxonomy_text,
     search_suburbs_by_postcode,
@@ -48,34 +52,77 @@ MSG_YES_ALL = "Yes, all of these"
 
 # ────────── MODELS ──────────
 
-llm_fast = ChatAnthropic(
+# Outermost: the response cache (hits skip the rest), then the upstream budget, then record/replay
+llm_fast = _cached(_limited(_wrap_llm(ChatAnthropic(
     model=MODEL_FAST,
     api_key=ANTHROPIC_API_KEY,
     max_tokens=512,
     temperature=0.3,
-)
+    callbacks=[spans.LLM_CALLBACK],
+), "fast")), "fast")
 
 # Haiku with higher token limit for structured JSON responses (service lists, area mappings)
-llm_fast_json = ChatAnthropic(
+llm_fast_json = _cached(_limited(_wrap_llm(ChatAnthropic(
     model=MODEL_FAST,
     api_key=ANTHROPIC_API_KEY,
     max_tokens=2048,
     temperature=0.3,
-)
+    callbacks=[spans.LLM_CALLBACK],
+), "fast_json")), "fast_json")
 
 
 # ────────── API TRACE ──────────
 
-def _trace(state: dict, name: str, duration: float, result_summary: str, data: dict = None):
-    """Append an API call trace entry to state for dev tools visibility."""
+def _trace(state: dict, name: str, duration: float, result_summary: str, data: dict = None, error: str = ""):
+    """Append an API call trace entry to state for dev tools visibility.
+
+    Pass `error` (the tool's error message) when the call failed; metrics count it.
+    """
     if "_api_trace" not in state:
         state["_api_trace"] = []
-    state["_api_trace"].append({
+    entry = {
         "api": name,
         "time": round(duration, 2),
         "summary": result_summary,
         "data": data or {},
-    })
+    }
+    if error:
+        entry["error"] = error
+    state["_api_trace"].append(entry)
+    _emit_progress("source", api=name, time=round(duration, 2), summary=result_summary)
+    spans.add_completed(name, duration, summary=result_summary)
+
+
+# ────────── PROMPT CACHING ──────────
+
+def _system(static: str, dynamic: str = "", cache: bool = True) -> SystemMessage:
+    """System prompt as a stable prefix marked for Anthropic prompt caching, then the per-call part.
+
+    Keep everything that varies by business, turn or user out of `static` —
+    one changed character there is a cache miss. Pass `cache=False` for
+    prefixes shorter than the model's minimum cacheable length: the API
+    ignores the breakpoint there, so the prompt goes as one plain string.
+    """
+    if not cache:
+        return SystemMessage(content=f"{static}\n\n{dynamic}" if dynamic else static)
+    blocks = [{"type": "text", "text": static, "cache_control": {"type": "ephemeral"}}]
+    if dynamic:
+        blocks.append({"type": "text", "text": dynamic})
+    return SystemMessage(content=blocks)
+
+
+def _token_usage(response) -> dict:
+    """Token counts of an LLM reply for `_trace` data: input split into cache reads, cache writes
+    and uncached, plus output. Empty when the reply carries no usage (streamed, cached or replayed)."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    details = usage.get("input_token_details") or {}
+    cached = details.get("cache_read") or 0
+    cache_write = details.get("cache_creation") or 0
+    total = usage.get("input_tokens") or 0
+    return {"input": total, "cached": cached, "cache_write": cache_write,
+            "uncached": total - cached - cache_write, "output": usage.get("output_tokens") or 0}
 
 
 # ────────── LLM BUSINESS CLASSIFIER ──────────
@@ -109,16 +156,38 @@ _SS_CATEGORIES = [
     "Welders and Boilermakers","Window Cleaner","Window and Glass Installation Company",
 ]
 
+# Bump when the meaning of a classification changes, so results stored per ABN are redone
+# (the prompt itself is part of the stored signals hash)
+_CLASSIFIER_VERSION = "1"
+
+# Instructions and the category list; the business follows it. Too short to prompt-cache.
+_CLASSIFIER_PROMPT = f"""You are classifying an Australian business for Service Seeking, a marketplace for trade and service professionals. The business name and its web presence data follow these instructions.
+
+SERVICE SEEKING CATEGORIES:
+{", ".join(_SS_CATEGORIES)}
+
+Analyse the web presence and determine:
+1. Is this a trade or service business that belongs on Service Seeking? (plumbers, electricians, builders, cleaners, photographers, accountants, designers, etc.)
+   - NOT suitable: retail shops, restaurants, auction houses, real estate agencies, medical practices, recruitment agencies, mining companies, equipment dealers
+2. If it IS a trade/service business, which Service Seeking categories match? Use EXACT category names from the list above. Only include categories where the web evidence clearly shows they offer that service.
+
+Respond with JSON only:
+{{"is_trade": true/false, "categories": ["Category Name", ...], "reason": "one sentence explanation"}}"""
+
+
 async def classify_business_from_web(
     business_name: str,
     google_name: str = "",
     google_type: str = "",
     google_reviews: list[dict] = None,
     website_text: str = "",
+    abn: str = "",
 ) -> dict:
     """Use Haiku to classify a business from its web presence.
 
-    Returns {"is_trade": bool, "categories": [...], "reason": "..."}.
+    Returns {"is_trade": bool, "categories": [...], "reason": "..."}, plus
+    "stored": True when answered from the per-ABN classification store
+    (same ABN, same signals) instead of the LLM.
     Replaces keyword matching for Google/website signals.
     """
     # Build context from available signals
@@ -138,42 +207,42 @@ async def classify_business_from_web(
         return {"is_trade": True, "categories": [], "reason": "No web data to classify"}
 
     signals_str = "\n".join(signals)
-    cat_list = ", ".join(_SS_CATEGORIES)
+
+    store = classification_store.get_store() if abn else None
+    abn_key = classification_store.normalise_abn(abn)
+    signals_key = classification_store.signals_hash(_CLASSIFIER_VERSION, MODEL_FAST, signals_str, _CLASSIFIER_PROMPT)
+    if store is not None and abn_key:
+        stored = await asyncio.to_thread(store.get, abn_key, signals_key)  # shared SQLite file: may wait on other workers' writes
+        if stored is not None:
+            logger.info(f"[CLASSIFY] {business_name}: stored result for ABN {abn_key} (signals unchanged)")
+            return {**stored, "stored": True}
 
     try:
         response = await llm_fast.ainvoke([
-            SystemMessage(content=f"""You are classifying an Australian business for Service Seeking, a marketplace for trade and service professionals.
-
-BUSINESS NAME: {business_name}
+            _system(_CLASSIFIER_PROMPT, f"""BUSINESS NAME: {business_name}
 
 WEB PRESENCE DATA:
-{signals_str}
-
-SERVICE SEEKING CATEGORIES:
-{cat_list}
-
-Analyse the web presence and determine:
-1. Is this a trade or service business that belongs on Service Seeking? (plumbers, electricians, builders, cleaners, photographers, accountants, designers, etc.)
-   - NOT suitable: retail shops, restaurants, auction houses, real estate agencies, medical practices, recruitment agencies, mining companies, equipment dealers
-2. If it IS a trade/service business, which Service Seeking categories match? Use EXACT category names from the list above. Only include categories where the web evidence clearly shows they offer that service.
-
-Respond with JSON only:
-{{"is_trade": true/false, "categories": ["Category Name", ...], "reason": "one sentence explanation"}}"""),
+{signals_str}""", cache=False),
             HumanMessage(content="Classify this business."),
-        ])
-        parsed = json.loads(_extract_json(response.content))
+        ], llm_cache=_parse_json_reply)  # same web data → same classification, across sessions and retries
+        parsed = _parse_json_reply(response.content)
         logger.info(f"[CLASSIFY] {business_name}: is_trade={parsed.get('is_trade')}, categories={parsed.get('categories', [])}, reason={parsed.get('reason', '')}")
+        if store is not None and abn_key:
+            await asyncio.to_thread(store.put, abn_key, signals_key, parsed)
+        tokens = _token_usage(response)
+        if tokens:
+            return {**parsed, "tokens": tokens}
         return parsed
     except Exception as e:
         logger.warning(f"[CLASSIFY] Failed for {business_name}: {e}")
-        return {"is_trade": True, "categories": [], "reason": f"Classification failed: {e}"}
+        return {"is_trade": True, "categories": [], "reason": f"Classification failed: {e}", "error": str(e)}
 
 
 # ────────── NODE FUNCTIONS ──────────
 
 async def welcome_node(state: OnboardingState) -> dict:
     """Greet the user and ask for business name/ABN."""
-    response = await llm_fast.ainvoke([
+    response = await ainvoke_text(llm_fast, [
         SystemMessage(content="""You are the Service Seeking onboarding assistant. You help Australian trade and service professionals get set up on the platform.
 Service Seeking covers tradies (plumbers, electricians, builders, etc.) AND professional services (photographers, accountants, designers, IT, etc.). Most users are tradies, but welcome everyone.
 You are warm, friendly, and speak in natural Australian English.
@@ -289,7 +358,7 @@ async def business_verification_node(state: OnboardingState) -> dict:
                {"search_type": search_type, "results": [
                    {"name": r.get("display_name"), "abn": r.get("abn"), "postcode": r.get("postcode")}
                    for r in abr_results[:5]
-               ]})
+               ]}, error=results.get("error", ""))
 
         # Enrich name search results with entity names (parallel ABN lookups)
         # Runs for all name searches — even single results need the entity name
@@ -343,6 +412,7 @@ async def business_verification_node(state: OnboardingState) -> dict:
             else:
                 # No matches in that postcode — show all with feedback
                 postcode_note = f"None of the results matched postcode {user_postcode}, so here are all the matches:\n\n"
+                _speculate_enrichment(state, abr_results)
                 return {
                     "current_node": "business_verification",
                     "business_name_input": search_term,
@@ -367,6 +437,7 @@ async def business_verification_node(state: OnboardingState) -> dict:
                 "messages": [AIMessage(content=_format_sole_trader_prompt(abr_results[0]))],
             }
 
+        _speculate_enrichment(state, abr_results)
         return {
             "current_node": "business_verification",
             "business_name_input": search_term,
@@ -540,6 +611,7 @@ Only include fields relevant to the intent. Respond with JSON only."""),
                 results["results"] = filtered
                 results["count"] = len(filtered)
 
+        _speculate_enrichment(state, new_abr)
         return {
             "current_node": "business_verification",
             "business_name_input": search_term,
@@ -940,7 +1012,7 @@ systems but isn't listed under "Hot Water Systems", they'll never see those job
     static_context = f"""You are {'reviewing an existing business profile on Service Seeking to find missing services' if is_improve else 'the Service Seeking onboarding assistant helping a business set up their services'}.
 
 GOAL: {'Check whether this business offers specific services we identified as gaps — each one they add means more job leads.' if is_improve else 'Map this business services as completely as possible. Every missed subcategory is leads they will never see. It is better to include a service they occasionally do than to miss one they do regularly.'}
-{improve_svc_ctx}
+
 SUBCATEGORY GUIDE:
 {guide[:4000] if guide else "No specific guide available for this trade."}
 
@@ -951,7 +1023,7 @@ GUIDELINES:
 - {'This is a profile review — get straight to asking about the missing services. No introduction, no preamble, no stating what you can see. Just ask the question.' if is_improve else 'This flows directly from business confirmation — the conversation is already going.'} Do not re-introduce yourself.
 - Be conversational and Australian. Keep it short — people are busy. Say "tradie" for trade businesses, but adapt your language for professional services (photographers, designers, accountants, etc.).
 - Licence classes are your strongest signal for trades — they tell you exactly what they're licensed for. Professional services may not have trade licences, and that's fine.
-{turn1_rule}
+- On the first turn, follow the TURN 1 RULE given with the business details below.
 - Google reviews are a strong signal — if customers mention specific work, that confirms those services. Use reviews to validate mapping.
 - READ THE DATA CONFIDENCE LINE. When confidence is low (no licence, no Google, no category), web results are unreliable — they may be about a completely different person or business with the same name. In low-confidence situations, ignore web results and simply ask what services they offer.
 - FOLLOW-UP RULE: Services from the user's previous answer have already been added to SERVICES MAPPED SO FAR (check JUST ADDED note). Your job: acknowledge what was added in one sentence, then look at the REMAINING GAPS and pick the most relevant group of 3-6 services to ask about next. Group them by theme — e.g. "cabling work" (Data Cabling, Cabling, TV Antenna), "solar and energy" (Solar panel installation, Energy efficiency checks). Pick high-value, commonly-offered services first. One question per turn. If no gaps remain, set step_complete=true. Your output "services" array should contain ONLY newly added services from this turn — existing services are preserved automatically.
@@ -991,12 +1063,14 @@ Return ONLY the JSON object."""
             f"Their existing services (source=existing) are already on their profile — focus on what's NEW."
         )
 
-    # ── Dynamic context ──
+    # ── Dynamic context ── (everything business- or turn-specific: the static part is prompt-cached per trade)
     dynamic_context = f"""BUSINESS: {business_name}
 {f'CONTACT: {contact}' if contact else ''}
 {_format_services_context(services, general_headings)}
 {licence_context}{data_confidence}
-{web_context}{reviews_context}{gaps_text}{cluster_context}{improve_context}
+{web_context}{reviews_context}{gaps_text}{cluster_context}{improve_context}{improve_svc_ctx}
+
+{turn1_rule}
 
 CONVERSATION SO FAR:
 {conv_history}"""
@@ -1573,11 +1647,8 @@ async def service_discovery_node(state: OnboardingState) -> dict:
 
     # ── Single LLM call ──
     t_llm = time.time()
-    response = await llm_fast_json.ainvoke([
-        SystemMessage(content=[
-            {"type": "text", "text": static_context, "cache_control": {"type": "ephemeral"}},
-            {"type": "text", "text": dynamic_context},
-        ]),
+    response = await ainvoke_json(llm_fast_json, [
+        _system(static_context, dynamic_context),
         HumanMessage(content=last_msg or "Let's set up my services"),
     ])
     llm_time = time.time() - t_llm
@@ -1628,7 +1699,8 @@ async def service_discovery_node(state: OnboardingState) -> dict:
                 "user_message": (last_msg or "")[:200],
                 "llm_response": (response.content or "")[:1000],
                 "cluster_ids": cluster_ids,
-                "buttons": buttons[:6]})
+                "buttons": buttons[:6],
+                "tokens": _token_usage(response)})
 
         # Build button list — mark as multi-select when there are cluster toggles
         _DECLINE_WORDS = {"none", "not", "nah", "skip", "move on"}
@@ -1675,6 +1747,9 @@ async def service_discovery_node(state: OnboardingState) -> dict:
         return result
     except Exception as e:
         logger.error(f"[SVC] {e} | raw response: {response.content[:300]}")
+        _trace(state, "LLM: Service Discovery", llm_time, f"Unusable reply: {e}",
+               {"llm_response": (response.content or "")[:1000], "tokens": _token_usage(response)},
+               error=f"{type(e).__name__}: {e}")
         # Preserve existing services, try to extract text from the failed response
         fallback_text = ""
         if response and response.content:
@@ -1838,7 +1913,7 @@ Return a JSON object:
 Return ONLY the JSON object."""
 
         t_llm = time.time()
-        response = await model.ainvoke([
+        response = await ainvoke_json(model, [
             SystemMessage(content=prompt),
             HumanMessage(content=last_msg or "Looks good"),
         ])
@@ -1854,12 +1929,12 @@ Return ONLY the JSON object."""
                 "chars": len(regional_guide)})
 
         # Improve mode: add location mismatch context if Google suburb differs from SS profile
-        improve_area_ctx = ""
+        improve_focus_ctx = ""
         if state.get("_flow_mode") == "improve":
             google_suburb = state.get("business_suburb", "")
             ss_suburb = ((state.get("_ss_profile") or {}).get("jobFilter") or {}).get("suburb", {}).get("suburb", "")
             if google_suburb and ss_suburb and google_suburb.lower() != ss_suburb.lower():
-                improve_area_ctx = f"""
+                improve_focus_ctx = f"""
 IMPORTANT — LOCATION MISMATCH:
 Google Places shows this business in **{google_suburb}**, but their Service Seeking profile says **{ss_suburb}**.
 Lead with this mismatch — ask which suburb they're actually based in. Present radio-style options:
@@ -1877,7 +1952,7 @@ Then set up their service area based on their answer.
                     ss_radius = svc_areas.get("radius_km", 20)
                     base = google_suburb or ss_suburb or "their suburb"
                     regions = svc_areas.get("regions_included", [])
-                    improve_area_ctx = f"""
+                    improve_focus_ctx = f"""
 IMPORTANT — RADIUS REFINEMENT:
 This business is based in {base} with a {ss_radius}km radius on Service Seeking, which currently covers {len(regions)} regions: {', '.join(regions)}.
 {barrier_finding.get('suggested', '')}
@@ -1886,16 +1961,12 @@ Explain what their current {ss_radius}km radius covers, mention the barrier issu
 Don't be alarmist — frame it as a refinement to get better-matched leads.
 """
                 elif google_suburb:
-                    improve_area_ctx = f"\nIMPROVE MODE: This business's profile is being reviewed. They're based in {google_suburb}. Ask about their service area from there.\n"
+                    improve_focus_ctx = f"\nIMPROVE MODE: This business's profile is being reviewed. They're based in {google_suburb}. Ask about their service area from there.\n"
 
         static_context = f"""You are the Service Seeking onboarding assistant helping a business define their service area.
 
-GOAL: Figure out which REGIONS this business covers. Real coverage isn't a perfect circle — it's a blob shaped by traffic, barriers, and preferences. Your job is to identify which regions they include and which they exclude.
-{improve_area_ctx}
-REGIONS WITHIN 20KM OF BASE:
-{region_list or "No region data available"}
-Total: {grouped.get("total", 0)} suburbs across these regions
-{location_evidence}
+GOAL: Figure out which REGIONS this business covers. Real coverage isn't a perfect circle — it's a blob shaped by traffic, barriers, and preferences. Your job is to identify which regions they include and which they exclude. The business, its base and the regions within 20km of it follow these instructions.
+
 REGIONAL GUIDE (barriers, congestion, corridors):
 {regional_guide[:4000] if regional_guide else "No regional guide available."}
 
@@ -1918,7 +1989,7 @@ BUTTON RULE: Each button must represent a COMPLETE coverage selection — listin
 Return a JSON object:
 {{"response": "your conversational message", "service_areas": {{"base_suburb": "", "base_postcode": "", "base_lat": 0, "base_lng": 0, "radius_km": 20, "regions_included": ["region names they cover"], "regions_excluded": ["region names within radius they don't cover"], "barriers": ["relevant barriers from regional guide"], "travel_notes": "brief note on coverage shape"}}, "buttons": ["3-4 complete coverage options"], "step_complete": true/false}}
 
-Use REAL region names from the grouped data above for regions_included and regions_excluded.
+Use REAL region names from the REGIONS WITHIN 20KM OF BASE list for regions_included and regions_excluded.
 step_complete = true when the user has indicated which regions they cover.
 
 Return ONLY the JSON object."""
@@ -1936,14 +2007,16 @@ Return ONLY the JSON object."""
 {f'CONTACT: {contact}' if contact else ''}
 BASE SUBURB: {grouped.get("base_suburb", "Unknown")} ({postcode})
 STATE: {business_state}
-CURRENT SERVICE AREA: Not set yet{improve_area_ctx}"""
+CURRENT SERVICE AREA: Not set yet{improve_area_ctx}
+{improve_focus_ctx}
+REGIONS WITHIN 20KM OF BASE:
+{region_list or "No region data available"}
+Total: {grouped.get("total", 0)} suburbs across these regions
+{location_evidence}"""
 
         t_llm = time.time()
-        response = await model.ainvoke([
-            SystemMessage(content=[
-                {"type": "text", "text": static_context, "cache_control": {"type": "ephemeral"}},
-                {"type": "text", "text": dynamic_context},
-            ]),
+        response = await ainvoke_json(model, [
+            _system(static_context, dynamic_context),
             HumanMessage(content=last_msg or (
                 "Include all the areas from our website and reviews as a starting point — I'll adjust if needed"
                 if state.get("_auto_chained") and location_evidence
@@ -1977,7 +2050,8 @@ CURRENT SERVICE AREA: Not set yet{improve_area_ctx}"""
                 "regions_excluded": excluded, "step_complete": step_complete, "follow_up": is_follow_up,
                 "prompt_context": _area_prompt,
                 "user_message": (last_msg or "")[:200],
-                "llm_response": (response.content or "")[:1000]})
+                "llm_response": (response.content or "")[:1000],
+                "tokens": _token_usage(response)})
 
         return {
             "current_node": "service_area",
@@ -1989,6 +2063,9 @@ CURRENT SERVICE AREA: Not set yet{improve_area_ctx}"""
         }
     except Exception as e:
         logger.error(f"[AREA] {e}")
+        _trace(state, "LLM: Service Area", llm_time, f"Unusable reply: {e}",
+               {"llm_response": (response.content or "")[:1000], "tokens": _token_usage(response)},
+               error=f"{type(e).__name__}: {e}")
         base = grouped.get("base_suburb", "your area")
         return {
             "current_node": "service_area",
@@ -2106,7 +2183,7 @@ async def profile_node(state: OnboardingState) -> dict:
 - Keep it short, don't over-explain.
 - End with a natural nudge back to the profile — something like "Want to jump back to your profile?" or "Ready to check out your profile again?" Keep it casual."""
 
-        response = await llm_fast.ainvoke([
+        response = await ainvoke_text(llm_fast, [
             SystemMessage(content=f"""You are {'reviewing' if is_improve_profile else 'setting up'} a Service Seeking profile. The user is viewing their profile preview and has typed a question or comment instead of publishing.
 
 BUSINESS: {business_name}
@@ -2305,20 +2382,13 @@ IMPROVE MODE — KEEP THEIR VOICE:
         )
         desc_instruction = '2. Write a "description" (2-3 sentences) for their profile listing.'
 
-    llm_task = llm_fast_json.ainvoke([
-        SystemMessage(content=f"""You're helping a business {'improve' if state.get('_flow_mode') == 'improve' else 'set up'} their Service Seeking profile. A stronger description converts more profile views into job enquiries. Do two things:
+    # Static prefix (prompt-cached, one variant per flow mode): instructions and guidelines; the business follows
+    llm_task = ainvoke_json(llm_fast_json, [
+        _system(f"""You're helping a business {'improve' if state.get('_flow_mode') == 'improve' else 'set up'} their Service Seeking profile. A stronger description converts more profile views into job enquiries. The business details follow these instructions. Do two things:
 
 {intro_instruction}
 {desc_instruction}
 
-BUSINESS: {business_name}
-{f'OWNER: {contact_name}' if contact_name else ''}
-{f'LICENCE CLASSES: {", ".join(licence_classes)}' if licence_classes else ''}
-SERVICES: {services_text}
-AREAS: {regions_text}
-{f'YEARS IN BUSINESS: {years}' if years else ''}
-{web_context}{rating_context}{improve_desc_ctx}
-
 DESCRIPTION GUIDELINES:
 - Third person, professional but warm Australian tone
 - Mention key services, areas covered, and years of experience if available
@@ -2328,9 +2398,15 @@ DESCRIPTION GUIDELINES:
 - If BUSINESS WEBSITE TEXT is provided, use it to pick out specific details (specialties, taglines, unique selling points) — don't just repeat it, distil the best bits
 - Focus on what makes this business worth hiring
 {improve_desc_guidelines}
-Return JSON: {{"intro": "...", "description": "..."}}"""),
+Return JSON: {{"intro": "...", "description": "..."}}""", f"""BUSINESS: {business_name}
+{f'OWNER: {contact_name}' if contact_name else ''}
+{f'LICENCE CLASSES: {", ".join(licence_classes)}' if licence_classes else ''}
+SERVICES: {services_text}
+AREAS: {regions_text}
+{f'YEARS IN BUSINESS: {years}' if years else ''}
+{web_context}{rating_context}{improve_desc_ctx}"""),
         HumanMessage(content="Generate the intro and profile description."),
-    ])
+    ], field="intro")
 
     # Separate web results into: business site (only if verified), junk
     scrape_url = ""
@@ -2419,13 +2495,15 @@ Return JSON: {{"intro": "...", "description": "..."}}"""),
         raw = re.sub(r'^```(?:json)?\s*', '', raw)
         raw = re.sub(r'\s*```$', '', raw)
     logger.info(f"[PROFILE] Raw LLM response: {raw[:200]}")
+    profile_error = ""
     try:
         parsed = json.loads(raw)
         intro = parsed.get("intro", "")
         description = parsed.get("description", "")
         logger.info(f"[PROFILE] Parsed intro: {intro[:80]}")
         logger.info(f"[PROFILE] Parsed desc: {description[:80]}")
-    except json.JSONDecodeError:
+    except json.JSONDecodeError as e:
+        profile_error = f"JSONDecodeError: {e}"
         # Fallback: treat entire response as description
         intro = ""
         description = raw.strip('"')
@@ -2489,7 +2567,8 @@ Return JSON: {{"intro": "...", "description": "..."}}"""),
             "prompt_inputs": {"business": business_name, "contact": contact_name,
                               "services": services_text[:300], "areas": regions_text[:200],
                               "years": years, "google_rating": google_rating},
-            "llm_response": {"intro": intro[:300], "description": description[:500]}})
+            "llm_response": {"intro": intro[:300], "description": description[:500]},
+            "tokens": _token_usage(response)}, error=profile_error)
     if scrape_url:
         _trace(state, "Website Scrape", llm_time,
                f"logo={'yes' if logo else 'no'}, {len(scraped.get('photos', []))} photos from site, {len(photos)} total",
@@ -2505,10 +2584,13 @@ Return JSON: {{"intro": "...", "description": "..."}}"""),
             cats = list(dict.fromkeys(s.get("category_name", "") for s in services if s.get("category_name")))
             trade_type = cats[0].lower() if cats else "tradesperson"
         t_filter = time.time()
-        photos = await ai_filter_photos(photos[:8], trade_type or "tradesperson")
+        filtered = await ai_filter_photos(photos[:8], trade_type or "tradesperson")
+        photos = filtered["photos"]
         _trace(state, "AI Photo Filter", time.time() - t_filter,
-               f"{pre_filter_count} candidates → {len(photos)} kept (Haiku vision WORK/SKIP)",
-               {"before": pre_filter_count, "after": len(photos), "trade_type": trade_type})
+               f"{pre_filter_count} candidates → {len(photos)} kept "
+               + ("(Haiku failed, large JPEG fallback)" if filtered.get("error") else "(Haiku vision WORK/SKIP)"),
+               {"before": pre_filter_count, "after": len(photos), "trade_type": trade_type},
+               error=filtered.get("error", ""))
 
     result = {
         "current_node": "profile",
@@ -2848,6 +2930,26 @@ async def complete_node(state: OnboardingState) -> dict:
 
 # ────────── HELPERS ──────────
 
+def _parse_json_reply(text: str) -> dict:
+    """Parse the JSON object in an LLM reply; raises if there isn't one."""
+    parsed = json.loads(_extract_json(text))
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected a JSON object, got {type(parsed).__name__}")
+    return parsed
+
+
+def _parse_fenced_json(text: str) -> dict:
+    """Parse an LLM reply that is a bare JSON object, optionally inside a code fence."""
+    raw = text.strip()
+    if raw.startswith("```"):
+        raw = re.sub(r'^```\w*\n?', '', raw)
+        raw = re.sub(r'\n?```$', '', raw)
+    parsed = json.loads(raw)
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected a JSON object, got {type(parsed).__name__}")
+    return parsed
+
+
 def _extract_json(text: str) -> str:
     """Extract JSON from LLM response, handling markdown code blocks."""
     text = text.strip()
@@ -2888,6 +2990,7 @@ def _extract_json(text: str) -> str:
     return text
 
 
+@spans.traced("enrichment")
 async def _enrich_business(state: dict) -> dict:
     """Run parallel enrichment: Google Places, Brave search, licence lookup, website scrape, category detection.
 
@@ -3003,6 +3106,11 @@ async def _enrich_business(state: dict) -> dict:
                    {"abn": abr_match.get("abn"), "entity_type": abr_match.get("entity_type"),
                     "state": abr_match.get("state"), "gst": abr_match.get("gst_registered")})
 
+    # A failed Places call (as opposed to no listing) is traced as an error below
+    google_error = google_place.get("error", "")
+    if google_error:
+        google_place = {}
+
     # Google Places retry: if no result OR low-quality result, try variants.
     # ABR names often have "Pty Ltd" which Google listings omit, causing wrong matches.
     # e.g. "Millerwatts Electricians Pty Ltd" → wrong "Millerwatts Electrical" (1 review)
@@ -3022,6 +3130,9 @@ async def _enrich_business(state: dict) -> dict:
             retry_names.append(f"{business_name} Pty Ltd")
         for retry_name in retry_names:
             retry_result = await google_places_search(retry_name, google_query_suffix)
+            if retry_result.get("error"):
+                google_error = google_error or retry_result["error"]
+                continue
             if retry_result:
                 # Accept retry if it's better than what we have (more reviews)
                 retry_reviews = retry_result.get("review_count", 0) or 0
@@ -3065,7 +3176,7 @@ async def _enrich_business(state: dict) -> dict:
                    {"licensee": r.get("licensee"), "status": r.get("status"),
                     "licence_number": r.get("licence_number")}
                    for r in licence_results.get("results", [])[:5]
-               ]})
+               ]}, error=licence_results.get("error", ""))
     _trace(state, "Brave Web Search", t1 - t0,
            f"{len(web_results) if web_results else 0} web results",
            {"results": [
@@ -3145,10 +3256,11 @@ async def _enrich_business(state: dict) -> dict:
     google_reviews = google_place.get("reviews", [])
 
     _trace(state, "Google Places", t1 - t0,
-           f"{google_rating}★ ({google_review_count} reviews)" if google_rating else "not found",
+           f"{google_rating}★ ({google_review_count} reviews)" if google_rating
+           else f"failed: {google_error}" if google_error else "not found",
            {"name": google_place.get("name", ""), "rating": google_rating,
             "review_count": google_review_count, "website": google_place.get("website", ""),
-            "reviews": len(google_reviews)})
+            "reviews": len(google_reviews)}, error=google_error)
 
     google_photos = google_place.get("photos", [])
     if google_rating:
@@ -3261,6 +3373,9 @@ async def _enrich_business(state: dict) -> dict:
                             "status": details.get("status"),
                             "expiry": details.get("expiry_date"),
                             "classes": licence_classes})
+                else:
+                    _trace(state, "NSW Licence Details", t3 - t2, f"Lookup failed: {details['error']}",
+                           {"licence_id": lid}, error=details["error"])
 
         # Use expired licence for category signal when no current match found
         expired_match = match_details.get("expired_match")
@@ -3346,13 +3461,17 @@ async def _enrich_business(state: dict) -> dict:
             google_type=google_type,
             google_reviews=google_reviews,
             website_text=website_text,
+            abn=abn or (abr_match or {}).get("abn", ""),
         )
         classify_time = time.time() - t_classify
         is_trade = classification.get("is_trade", True)
         llm_categories = classification.get("categories", [])
         _trace(state, "LLM Business Classifier", classify_time,
-               f"{'Trade' if is_trade else 'NOT TRADE'}: {', '.join(llm_categories) if llm_categories else 'no categories'} — {classification.get('reason', '')}",
-               {"is_trade": is_trade, "categories": llm_categories, "reason": classification.get("reason", "")})
+               f"{'Trade' if is_trade else 'NOT TRADE'}: {', '.join(llm_categories) if llm_categories else 'no categories'} — {classification.get('reason', '')}"
+               + (" (stored for this ABN)" if classification.get("stored") else ""),
+               {"is_trade": is_trade, "categories": llm_categories, "reason": classification.get("reason", ""),
+                "stored": bool(classification.get("stored")), "tokens": classification.get("tokens", {})},
+               error=classification.get("error", ""))
 
         # Merge LLM categories with keyword-detected ones (deduplicated, keyword-detected first)
         seen = set(detected_categories)
@@ -3459,6 +3578,107 @@ async def _enrich_business(state: dict) -> dict:
     }
 
 
+# ────────── SPECULATIVE ENRICHMENT ──────────
+# Enrichment takes several seconds and depends only on the ABR card the user
+# picks, so as soon as candidates are shown it starts in the background for the
+# top card(s). _confirm_business adopts the result when the pick matches.
+# In-process only — a confirmation handled by another worker just runs fresh.
+
+# session_id → {inputs key → (task, scratch state the task traces into)}
+_speculative: dict[str, dict[tuple, tuple[asyncio.Task, dict]]] = {}
+
+
+def _enrich_inputs(abr: dict, state: dict) -> dict:
+    """The state fields _confirm_business sets for this ABR card before enriching."""
+    business_name = abr.get("display_name", state.get("business_name_input", ""))
+    return {
+        "business_name": business_name,
+        "legal_name": abr.get("legal_name", "") or business_name,
+        "abn": abr.get("abn", ""),
+        "business_postcode": abr.get("postcode", ""),
+        "business_state": abr.get("state", ""),
+        "entity_type": state.get("entity_type", ""),
+    }
+
+
+def _inputs_key(inputs: dict) -> tuple:
+    return tuple(inputs[k] for k in sorted(inputs))
+
+
+async def _run_speculative(session_id: str, scratch: dict) -> dict:
+    # Outlives the turn — keep it out of that turn's stream and span recording
+    with progress_sink(None), spans.recording(session_id, "speculative_enrichment",
+                                              business_name=scratch.get("business_name", "")):
+        return await _enrich_business(scratch)
+
+
+def _speculate_enrichment(state: dict, candidates: list):
+    """Start background enrichment for the top ABR candidates, cancelling stale ones."""
+    session_id = state.get("session_id")
+    if not session_id or ENRICH_SPECULATIVE_CANDIDATES <= 0:
+        return
+    wanted = {}
+    for abr in candidates:
+        if len(wanted) >= ENRICH_SPECULATIVE_CANDIDATES:
+            break
+        # Inactive ABNs are blocked and sole traders are renamed before confirming
+        if abr.get("status", "Active") != "Active" or _is_sole_trader_personal_name(abr):
+            continue
+        inputs = _enrich_inputs(abr, state)
+        wanted[_inputs_key(inputs)] = inputs
+
+    running = _speculative.setdefault(session_id, {})
+    for key in [k for k in running if k not in wanted]:
+        running.pop(key)[0].cancel()
+    for key, inputs in wanted.items():
+        if key not in running:
+            scratch = {**inputs, "_api_trace": []}
+            running[key] = (asyncio.create_task(_run_speculative(session_id, scratch)), scratch)
+            logger.info(f"[BIZ] Speculative enrichment started for '{inputs['business_name']}'")
+    if not running:
+        del _speculative[session_id]
+
+
+def cancel_speculative(session_id: str):
+    """Drop background enrichment for a session (expired, or business confirmed)."""
+    for task, _ in _speculative.pop(session_id, {}).values():
+        task.cancel()
+
+
+async def _adopt_speculative(state: dict, inputs: dict) -> dict | None:
+    """Enrichment prefetched for these inputs, or None if there is none to use.
+
+    Awaits a task that is still running instead of starting a duplicate, and
+    copies its traces (and licence-holder flag) onto state. Other candidates'
+    tasks for the session are cancelled.
+    """
+    running = _speculative.pop(state.get("session_id"), {})
+    entry = running.pop(_inputs_key(inputs), None)
+    for task, _ in running.values():
+        task.cancel()
+    if entry is None:
+        return None
+    task, scratch = entry
+    was_ready = task.done()
+    t0 = time.time()
+    try:
+        enrichment = await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            task.cancel()
+            raise  # this turn was cancelled, not the prefetch
+        return None
+    except Exception as e:
+        logger.warning(f"[BIZ] Speculative enrichment failed, running fresh: {e}")
+        return None
+    state.setdefault("_api_trace", []).extend(scratch["_api_trace"])
+    if scratch.get("_needs_licence_holder_name"):
+        state["_needs_licence_holder_name"] = True
+    _trace(state, "Prefetched Enrichment", time.time() - t0,
+           "already complete" if was_ready else "joined in-flight prefetch")
+    return enrichment
+
+
 async def _confirm_business(abr: dict, state: dict) -> dict:
     """Confirm a business from ABR and run enrichment."""
     business_name = abr.get("display_name", state.get("business_name_input", ""))
@@ -3492,7 +3712,9 @@ async def _confirm_business(abr: dict, state: dict) -> dict:
     state["business_postcode"] = postcode
     state["business_state"] = business_state
 
-    enrichment = await _enrich_business(state)
+    enrichment = await _adopt_speculative(state, _enrich_inputs(abr, state))
+    if enrichment is None:
+        enrichment = await _enrich_business(state)
 
     result = {
         "current_node": "business_verification",
@@ -3513,6 +3735,24 @@ async def _confirm_business(abr: dict, state: dict) -> dict:
 
 # ────────── ASSESSMENT (IMPROVE MODE) ──────────
 
+# Static prefix (prompt-cached) of the description assessment; the business and its description follow
+_DESCRIPTION_ASSESSMENT_PROMPT = """You are a profile copywriting expert for Service Seeking, Australia's largest trade marketplace. Analyse the business description that follows these instructions and return JSON.
+
+Return JSON with:
+- "score": 1-10 (1=terrible, 5=adequate, 10=excellent)
+- "issues": array of specific problems found (e.g. "ALL CAPS section looks unprofessional", "Says '8 years' but member since 2016 — now stale", "Doesn't mention licence or reviews")
+- "summary": one sentence describing the main improvement opportunity
+
+Score guide:
+- 1-3: Missing, empty, or barely functional
+- 4-5: Has content but significant issues (caps, stale info, generic, poor grammar)
+- 6-7: Decent but missing trust signals (licence, reviews, specific services/areas)
+- 8-9: Good, covers most bases
+- 10: Excellent, professional, specific, leverages all trust signals
+
+Return ONLY valid JSON, no other text."""
+
+
 async def _assess_profile(state: dict) -> dict:
     """Compare enriched data vs existing SS profile to find improvement opportunities.
 
@@ -3678,42 +3918,24 @@ async def _assess_profile(state: dict) -> dict:
         services_str = ", ".join(ss_subcat_names[:10])
 
         desc_assessment = await llm_fast.ainvoke([
-            SystemMessage(content=f"""You are a profile copywriting expert for Service Seeking, Australia's largest trade marketplace. Analyse this business description and return JSON.
-
-BUSINESS: {business_name}
+            _system(_DESCRIPTION_ASSESSMENT_PROMPT, f"""BUSINESS: {business_name}
 MEMBER SINCE: {member_since}
 LICENCE CLASSES: {licence_classes_str or 'Unknown'}
 REVIEWS: {review_info or 'None on SS'}
 SERVICES: {services_str or 'Unknown'}
 
 CURRENT DESCRIPTION:
-{ss_desc}
-
-Return JSON with:
-- "score": 1-10 (1=terrible, 5=adequate, 10=excellent)
-- "issues": array of specific problems found (e.g. "ALL CAPS section looks unprofessional", "Says '8 years' but member since 2016 — now stale", "Doesn't mention licence or reviews")
-- "summary": one sentence describing the main improvement opportunity
-
-Score guide:
-- 1-3: Missing, empty, or barely functional
-- 4-5: Has content but significant issues (caps, stale info, generic, poor grammar)
-- 6-7: Decent but missing trust signals (licence, reviews, specific services/areas)
-- 8-9: Good, covers most bases
-- 10: Excellent, professional, specific, leverages all trust signals
-
-Return ONLY valid JSON, no other text."""),
+{ss_desc}"""),
             HumanMessage(content="Assess the description quality."),
-        ])
+        ], llm_cache=_parse_fenced_json)
 
         # Parse AI response
         desc_result = {"score": 5, "issues": [], "summary": "Could be improved"}
+        desc_error = ""
         try:
-            raw = desc_assessment.content.strip()
-            if raw.startswith("```"):
-                raw = re.sub(r'^```\w*\n?', '', raw)
-                raw = re.sub(r'\n?```$', '', raw)
-            desc_result = json.loads(raw)
-        except Exception:
+            desc_result = _parse_fenced_json(desc_assessment.content)
+        except Exception as e:
+            desc_error = f"{type(e).__name__}: {e}"
             logger.warning(f"[ASSESS] Failed to parse description assessment: {desc_assessment.content[:200]}")
 
         desc_score = desc_result.get("score", 5)
@@ -3725,7 +3947,8 @@ Return ONLY valid JSON, no other text."""),
             logger.info(f"[ASSESS] Description issues: {desc_issues}")
         _trace(state, "LLM: Description Quality", desc_time,
                f"Score {desc_score}/10 — {desc_summary}",
-               {"score": desc_score, "issues": desc_issues, "description_length": desc_len})
+               {"score": desc_score, "issues": desc_issues, "description_length": desc_len,
+                "tokens": _token_usage(desc_assessment)}, error=desc_error)
 
     if desc_score >= 8:
         strengths.append({"headline": "Strong description", "icon": "check"})
@@ -3825,16 +4048,12 @@ Return ONLY valid JSON, no other text."""),
             if regional_guide:
                 t_barrier = time.time()
                 barrier_response = await llm_fast.ainvoke([
-                    SystemMessage(content=f"""You are analysing whether a tradesperson's service radius includes areas across a geographic barrier they probably wouldn't service.
-
-BASE SUBURB: {base_suburb} (postcode {state.get('business_postcode', '')})
-RADIUS: {ss_radius}km
-ALL REGIONS WITHIN THIS RADIUS ({len(regions_included)}): {', '.join(regions_included)}
+                    _system(f"""You are analysing whether a tradesperson's service radius includes areas across a geographic barrier they probably wouldn't service. Their base suburb, radius and the regions it covers follow these instructions.
 
 REGIONAL GUIDE — BARRIERS SECTION:
 {regional_guide[:3000]}
 
-Look at where {base_suburb} is located, then look at the regions this {ss_radius}km radius covers. Does the radius extend across a significant barrier (harbour, river, mountain range, national park, bridge bottleneck) to include regions on the other side that a tradesperson based in {base_suburb} would be unlikely to service?
+Look at where the base suburb is located, then look at the regions the radius covers. Does the radius extend across a significant barrier (harbour, river, mountain range, national park, bridge bottleneck) to include regions on the other side that a tradesperson based there would be unlikely to service?
 
 For example: a 20km radius from Balgowlah (Northern Beaches) would include Eastern Suburbs and Inner West — but those are across Sydney Harbour, requiring the Harbour Bridge or tunnel. Most Northern Beaches tradies wouldn't take those jobs.
 
@@ -3843,17 +4062,21 @@ Return JSON:
 - "barrier_name": "name of the barrier" (e.g. "Sydney Harbour", "Georges River")
 - "explanation": "one sentence explaining the issue for the business owner" (e.g. "Your 20km radius reaches across the harbour into Eastern Suburbs and Inner West — you're probably not taking those jobs")
 
-Only flag barriers that create a genuine practical problem for a tradie traveling by van/ute. Return ONLY valid JSON."""),
+Only flag barriers that create a genuine practical problem for a tradie traveling by van/ute. Return ONLY valid JSON.""", f"""BASE SUBURB: {base_suburb} (postcode {state.get('business_postcode', '')})
+RADIUS: {ss_radius}km
+ALL REGIONS WITHIN THIS RADIUS ({len(regions_included)}): {', '.join(regions_included)}""", cache=False),
                     HumanMessage(content="Check for barrier pollution."),
                 ])
                 logger.info(f"[ASSESS] Barrier LLM response: {barrier_response.content[:300]}")
+                barrier_error = ""
                 try:
                     raw = barrier_response.content.strip()
                     if raw.startswith("```"):
                         raw = re.sub(r'^```\w*\n?', '', raw)
                         raw = re.sub(r'\n?```$', '', raw)
                     barrier_result = json.loads(raw)
-                except Exception:
+                except Exception as e:
+                    barrier_error = f"{type(e).__name__}: {e}"
                     barrier_result = {"has_barrier": False}
 
                 barrier_time = time.time() - t_barrier
@@ -3864,7 +4087,8 @@ Only flag barriers that create a genuine practical problem for a tradie travelin
                                 f"{explanation} — regions ({len(regions_included)}): {regions_included}")
                     _trace(state, "LLM: Barrier Check", barrier_time,
                            f"Barrier found: {barrier_name}",
-                           {"barrier": barrier_name, "radius": ss_radius, "regions": len(regions_included)})
+                           {"barrier": barrier_name, "radius": ss_radius, "regions": len(regions_included),
+                            "tokens": _token_usage(barrier_response)})
                     subtitle = f"{ss_radius}km radius from {base_suburb} crosses {barrier_name}"
                     findings.append({
                         "type": "area_barrier",
@@ -3883,8 +4107,9 @@ Only flag barriers that create a genuine practical problem for a tradie travelin
                 else:
                     logger.info(f"[ASSESS] No barrier pollution for {ss_radius}km from {base_suburb} ({len(regions_included)} regions)")
                     _trace(state, "LLM: Barrier Check", barrier_time,
-                           "No barrier found",
-                           {"radius": ss_radius, "regions": len(regions_included)})
+                           "Unusable reply" if barrier_error else "No barrier found",
+                           {"radius": ss_radius, "regions": len(regions_included),
+                            "tokens": _token_usage(barrier_response)}, error=barrier_error)
 
     if not has_area_finding and ss_suburb:
         strengths.append({"headline": f"Location: {ss_suburb}", "icon": "check"})
@@ -4084,7 +4309,7 @@ TEMPLATE: "Hi [name], we found these [N] things that could get your [type] busin
 
 Say "we" not "I". One sentence, no line breaks. Output ONLY the sentence."""),
         HumanMessage(content=f"Greeting for {first_name or 'the owner'}, a {business_type or 'business'} with {finding_count} improvements."),
-    ])
+    ], llm_cache=True)
     summary_text = summary_response.content.strip().strip('"').split('\n')[0]
 
     # No buttons — each row IS the action, and ✕ closes the wizard
@@ -0,0 +1,103 @@
+"""Incremental extraction of one string field from a JSON object as it streams in.
+
+JSON-mode nodes (service discovery, service area, profile) ask the model for
+an object whose user-facing text sits in one top-level string field
+("response", or "intro" for the profile) next to the structured parts
+(services, service_areas, buttons). `JsonFieldStream` is fed the raw chunks
+and returns the newly decoded characters of that field, so the text can be
+shown while the rest of the object is still being generated. The full reply
+is still parsed with `json.loads` once complete; this only has to be right
+about the one field.
+
+Anything before the first "{" (a ```json fence, a stray sentence) is
+skipped. Only keys of the outermost object are matched, so a nested
+"response" key (e.g. inside "services") is ignored.
+"""
+from __future__ import annotations
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldStream:
+    """Feed streamed chunks of a JSON object; get back the decoded text of `field` as it arrives."""
+
+    def __init__(self, field: str = "response"):
+        self.field = field
+        self.done = False          # the field's closing quote has been seen
+        self._started = False      # inside the outermost object
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode: str | None = None   # hex digits of a \\uXXXX escape being read
+        self._high_surrogate: int | None = None
+        self._expect_key = False   # next top-level string is a key
+        self._key: list[str] | None = None   # top-level key being read
+        self._last_key: str | None = None
+        self._capturing = False
+
+    def feed(self, chunk: str) -> str:
+        out: list[str] = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._in_string:
+                self._string_char(ch, out)
+            elif not self._started:
+                if ch == "{":
+                    self._started, self._depth, self._expect_key = True, 1, True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key = []
+                elif self._depth == 1 and self._last_key == self.field:
+                    self._capturing = True
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key, self._last_key = True, None
+        return "".join(out)
+
+    def _string_char(self, ch: str, out: list[str]):
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                try:
+                    code = int(self._unicode, 16)
+                except ValueError:
+                    code = 0xFFFD
+                self._unicode = None
+                if 0xD800 <= code < 0xDC00:
+                    self._high_surrogate = code
+                    return
+                if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                    code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                self._high_surrogate = None
+                self._append(chr(code), out)
+            return
+        if self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+            else:
+                self._append(_ESCAPES.get(ch, ch), out)
+            return
+        if ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._capturing:
+                self._capturing, self.done = False, True
+            elif self._key is not None:
+                self._last_key, self._key = "".join(self._key), None
+        else:
+            self._append(ch, out)
+
+    def _append(self, text: str, out: list[str]):
+        if self._capturing:
+            out.append(text)
+        elif self._key is not None:
+            self._key.append(text)
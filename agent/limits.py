@@ -0,0 +1,211 @@
+"""Concurrency budgets (bulkheads) for turns and upstream calls.
+
+A `Bulkhead` lets `limit` holders in at once and queues at most `max_queue`
+more for up to `max_wait` seconds; past that it raises `Saturated`
+immediately instead of letting work pile up behind a slow dependency. Under
+a burst, the excess fails fast with a retry hint, and the admitted work keeps
+its normal latency.
+
+- turns: server/app.py admits chat turns through one bulkhead and answers
+  503 + Retry-After when it is full
+- upstream HTTP: `LimitedTransport` sends every request on the shared
+  httpx client through a per-service bulkhead (abr, nsw, google, brave, vba,
+  wa, ss, and "web" for website probes and scrapes)
+- LLM: `limited(model)` wraps a chat model so each call (streamed or not)
+  holds a slot in the "anthropic" bulkhead
+
+Budgets come from UPSTREAM_LIMITS in agent/config.py. Counters are read by
+/metrics.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from agent.config import (
+    UPSTREAM_LIMITS, UPSTREAM_DEFAULT_LIMIT, UPSTREAM_QUEUE_TIMEOUT,
+    ABR_BASE_URL, NSW_TRADES_BASE_URL, GOOGLE_PLACES_BASE_URL, BRAVE_SEARCH_BASE_URL,
+    VBA_BASE_URL, WA_DMIRS_BASE_URL, SS_API_URL,
+)
+
+
+class Saturated(Exception):
+    """A bulkhead is full and its queue is full (or the wait timed out)."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is saturated — retry in {retry_after:g}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class UpstreamSaturated(httpx.TransportError):
+    """Raised by LimitedTransport; a TransportError so tools' existing httpx error handling applies."""
+
+
+class Bulkhead:
+    """At most `limit` concurrent holders; at most `max_queue` waiting, each for up to `max_wait` seconds."""
+
+    def __init__(self, name: str, limit: int, max_queue: int | None = None, max_wait: float = 5.0):
+        self.name = name
+        self.limit = limit
+        self.max_queue = limit * 4 if max_queue is None else max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._sem: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.max_wait))
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives bind to a loop; module-level bulkheads outlive test loops
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._sem, self._loop = asyncio.Semaphore(self.limit), loop
+            self.in_flight = self.waiting = 0
+        return self._sem
+
+    async def acquire(self):
+        sem = self._semaphore()
+        if sem.locked():
+            if self.waiting >= self.max_queue or self.max_wait <= 0:
+                self.rejected += 1
+                raise Saturated(self.name, self.retry_after)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(sem.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Saturated(self.name, self.retry_after) from None
+            finally:
+                self.waiting -= 1
+        else:
+            await sem.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"name": self.name, "limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting,
+                "admitted": self.admitted, "rejected": self.rejected}
+
+
+# ────────── UPSTREAM BUDGETS ──────────
+
+_bulkheads: dict[str, Bulkhead] = {}
+
+
+def _service_prefixes() -> list[tuple[str, str, str]]:
+    """(host, path prefix, service) for each configured upstream, longest prefix first.
+
+    Path prefixes tell services apart when they share a host (e.g. the fixture server).
+    """
+    prefixes = []
+    for service, url in (("abr", ABR_BASE_URL), ("nsw", NSW_TRADES_BASE_URL), ("google", GOOGLE_PLACES_BASE_URL),
+                         ("brave", BRAVE_SEARCH_BASE_URL), ("vba", VBA_BASE_URL), ("wa", WA_DMIRS_BASE_URL),
+                         ("ss", SS_API_URL)):
+        if url:
+            parsed = urlparse(url)
+            prefixes.append((parsed.netloc, parsed.path.rstrip("/"), service))
+    return sorted(prefixes, key=lambda p: -len(p[1]))
+
+
+_SERVICE_PREFIXES = _service_prefixes()
+
+
+def service_for(url: httpx.URL) -> str:
+    """Budget name for a request URL: a configured upstream's service name, else "web"."""
+    for host, prefix, service in _SERVICE_PREFIXES:
+        if url.netloc.decode() == host and url.path.startswith(prefix):
+            return service
+    return "web"
+
+
+def bulkhead(name: str) -> Bulkhead:
+    """The shared upstream bulkhead for a service, created on first use."""
+    b = _bulkheads.get(name)
+    if b is None:
+        b = _bulkheads[name] = Bulkhead(name, UPSTREAM_LIMITS.get(name, UPSTREAM_DEFAULT_LIMIT),
+                                        max_wait=UPSTREAM_QUEUE_TIMEOUT)
+    return b
+
+
+def upstream_stats() -> list[dict]:
+    return [b.stats() for b in _bulkheads.values()]
+
+
+class LimitedTransport(httpx.AsyncBaseTransport):
+    """Sends each request through its service's bulkhead (held until the response headers arrive)."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport | None = None):
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            async with bulkhead(service_for(request.url)).slot():
+                return await self.inner.handle_async_request(request)
+        except Saturated as e:
+            raise UpstreamSaturated(str(e), request=request) from None
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class LimitedChatModel(BaseChatModel):
+    """Runs each async call of `inner` inside an upstream bulkhead. Sync calls pass straight through."""
+
+    inner: BaseChatModel
+    budget: str = "anthropic"
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> dict:
+        return self.inner._identifying_params
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        async with bulkhead(self.budget).slot():
+            return await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with bulkhead(self.budget).slot():
+            inner_type = type(self.inner)
+            if inner_type._astream is BaseChatModel._astream and inner_type._stream is BaseChatModel._stream:
+                # Inner model can't stream (e.g. record/replay): one chunk with the whole reply
+                result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=result.generations[0].message.content))
+                return
+            async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+
+
+def limited(model: BaseChatModel, budget: str = "anthropic") -> BaseChatModel:
+    """`model` behind an upstream concurrency budget; callbacks move to the wrapper so they fire once."""
+    return LimitedChatModel(inner=model, budget=budget, callbacks=model.callbacks)
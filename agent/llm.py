@@ -0,0 +1,414 @@
+"""Record/replay layer for the chat models (LLM_MODE in agent/config.py).
+
+- live:   call the model (default; `wrap` returns it untouched)
+- record: call the model and save each response under a hash of the
+          normalised prompt
+- replay: answer from the saved responses without calling the model, after
+          LLM_REPLAY_LATENCY ("0", a fixed number of seconds, or "recorded")
+
+Replay makes graph benchmarks deterministic and isolates our own CPU/I/O
+per node from model latency. A prompt with no recording raises
+`CassetteMiss` rather than silently going live.
+
+Recordings are one JSON file per prompt hash in LLM_CASSETTE_DIR, so
+concurrent workers can record into the same directory. Wrapped models
+don't stream tokens; the whole reply arrives at once.
+
+Separately, `cached(model, name)` adds a response cache keyed the same way
+(model settings + normalised messages). It is per call: only
+`ainvoke(..., llm_cache=True)` reads or fills it, for prompts whose answer
+depends on nothing but the prompt (classifying a business from its web
+data, the assessment copy). Entries live in an LRU of LLM_CACHE_MAX_ENTRIES
+for LLM_CACHE_TTL seconds and, with LLM_CACHE_DIR set, on disk too, where
+other workers and restarts find them.
+
+Only usable replies are stored: empty or `max_tokens`-truncated ones never
+are, and passing a parser as `llm_cache=` (instead of True) keeps any reply
+it raises on out of the cache too.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import add_usage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agent.config import (
+    LLM_MODE, LLM_CASSETTE_DIR, LLM_REPLAY_LATENCY, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode was asked for a prompt that was never recorded."""
+
+
+def _normalise(content: Any) -> Any:
+    if isinstance(content, str):
+        return _WS_RE.sub(" ", content).strip()
+    if isinstance(content, list):
+        return [_normalise(c) for c in content]
+    if isinstance(content, dict):
+        return {k: _normalise(v) for k, v in sorted(content.items())}
+    return content
+
+
+def prompt_key(name: str, params: dict, messages: list[BaseMessage]) -> str:
+    """Hash of the model settings and the whitespace-normalised messages."""
+    payload = {
+        "model": name,
+        "params": params,
+        "messages": [[m.type, _normalise(m.content)] for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Cassette:
+    """Directory of `{key}.json` recordings."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def get(self, key: str) -> dict | None:
+        try:
+            return json.loads((self.path / f"{key}.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str):
+        try:
+            (self.path / f"{key}.json").unlink()
+        except FileNotFoundError:
+            pass
+
+    def put(self, key: str, record: dict):
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f, indent=1, default=str)
+        os.replace(tmp, self.path / f"{key}.json")
+
+
+class RecordReplayChatModel(BaseChatModel):
+    """Wraps a chat model; records its responses or replays them by prompt hash."""
+
+    inner: Optional[BaseChatModel] = None
+    name_tag: str
+    params: dict = {}
+    mode: str = "replay"
+    cassette_dir: str = LLM_CASSETTE_DIR
+    replay_latency: str = "0"
+
+    @property
+    def _llm_type(self) -> str:
+        return f"record-replay:{self.name_tag}"
+
+    def _key(self, messages: list[BaseMessage]) -> str:
+        return prompt_key(self.name_tag, self.params, messages)
+
+    def _replay(self, key: str) -> tuple[ChatResult, float]:
+        record = Cassette(self.cassette_dir).get(key)
+        if record is None:
+            raise CassetteMiss(f"No recorded {self.name_tag} response for prompt {key[:12]} in {self.cassette_dir}")
+        if self.replay_latency == "recorded":
+            delay = float(record.get("latency", 0))
+        else:
+            delay = float(self.replay_latency or 0)
+        message = AIMessage(content=record["content"], response_metadata={"replayed": True})
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"usage": record.get("usage") or {}}), delay
+
+    def _record(self, key: str, messages: list[BaseMessage], result: ChatResult, latency: float):
+        message = result.generations[0].message
+        Cassette(self.cassette_dir).put(key, {
+            "model": self.name_tag,
+            "prompt_preview": str(messages[-1].content)[:200] if messages else "",
+            "content": message.content,
+            "latency": round(latency, 3),
+            "usage": (result.llm_output or {}).get("usage") or {},
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages)
+        if self.mode == "replay":
+            result, delay = self._replay(key)
+            time.sleep(delay)
+            return result
+        t0 = time.time()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self._record(key, messages, result, time.time() - t0)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._key(messages)
+        if self.mode == "replay":
+            result, delay = self._replay(key)
+            if delay:
+                await asyncio.sleep(delay)
+            return result
+        t0 = time.time()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        self._record(key, messages, result, time.time() - t0)
+        return result
+
+
+def wrap(model: BaseChatModel, name: str, *, mode: str | None = None) -> BaseChatModel:
+    """The model itself in live mode, else a RecordReplayChatModel around it."""
+    mode = (mode or LLM_MODE or "live").lower()
+    if mode == "live":
+        return model
+    if mode not in ("record", "replay"):
+        logger.warning(f"[LLM] Unknown LLM_MODE '{mode}' — using live")
+        return model
+    params = {k: getattr(model, k, None) for k in ("model", "max_tokens", "temperature")}
+    logger.info(f"[LLM] {name}: {mode} mode, cassette {LLM_CASSETTE_DIR}")
+    return RecordReplayChatModel(
+        inner=model, name_tag=name, params=params, mode=mode, cassette_dir=LLM_CASSETTE_DIR,
+        replay_latency=LLM_REPLAY_LATENCY, callbacks=model.callbacks,
+    )
+
+
+# ────────── RESPONSE CACHE ──────────
+
+class ResponseCache:
+    """LRU + TTL map of prompt key → reply, optionally backed by a Cassette directory. Thread-safe."""
+
+    def __init__(self, max_entries: int, ttl: float, disk_dir: str | Path | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = Cassette(disk_dir) if disk_dir else None
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts: dict[tuple[str, str], int] = {}   # (model name, hit | disk_hit | miss) → calls
+        self.evictions = 0
+
+    def _count(self, name: str, result: str):
+        with self._lock:
+            self.counts[(name, result)] = self.counts.get((name, result), 0) + 1
+
+    def _fresh(self, record: dict) -> bool:
+        return time.time() - record.get("cached_at", 0) < self.ttl
+
+    def _remember(self, key: str, record: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = record
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_memory(self, key: str) -> dict | None:
+        with self._lock:
+            record = self._entries.get(key)
+            if record is not None:
+                if self._fresh(record):
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    record = None
+        return record
+
+    def _get_disk(self, key: str) -> dict | None:
+        """Fresh record from the disk tier; stale or unreadable files are deleted."""
+        try:
+            record = self.disk.get(key)
+        except ValueError as e:   # truncated or corrupt file (json.JSONDecodeError)
+            logger.warning(f"[LLM] Dropping unreadable cache file {key[:12]}: {e}")
+            record = {}
+        if record is not None and self._fresh(record):
+            return record
+        if record is not None:
+            self.disk.delete(key)
+        return None
+
+    def _found(self, name: str, key: str, record: dict | None, tier: str) -> dict | None:
+        if record is not None and tier == "disk_hit":
+            self._remember(key, record)
+        self._count(name, tier if record is not None else "miss")
+        return record
+
+    def get(self, name: str, key: str) -> dict | None:
+        record = self._get_memory(key)
+        if record is not None or self.disk is None:
+            return self._found(name, key, record, "hit")
+        return self._found(name, key, self._get_disk(key), "disk_hit")
+
+    async def aget(self, name: str, key: str) -> dict | None:
+        """`get` with the disk tier read in a thread."""
+        record = self._get_memory(key)
+        if record is not None or self.disk is None:
+            return self._found(name, key, record, "hit")
+        return self._found(name, key, await asyncio.to_thread(self._get_disk, key), "disk_hit")
+
+    def _record(self, key: str, content: Any, usage: dict | None) -> dict:
+        record = {"content": content, "usage": usage or {}, "cached_at": time.time()}
+        self._remember(key, record)
+        return record
+
+    def _put_disk(self, key: str, record: dict):
+        try:
+            self.disk.put(key, record)
+        except OSError as e:
+            logger.warning(f"[LLM] Cache write to {self.disk.path} failed: {e}")
+
+    def put(self, key: str, content: Any, usage: dict | None = None):
+        record = self._record(key, content, usage)
+        if self.disk is not None:
+            self._put_disk(key, record)
+
+    async def aput(self, key: str, content: Any, usage: dict | None = None):
+        """`put` with the disk tier written in a thread."""
+        record = self._record(key, content, usage)
+        if self.disk is not None:
+            await asyncio.to_thread(self._put_disk, key, record)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "evictions": self.evictions, "requests": dict(self.counts)}
+
+
+response_cache = ResponseCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_DIR or None)
+
+
+def _cached_result(record: dict) -> ChatResult:
+    message = AIMessage(content=record["content"], response_metadata={"cached": True})
+    return ChatResult(generations=[ChatGeneration(message=message)],
+                      llm_output={"usage": record.get("usage") or {}})
+
+
+class CachedChatModel(BaseChatModel):
+    """Wraps a chat model; calls made with `llm_cache=True` (or a parser) are answered from `store` when possible."""
+
+    inner: BaseChatModel
+    name_tag: str
+    params: dict = {}
+    store: Any = None   # not `cache`: BaseChatModel uses that name for LangChain's global cache
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> dict:
+        return self.inner._identifying_params
+
+    def _opt_in(self, messages, stop, kwargs) -> tuple[str | None, Callable | None]:
+        """(key, validator) for an opted-in call; (None, None) when the cache isn't used."""
+        opt_in = kwargs.pop("llm_cache", False)
+        if not opt_in or self.store is None:
+            return None, None
+        key = prompt_key(self.name_tag, {**self.params, "stop": stop, **kwargs}, messages)
+        return key, opt_in if callable(opt_in) else None
+
+    def _cacheable(self, validate: Callable | None, content: Any, metadata: dict) -> bool:
+        """False for replies that are empty, truncated, or rejected by the caller's parser."""
+        if not (content.strip() if isinstance(content, str) else content):
+            return False
+        if metadata.get("stop_reason") in ("max_tokens", "length"):
+            logger.info(f"[LLM] Not caching truncated {self.name_tag} reply")
+            return False
+        if validate is not None:
+            try:
+                validate(content)
+            except Exception as e:
+                logger.info(f"[LLM] Not caching unusable {self.name_tag} reply: {e}")
+                return False
+        return True
+
+    @staticmethod
+    def _reply(result: ChatResult) -> tuple[Any, dict, dict | None]:
+        """(content, metadata, usage) of a generated result."""
+        generation = result.generations[0]
+        metadata = {**(generation.generation_info or {}), **generation.message.response_metadata}
+        return generation.message.content, metadata, (result.llm_output or {}).get("usage")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key, validate = self._opt_in(messages, stop, kwargs)
+        record = self.store.get(self.name_tag, key) if key is not None else None
+        if record is not None:
+            return _cached_result(record)
+        result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        content, metadata, usage = self._reply(result)
+        if key is not None and self._cacheable(validate, content, metadata):
+            self.store.put(key, content, usage)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key, validate = self._opt_in(messages, stop, kwargs)
+        record = await self.store.aget(self.name_tag, key) if key is not None else None
+        if record is not None:
+            return _cached_result(record)
+        result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        await self._astore(key, validate, *self._reply(result))
+        return result
+
+    async def _astore(self, key: str | None, validate: Callable | None, content: Any, metadata: dict,
+                      usage: dict | None):
+        if key is not None and self._cacheable(validate, content, metadata):
+            await self.store.aput(key, content, usage)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key, validate = self._opt_in(messages, stop, kwargs)
+        record = await self.store.aget(self.name_tag, key) if key is not None else None
+        if record is not None:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=record["content"],
+                                                             response_metadata={"cached": True}))
+            return
+        inner_type = type(self.inner)
+        if inner_type._astream is BaseChatModel._astream and inner_type._stream is BaseChatModel._stream:
+            result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            await self._astore(key, validate, *self._reply(result))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=result.generations[0].message.content))
+            return
+        parts, metadata, usage = [], {}, None
+        async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            if isinstance(chunk.message.content, str):
+                parts.append(chunk.message.content)
+            metadata.update(chunk.generation_info or {})
+            metadata.update(chunk.message.response_metadata)
+            if chunk.message.usage_metadata:
+                usage = add_usage(usage, chunk.message.usage_metadata)
+            yield chunk
+        await self._astore(key, validate, "".join(parts), metadata, usage)
+
+
+def cached(model: BaseChatModel, name: str, cache: ResponseCache | None = None) -> BaseChatModel:
+    """`model` with per-call response caching (`llm_cache=True`); callbacks move to the wrapper.
+
+    Always wraps, so `llm_cache=True` is safe to pass even with the cache
+    disabled (LLM_CACHE_MAX_ENTRIES=0 and no LLM_CACHE_DIR).
+    """
+    cache = cache or response_cache
+    enabled = cache.max_entries > 0 or cache.disk is not None
+    base = model
+    while getattr(base, "model", None) is None and getattr(base, "inner", None) is not None:
+        base = base.inner   # limited()/wrap() wrappers: the settings live on the real model
+    params = {k: getattr(base, k, None) for k in ("model", "max_tokens", "temperature")}
+    return CachedChatModel(inner=model, name_tag=name, params=params, store=cache if enabled else None,
+                           callbacks=model.callbacks)
+
+
+def cache_stats() -> dict:
+    return response_cache.stats()
@@ -0,0 +1,97 @@
+"""Per-request progress events for the streaming chat endpoint.
+
+The server installs a sink for the duration of a turn; nodes, `_trace` and
+text LLM calls emit into it. The sink lives in a ContextVar, so it follows
+the turn into `asyncio.gather` / `create_task` children and concurrent
+sessions never see each other's events. With no sink installed (plain
+/api/chat), `emit` is a no-op. `muted(...)` drops chosen events for work
+whose output may be discarded (e.g. a speculative node run).
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage
+
+from agent.json_stream import JsonFieldStream
+
+_sink: ContextVar[Optional[Callable[[str, dict], None]]] = ContextVar("progress_sink", default=None)
+_muted: ContextVar[frozenset] = ContextVar("progress_muted", default=frozenset())
+
+
+@contextmanager
+def progress_sink(callback: Optional[Callable[[str, dict], None]]):
+    """Route events emitted in this context to callback(event, data) (None mutes)."""
+    token = _sink.set(callback)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+def streaming() -> bool:
+    """True when a sink is installed (i.e. someone is listening)."""
+    return _sink.get() is not None
+
+
+@contextmanager
+def muted(*events: str):
+    """Drop these events (e.g. "token") emitted in this context."""
+    token = _muted.set(_muted.get() | frozenset(events))
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def emit(event: str, **data) -> None:
+    sink = _sink.get()
+    if sink is not None and event not in _muted.get():
+        sink(event, data)
+
+
+async def ainvoke_text(llm, messages: list) -> AIMessage:
+    """`llm.ainvoke(messages)`, streaming tokens as "token" events when a sink is installed.
+
+    Only for calls whose raw output is shown to the user — JSON responses
+    would stream as unreadable fragments. Returns the whole reply, with the
+    token usage of the stream.
+    """
+    if not streaming():
+        return await llm.ainvoke(messages)
+    merged = None
+    async for chunk in llm.astream(messages):
+        merged = chunk if merged is None else merged + chunk
+        if isinstance(chunk.content, str) and chunk.content:
+            emit("token", text=chunk.content)
+    return _whole_reply(merged)
+
+
+async def ainvoke_json(llm, messages: list, field: str = "response") -> AIMessage:
+    """`llm.ainvoke(messages)` for a JSON reply, streaming its `field` string as "token" events.
+
+    The user-facing text is decoded (agent/json_stream.py) and shown while the
+    structured parts of the object are still being generated. Returns the
+    whole reply, with the token usage of the stream.
+    """
+    if not streaming():
+        return await llm.ainvoke(messages)
+    parser = JsonFieldStream(field)
+    merged = None
+    async for chunk in llm.astream(messages):
+        merged = chunk if merged is None else merged + chunk
+        if isinstance(chunk.content, str) and chunk.content and not parser.done:
+            text = parser.feed(chunk.content)
+            if text:
+                emit("token", text=text)
+    return _whole_reply(merged)
+
+
+def _whole_reply(merged) -> AIMessage:
+    """The AIMessage for merged stream chunks, keeping usage_metadata for token reporting."""
+    if merged is None:
+        return AIMessage(content="")
+    return AIMessage(content=merged.content, usage_metadata=merged.usage_metadata,
+                     response_metadata=merged.response_metadata)
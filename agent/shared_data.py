@@ -0,0 +1,324 @@
+"""Large read-only datasets in one memory-mapped SQLite file shared by all workers.
+
+By default each process parses resources/ into its own dicts: the QBCC
+licence indexes, suburbs.csv, the subcategories.json taxonomy and the
+improve-flow business CSV. With
+SHARED_DATA_PATH set, they are built once into a SQLite file instead, and
+every worker opens it read-only (`immutable`, `mmap_size`). The pages then
+live once in the OS page cache, mapped into each worker, so adding workers
+adds throughput without multiplying the datasets in memory.
+
+The file is rebuilt when a source file's size or mtime changes. Building
+happens under a file lock and is published by atomic rename, so workers
+starting together build it once; `scripts/build_shared_data.py` builds it
+ahead of time (e.g. before uvicorn forks its workers).
+"""
+from __future__ import annotations
+
+import csv
+import fcntl
+import json
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+
+from agent.config import SHARED_DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DIR = Path(__file__).parent.parent / "resources"
+BUSINESS_CSV = Path(__file__).parent.parent / "all-contacts_with ID.csv"
+MMAP_SIZE = 512 * 1024 * 1024
+SCHEMA_VERSION = 2
+
+QBCC_STOPWORDS = {"PTY", "LTD", "LIMITED", "THE", "AND", "&"}
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE qbcc (abn TEXT NOT NULL, name_key TEXT NOT NULL, row TEXT NOT NULL);
+CREATE TABLE qbcc_words (word TEXT NOT NULL, name_key TEXT NOT NULL, first_rowid INTEGER NOT NULL);
+CREATE TABLE suburbs (postcode TEXT NOT NULL, lat REAL, lng REAL, row TEXT NOT NULL);
+CREATE TABLE businesses (id TEXT NOT NULL, search TEXT NOT NULL, row TEXT NOT NULL);
+CREATE TABLE taxonomy (name TEXT PRIMARY KEY, row TEXT NOT NULL);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_qbcc_abn ON qbcc(abn);
+CREATE INDEX idx_qbcc_name ON qbcc(name_key);
+CREATE INDEX idx_qbcc_words ON qbcc_words(word);
+CREATE INDEX idx_suburbs_postcode ON suburbs(postcode);
+CREATE INDEX idx_suburbs_lat ON suburbs(lat);
+CREATE INDEX idx_businesses_id ON businesses(id);
+"""
+
+
+# ────────── BUILD ──────────
+
+def _sources(resources: Path, business_csv: Path) -> dict[str, Path]:
+    return {"qbcc": resources / "qbcc_licences.csv", "suburbs": resources / "suburbs.csv",
+            "taxonomy": resources / "subcategories.json", "businesses": business_csv}
+
+
+def _signature(sources: dict[str, Path]) -> str:
+    sig = {"schema": SCHEMA_VERSION}
+    for name, path in sources.items():
+        try:
+            st = path.stat()
+            sig[name] = [st.st_size, int(st.st_mtime)]
+        except FileNotFoundError:
+            sig[name] = None
+    return json.dumps(sig, sort_keys=True)
+
+
+def _stored_signature(path: Path) -> str | None:
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def business_record(row: dict) -> dict | None:
+    """One improve-flow search entry from a business CSV row (None for rows without an ID)."""
+    biz_id = (row.get("Business ID") or "").strip()
+    if not biz_id:
+        return None
+    return {
+        "id": biz_id,
+        "name": (row.get("Business Name") or "").strip(),
+        "industry": (row.get("Industry") or "").strip(),
+        "city": (row.get("City") or "").strip(),
+        "reviews": row.get("Number of Reviews", "0"),
+        "rating": row.get("Star Rating", "0"),
+        "status": (row.get("Business Status") or "").strip(),
+        "membership": (row.get("membership_status1") or "").strip(),
+    }
+
+
+def taxonomy_text(categories: Mapping[str, dict]) -> str:
+    """The category taxonomy as indented text for the LLM prompt."""
+    if not categories:
+        return "Category taxonomy not available."
+    lines = []
+    for cat_key, cat_data in categories.items():
+        cat_name = cat_data.get("category_name", cat_key)
+        cat_id = cat_data.get("category_id", 0)
+        subcats = cat_data.get("subcategories", [])
+        if subcats:
+            lines.append(f"{cat_name} (id: {cat_id}):")
+            lines.extend(f"  - {sc.get('subcategory_name', 'Unknown')} (id: {sc.get('subcategory_id', 0)})"
+                         for sc in subcats)
+        else:
+            lines.append(f"{cat_name} (id: {cat_id})")
+    return "\n".join(lines)
+
+
+def _load_qbcc(conn: sqlite3.Connection, path: Path):
+    first_rowid: dict[str, int] = {}
+    with open(path, encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            abn = row.get("ABN", "").strip().replace(" ", "")
+            name_key = row.get("Licensee Name", "").strip().upper()
+            if not abn and not name_key:
+                continue
+            cur = conn.execute("INSERT INTO qbcc VALUES (?, ?, ?)", (abn, name_key, json.dumps(row)))
+            if name_key and name_key not in first_rowid:
+                first_rowid[name_key] = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO qbcc_words VALUES (?, ?, ?)",
+        ((word, key, rowid) for key, rowid in first_rowid.items() for word in set(key.split()) - QBCC_STOPWORDS),
+    )
+
+
+def _load_suburbs(conn: sqlite3.Connection, path: Path):
+    def coords(row):
+        try:
+            return float(row.get("lat") or 0) or None, float(row.get("lng") or 0) or None
+        except ValueError:
+            return None, None
+
+    with open(path, newline="", encoding="utf-8") as f:
+        conn.executemany("INSERT INTO suburbs VALUES (?, ?, ?, ?)",
+                         ((row.get("postcode", ""), *coords(row), json.dumps(row)) for row in csv.DictReader(f)))
+
+
+def _load_businesses(conn: sqlite3.Connection, path: Path):
+    with open(path, encoding="utf-8-sig") as f:
+        records = filter(None, (business_record(row) for row in csv.DictReader(f)))
+        conn.executemany("INSERT INTO businesses VALUES (?, ?, ?)",
+                         ((b["id"], f"{b['name']}\n{b['industry']}".lower(), json.dumps(b)) for b in records))
+
+
+def _load_taxonomy(conn: sqlite3.Connection, path: Path):
+    with open(path) as f:
+        categories = json.load(f)
+    conn.executemany("INSERT INTO taxonomy VALUES (?, ?)",
+                     ((name, json.dumps(data)) for name, data in categories.items()))
+    conn.execute("INSERT INTO meta VALUES ('taxonomy_text', ?)", (taxonomy_text(categories),))
+
+
+def build(path: str | Path = SHARED_DATA_PATH, *, resources: Path = RESOURCES_DIR,
+          business_csv: Path = BUSINESS_CSV, force: bool = False) -> bool:
+    """Build the shared data file if missing or stale. Returns True if this call built it."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sources = _sources(resources, business_csv)
+    signature = _signature(sources)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)   # one builder; the others wait, then find it current
+        if not force and _stored_signature(path) == signature:
+            return False
+        t0 = time.time()
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".building")
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(tmp)
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.executescript(_SCHEMA)
+            loaders = {"qbcc": _load_qbcc, "suburbs": _load_suburbs, "taxonomy": _load_taxonomy,
+                       "businesses": _load_businesses}
+            for name, loader in loaders.items():
+                if sources[name].exists():
+                    loader(conn, sources[name])
+            conn.executescript(_INDEXES)
+            conn.execute("INSERT INTO meta VALUES ('signature', ?)", (signature,))
+            conn.commit()
+            conn.execute("VACUUM")
+            conn.close()
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    logger.info(f"[SHARED] Built {path} ({path.stat().st_size / 1e6:.1f} MB) in {time.time() - t0:.1f}s")
+    return True
+
+
+# ────────── READ ──────────
+
+class SharedData:
+    """Read-only queries over the built file. One mmap'd connection per thread."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        counts = self._conn().execute(
+            "SELECT (SELECT COUNT(*) FROM qbcc), (SELECT COUNT(*) FROM suburbs), (SELECT COUNT(*) FROM taxonomy), "
+            "(SELECT COUNT(*) FROM businesses)"
+        ).fetchone()
+        self.qbcc_count, self.suburb_count, self.category_count, self.business_count = counts
+        self.categories = _Taxonomy(self)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # immutable: no locking or change detection — the file is replaced, never modified
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, sql: str, params: tuple = ()) -> list[dict]:
+        return [json.loads(r[0]) for r in self._conn().execute(sql, params)]
+
+    # QBCC licences
+
+    def qbcc_by_abn(self, abn: str) -> list[dict]:
+        return self._rows("SELECT row FROM qbcc WHERE abn = ? ORDER BY rowid", (abn,))
+
+    def qbcc_by_name(self, name_key: str) -> list[dict]:
+        return self._rows("SELECT row FROM qbcc WHERE name_key = ? ORDER BY rowid", (name_key,))
+
+    def qbcc_name_candidates(self, words: set[str]) -> list[str]:
+        """Licensee name keys sharing at least one word with `words`, in CSV order."""
+        if not words:
+            return []
+        marks = ",".join("?" * len(words))
+        return [r[0] for r in self._conn().execute(
+            f"SELECT name_key, MIN(first_rowid) AS first FROM qbcc_words WHERE word IN ({marks}) "
+            f"GROUP BY name_key ORDER BY first", tuple(words))]
+
+    # Suburbs
+
+    def suburbs_by_postcode(self, postcode: str) -> list[dict]:
+        return self._rows("SELECT row FROM suburbs WHERE postcode = ? ORDER BY rowid", (postcode,))
+
+    def suburbs_near(self, lat: float, lng: float, radius_km: float) -> list[dict]:
+        """Suburbs inside the lat/lng bounding box of the radius (callers apply the exact distance)."""
+        dlat = radius_km / 111.0
+        dlng = radius_km / max(111.0 * math.cos(math.radians(lat)), 1e-6)
+        return self._rows(
+            "SELECT row FROM suburbs WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ? ORDER BY rowid",
+            (lat - dlat, lat + dlat, lng - dlng, lng + dlng))
+
+    # Category taxonomy
+
+    def taxonomy_text(self) -> str:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'taxonomy_text'").fetchone()
+        return row[0] if row else taxonomy_text({})
+
+    # Improve-flow business search
+
+    def search_businesses(self, q: str, limit: int) -> list[dict]:
+        """Exact ID match first, then name/industry substring matches in CSV order."""
+        results = self._rows("SELECT row FROM businesses WHERE id = ? LIMIT 1", (q,)) if q.isdigit() else []
+        pattern = "%" + q.lower().strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        for b in self._rows("SELECT row FROM businesses WHERE search LIKE ? ESCAPE '\\' ORDER BY rowid LIMIT ?",
+                            (pattern, limit + 1)):
+            if b not in results:
+                results.append(b)
+            if len(results) >= limit:
+                break
+        return results
+
+
+class _Taxonomy(Mapping):
+    """subcategories.json as a read-only mapping; each category is decoded on access."""
+
+    def __init__(self, data: SharedData):
+        self._data = data
+
+    def __getitem__(self, name: str) -> dict:
+        row = self._data._conn().execute("SELECT row FROM taxonomy WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def __contains__(self, name) -> bool:
+        return self._data._conn().execute("SELECT 1 FROM taxonomy WHERE name = ?", (name,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([r[0] for r in self._data._conn().execute("SELECT name FROM taxonomy ORDER BY rowid")])
+
+    def __len__(self) -> int:
+        return self._data.category_count
+
+
+_store: SharedData | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SharedData | None:
+    """The process's SharedData, building the file first if needed; None when SHARED_DATA_PATH is unset."""
+    global _store
+    if not SHARED_DATA_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            build(SHARED_DATA_PATH)
+            _store = SharedData(SHARED_DATA_PATH)
+            logger.info(f"[SHARED] Mapped {SHARED_DATA_PATH}: {_store.qbcc_count} QBCC rows, "
+                        f"{_store.suburb_count} suburbs, {_store.category_count} categories, "
+                        f"{_store.business_count} businesses")
+    return _store
@@ -0,0 +1,151 @@
+"""Compact binary snapshots of OnboardingState.
+
+Used by the session stores to keep idle sessions small in memory and to
+persist sessions to SQLite/Redis. A snapshot is:
+
+    b"OS" | format version (1 byte) | codec flags (1 byte) | payload
+
+The payload is a list of [key, value] pairs. Known state keys are written
+as their index in _KEY_TABLE (append-only — never reorder or remove), other
+keys as strings. Messages are stored as plain [kind, content] pairs; the
+LangChain metadata attached to model responses is not kept.
+
+msgpack + zstd are used when installed, JSON + zlib otherwise; the flags
+byte records which, so either side can read the other's snapshots as long
+as the codec is available.
+"""
+from __future__ import annotations
+
+import json
+import zlib
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - exercised only without msgpack
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - exercised only without zstandard
+    zstandard = None
+
+_MAGIC = b"OS"
+_FORMAT_VERSION = 1
+
+_FLAG_MSGPACK = 0x01
+_FLAG_ZSTD = 0x02
+_FLAG_ZLIB = 0x04
+
+_ZSTD_LEVEL = 3
+_MIN_COMPRESS_BYTES = 256
+
+# Append-only: a key's position is its wire ID.
+_KEY_TABLE = (
+    "session_id", "current_node", "messages",
+    "business_name_input", "abn_input", "abr_results", "business_name", "legal_name",
+    "abn", "entity_type", "gst_registered", "business_verified", "business_postcode",
+    "business_state", "licence_info", "licence_classes", "_needs_licence_number",
+    "_licence_self_report", "web_results", "website_text", "services_raw", "services",
+    "services_confirmed", "_svc_turn", "_specialist_gap_ids", "_pending_cluster_ids",
+    "location_raw", "service_areas", "service_areas_confirmed", "contact_name",
+    "contact_phone", "confirmed", "output_json", "abn_registration_date",
+    "years_in_business", "profile_description", "profile_description_draft",
+    "profile_logo", "profile_photos", "profile_saved", "profile_intro", "google_rating",
+    "google_review_count", "google_reviews", "business_website", "google_business_name",
+    "google_primary_type", "google_types", "business_suburb", "google_address",
+    "pricing_shown", "subscription_plan", "subscription_billing", "subscription_price",
+    "_selected_plan", "_flow_mode", "_ss_profile", "_ss_business_id", "_assessment",
+    "_assessment_shown", "_improve_fixes", "_improve_fix_total", "_improve_fix_index",
+    "_verification_mode", "_description_comparison", "_description_improved",
+    "_needs_logo", "_needs_photos", "buttons", "_auto_chained",
+    "_needs_trading_name", "_created_at", "_last_active", "_version",
+    "google_photos", "_is_trade_business", "_detected_categories", "_abr_match",
+    "_needs_licence_holder_name", "_website_asked", "_website_url_processed",
+    "_category_suggestions_shown", "_category_suggestions", "_api_trace",
+)
+_KEY_IDS = {k: i for i, k in enumerate(_KEY_TABLE)}
+
+_MSG_KINDS = (HumanMessage, AIMessage, SystemMessage)
+_MSG_KIND_IDS = {cls: i for i, cls in enumerate(_MSG_KINDS)}
+
+_zstd_c = zstandard.ZstdCompressor(level=_ZSTD_LEVEL) if zstandard else None
+_zstd_d = zstandard.ZstdDecompressor() if zstandard else None
+
+
+def _pack_message(msg) -> list:
+    if isinstance(msg, BaseMessage):
+        return [_MSG_KIND_IDS.get(type(msg), 1), msg.content]
+    return [1, str(msg)]
+
+
+def _unpack_message(pair) -> BaseMessage:
+    kind, content = pair
+    return _MSG_KINDS[kind](content=content)
+
+
+def _fallback(obj):
+    """Encode values msgpack/json can't represent natively (sets, tuples, etc.)."""
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps_state(state: dict) -> bytes:
+    """Serialise a session state dict to a compact snapshot."""
+    pairs = []
+    for key, value in state.items():
+        if key == "messages":
+            value = [_pack_message(m) for m in value or []]
+        pairs.append([_KEY_IDS.get(key, key), value])
+
+    flags = 0
+    if msgpack is not None:
+        body = msgpack.packb(pairs, default=_fallback, use_bin_type=True)
+        flags |= _FLAG_MSGPACK
+    else:
+        body = json.dumps(pairs, default=_fallback, separators=(",", ":")).encode()
+
+    if len(body) >= _MIN_COMPRESS_BYTES:
+        if _zstd_c is not None:
+            body = _zstd_c.compress(body)
+            flags |= _FLAG_ZSTD
+        else:
+            body = zlib.compress(body, 6)
+            flags |= _FLAG_ZLIB
+
+    return _MAGIC + bytes((_FORMAT_VERSION, flags)) + body
+
+
+def loads_state(blob: bytes) -> dict:
+    """Inverse of dumps_state."""
+    if blob[:2] != _MAGIC:
+        raise ValueError("Not an OnboardingState snapshot")
+    if blob[2] != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {blob[2]}")
+    flags = blob[3]
+    body = blob[4:]
+
+    if flags & _FLAG_ZSTD:
+        if _zstd_d is None:
+            raise RuntimeError("Snapshot is zstd-compressed but zstandard is not installed")
+        body = _zstd_d.decompress(body)
+    elif flags & _FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    if flags & _FLAG_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Snapshot is msgpack-encoded but msgpack is not installed")
+        pairs = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    else:
+        pairs = json.loads(body)
+
+    state = {}
+    for key, value in pairs:
+        if isinstance(key, int):
+            key = _KEY_TABLE[key]
+        if key == "messages":
+            value = [_unpack_message(m) for m in value or []]
+        state[key] = value
+    return state
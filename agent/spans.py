@@ -0,0 +1,267 @@
+"""Hierarchical timing spans (turn → node → tool → HTTP / LLM request), per session.
+
+`_trace` entries are flat and only carry a duration, so they can't show
+which calls in an `asyncio.gather` overlapped or what ran after it. Spans
+carry start/end timestamps, a parent and the trace (turn) they belong to,
+and are exported in Chrome Trace Event format for chrome://tracing,
+Perfetto, or the debug page.
+
+The server opens a `recording` per turn. `span` / `traced` nest under
+whatever span is current; the current span lives in a ContextVar, so
+`gather` / `create_task` children (each drawn on its own track) and
+`to_thread` workers parent correctly. With no recording open every hook
+is a no-op. Outbound HTTP is captured via `HTTPX_EVENT_HOOKS`, LLM calls
+via `LLM_CALLBACK`.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+MAX_SESSIONS = 200          # sessions whose spans are kept (least recently recorded dropped)
+MAX_TURNS_PER_SESSION = 50  # recordings kept per session, oldest dropped
+
+
+class Span:
+    __slots__ = ("name", "cat", "span_id", "parent_id", "trace_id", "track", "start", "end", "args")
+
+    def __init__(self, name: str, cat: str, span_id: int, parent_id: int | None, trace_id: str,
+                 track: str, start: float, args: dict):
+        self.name = name
+        self.cat = cat
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.trace_id = trace_id
+        self.track = track
+        self.start = start
+        self.end: float | None = None
+        self.args = args
+
+    def finish(self, **args):
+        if self.end is None:
+            self.end = time.time()
+        self.args.update(args)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "cat": self.cat, "span_id": self.span_id, "parent_id": self.parent_id,
+            "trace_id": self.trace_id, "track": self.track, "start": self.start, "end": self.end,
+            "args": self.args,
+        }
+
+
+class _Recording:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.spans: list[Span] = []
+        self._ids = itertools.count(1)
+
+    def start(self, name: str, cat: str, parent: Span | None, args: dict, start: float | None = None) -> Span:
+        s = Span(name, cat, next(self._ids), parent.span_id if parent else None, self.trace_id,
+                 _track(), time.time() if start is None else start, args)
+        self.spans.append(s)  # list.append is atomic — to_thread workers record too
+        return s
+
+
+_recording: ContextVar[Optional[_Recording]] = ContextVar("span_recording", default=None)
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+_sessions: OrderedDict[str, list[list[Span]]] = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def _track() -> str:
+    """The asyncio task name, or the thread name outside the event loop."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task.get_name() if task is not None else threading.current_thread().name
+
+
+# ────────── RECORDING ──────────
+
+@contextmanager
+def recording(session_id: str, name: str = "turn", **args):
+    """Record every span opened in this context under one root span, kept for `session_id`."""
+    rec = _Recording(session_id)
+    root = rec.start(name, "turn", None, args)
+    rec_token = _recording.set(rec)
+    cur_token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.args["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(cur_token)
+        _recording.reset(rec_token)
+        root.finish()
+        for s in rec.spans:
+            if s.end is None:  # e.g. an HTTP request that timed out before its response hook
+                s.finish(unfinished=True)
+        _store(session_id, rec.spans)
+
+
+def _store(session_id: str, spans: list[Span]):
+    with _sessions_lock:
+        turns = _sessions.pop(session_id, [])
+        turns.append(spans)
+        del turns[:-MAX_TURNS_PER_SESSION]
+        _sessions[session_id] = turns
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+
+
+def current_trace_id() -> str | None:
+    rec = _recording.get()
+    return rec.trace_id if rec else None
+
+
+def forget(session_id: str):
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+
+
+# ────────── SPANS ──────────
+
+@contextmanager
+def span(name: str, cat: str = "function", **args):
+    """Time the enclosed block as a child of the current span."""
+    rec = _recording.get()
+    if rec is None:
+        yield None
+        return
+    s = rec.start(name, cat, _current.get(), args)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.args["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        s.finish()
+
+
+def traced(cat: str = "tool"):
+    """Decorator: run an async function inside a span named after it."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _recording.get() is None:
+                return await fn(*args, **kwargs)
+            with span(fn.__name__, cat):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_completed(name: str, duration: float, cat: str = "api", **args):
+    """Record a span that just finished and took `duration` seconds (e.g. from `_trace`)."""
+    rec = _recording.get()
+    if rec is None:
+        return
+    now = time.time()
+    rec.start(name, cat, _current.get(), args, start=now - max(duration, 0.0)).finish()
+
+
+def _start_leaf(name: str, cat: str, **args) -> Span | None:
+    rec = _recording.get()
+    return rec.start(name, cat, _current.get(), args) if rec else None
+
+
+# ────────── HTTPX ──────────
+
+async def _on_request(request):
+    # Query strings carry API keys (ABR GUID, Google key) — keep them out of spans
+    s = _start_leaf(f"{request.method} {request.url.host}", "http",
+                    url=str(request.url.copy_with(query=None)))
+    if s is not None:
+        request.extensions["span"] = s
+
+
+async def _on_response(response):
+    s = response.request.extensions.get("span")
+    if s is not None:
+        # Response hooks run once headers arrive, so this is time to first byte
+        s.finish(status=response.status_code)
+
+
+HTTPX_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
+
+
+# ────────── LLM ──────────
+
+class _LLMSpanHandler(BaseCallbackHandler):
+    """LangChain callback that records each chat-model call as an "llm" span."""
+    run_inline = True  # stay in the caller's context so spans land in its recording
+
+    def __init__(self):
+        self._open: dict = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        s = _start_leaf(params.get("model") or params.get("model_name") or "llm", "llm",
+                        messages=sum(len(m) for m in messages))
+        if s is not None:
+            self._open[run_id] = s
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        s = self._open.pop(run_id, None)
+        if s is not None:
+            usage = (response.llm_output or {}).get("usage") or {}
+            args = {k: v for k, v in usage.items() if isinstance(v, (int, float))}
+            generations = response.generations[0] if response.generations else []
+            if generations and getattr(generations[0], "message", None) is not None \
+                    and generations[0].message.response_metadata.get("cached"):
+                args["cached"] = True   # answered by agent/llm.py's response cache
+            s.finish(**args)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        s = self._open.pop(run_id, None)
+        if s is not None:
+            s.finish(error=type(error).__name__)
+
+
+LLM_CALLBACK = _LLMSpanHandler()
+
+
+# ────────── EXPORT ──────────
+
+def session_spans(session_id: str) -> list[list[Span]] | None:
+    with _sessions_lock:
+        turns = _sessions.get(session_id)
+        return list(turns) if turns is not None else None
+
+
+def chrome_trace(session_id: str) -> dict | None:
+    """Chrome Trace Event JSON for a session's recorded turns, or None if none were recorded."""
+    turns = session_spans(session_id)
+    if turns is None:
+        return None
+    tracks: dict[str, int] = {}
+    events = []
+    for spans in turns:
+        for s in spans:
+            tid = tracks.setdefault(s.track, len(tracks) + 1)
+            events.append({
+                "name": s.name, "cat": s.cat, "ph": "X", "pid": 1, "tid": tid,
+                "ts": round(s.start * 1e6), "dur": round(((s.end or s.start) - s.start) * 1e6),
+                "args": {"trace_id": s.trace_id, "span_id": s.span_id, "parent_id": s.parent_id, **s.args},
+            })
+    events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"session {session_id}"}})
+    for track, tid in tracks.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"session_id": session_id}}
@@ -8,6 +8,7 @@ import json
 import logging
 import math
 import re
+from collections.abc import Mapping
 from pathlib import Path
 import httpx
 
@@ -17,25 +18,34 @@ from agent.config import (
     ABR_GUID, NSW_TRADES_API_KEY, NSW_TRADES_AUTH_HEADER, BRAVE_SEARCH_API_KEY,
     GOOGLE_PLACES_API_KEY, ANTHROPIC_API_KEY, MODEL_FAST,
     SS_API_TOKEN, SS_API_URL, SS_API_BASIC_AUTH,
+    ABR_BASE_URL, NSW_TRADES_BASE_URL, GOOGLE_PLACES_BASE_URL, BRAVE_SEARCH_BASE_URL,
+    VBA_BASE_URL, WA_DMIRS_BASE_URL,
 )
+from agent.spans import HTTPX_EVENT_HOOKS, LLM_CALLBACK, traced
+from agent.limits import LimitedTransport, limited as _limited
+from agent import shared_data
 
 RESOURCES_DIR = Path(__file__).parent.parent / "resources"
 
-# Persistent HTTP client — reuses connections across API calls (saves TLS handshake time)
-_http_client = httpx.AsyncClient(timeout=15.0)
+# Persistent HTTP client — reuses connections across API calls (saves TLS handshake time).
+# Every request goes through its upstream's concurrency budget (agent/limits.py).
+_http_client = httpx.AsyncClient(timeout=15.0, event_hooks=HTTPX_EVENT_HOOKS, transport=LimitedTransport())
 
 # Shared LLM client for vision tasks (AI photo filter) — avoids creating per-call instances
 from langchain_anthropic import ChatAnthropic as _ChatAnthropic
-_llm_vision = _ChatAnthropic(
+from agent.llm import cached as _cached, wrap as _wrap_llm
+_llm_vision = _cached(_limited(_wrap_llm(_ChatAnthropic(
     model=MODEL_FAST,
     api_key=ANTHROPIC_API_KEY,
     max_tokens=256,
     temperature=0,
-)
+    callbacks=[LLM_CALLBACK],
+), "vision")), "vision")
 
 
 # ────────── SERVICE SEEKING API ──────────
 
+@traced()
 async def ss_get_business(business_id: str) -> dict:
     """Fetch an existing business profile from the Service Seeking API.
 
@@ -132,6 +142,7 @@ async def ss_get_business(business_id: str) -> dict:
 
 # ────────── ABR LOOKUP ──────────
 
+@traced()
 async def abr_lookup(search_term: str, search_type: str = "name") -> dict:
     """Search the Australian Business Register for business details."""
     if not ABR_GUID:
@@ -139,14 +150,14 @@ async def abr_lookup(search_term: str, search_type: str = "name") -> dict:
 
     try:
         if search_type == "abn":
-            url = "https://abr.business.gov.au/json/AbnDetails.aspx"
+            url = f"{ABR_BASE_URL}/json/AbnDetails.aspx"
             params = {
                 "abn": search_term.replace(" ", ""),
                 "callback": "c",
                 "guid": ABR_GUID,
             }
         else:
-            url = "https://abr.business.gov.au/json/MatchingNames.aspx"
+            url = f"{ABR_BASE_URL}/json/MatchingNames.aspx"
             params = {
                 "name": search_term,
                 "maxResults": "15",
@@ -276,6 +287,7 @@ def _parse_jsonp_response(jsonp_text: str, search_type: str) -> dict:
         return {"results": [], "count": 0, "error": f"Parse error: {e}"}
 
 
+@traced()
 async def enrich_abr_with_entity_names(results: list[dict]) -> list[dict]:
     """Enrich ABR name search results with entity names via parallel ABN lookups.
 
@@ -293,7 +305,7 @@ async def enrich_abr_with_entity_names(results: list[dict]) -> list[dict]:
             return result
         try:
             resp = await _http_client.get(
-                "https://abr.business.gov.au/json/AbnDetails.aspx",
+                f"{ABR_BASE_URL}/json/AbnDetails.aspx",
                 params={"abn": abn, "callback": "c", "guid": ABR_GUID},
             )
             if resp.status_code != 200:
@@ -373,9 +385,12 @@ def _mock_abr_lookup(search_term: str, search_type: str) -> dict:
 
 _categories_cache = None
 
-def _load_categories() -> dict:
-    """Load SS category taxonomy (dict keyed by category name)."""
+def _load_categories() -> Mapping[str, dict]:
+    """Load SS category taxonomy (mapping keyed by category name)."""
     global _categories_cache
+    store = shared_data.get_store()
+    if store is not None:
+        return store.categories
     if _categories_cache is not None:
         return _categories_cache
 
@@ -389,26 +404,10 @@ def _load_categories() -> dict:
 
 def get_category_taxonomy_text() -> str:
     """Get a text representation of the category taxonomy for the LLM."""
-    categories = _load_categories()
-    if not categories:
-        return "Category taxonomy not available."
-
-    lines = []
-    for cat_key, cat_data in categories.items():
-        cat_name = cat_data.get("category_name", cat_key)
-        cat_id = cat_data.get("category_id", 0)
-        subcats = cat_data.get("subcategories", [])
-        if subcats:
-            subcat_strs = []
-            for sc in subcats:
-                sc_name = sc.get("subcategory_name", "Unknown")
-                sc_id = sc.get("subcategory_id", 0)
-                subcat_strs.append(f"  - {sc_name} (id: {sc_id})")
-            lines.append(f"{cat_name} (id: {cat_id}):")
-            lines.extend(subcat_strs)
-        else:
-            lines.append(f"{cat_name} (id: {cat_id})")
-    return "\n".join(lines)
+    store = shared_data.get_store()
+    if store is not None:
+        return store.taxonomy_text()
+    return shared_data.taxonomy_text(_load_categories())
 
 
 # ────────── SERVICE GAP COMPUTATION ──────────
@@ -829,6 +828,7 @@ def extract_licence_from_text(text: str, trade: str, state: str = "VIC") -> dict
     return None
 
 
+@traced()
 async def scan_website_for_licence(url: str, trade: str, state: str = "VIC") -> dict | None:
     """Fetch a website and scan the FULL text for licence patterns (any state).
 
@@ -1012,7 +1012,7 @@ def match_licence(
 
 # ────────── WA DMIRS LICENCE LOOKUP ──────────
 
-_WA_DMIRS_URL = "https://occupationallicensing.dmirs.wa.gov.au/onlinelicencesearch/licenceSearch.jspx"
+_WA_DMIRS_URL = f"{WA_DMIRS_BASE_URL}/onlinelicencesearch/licenceSearch.jspx"
 _WA_DMIRS_PARAMS = {"BranchGroupCode": "WS"}
 
 
@@ -1072,6 +1072,7 @@ def _wa_dmirs_parse_results(html: str) -> list[dict]:
     return results
 
 
+@traced()
 async def wa_dmirs_lookup(search_name: str, trade: str) -> dict | None:
     """Look up a WA trade licence via the DMIRS online search.
 
@@ -1091,6 +1092,8 @@ async def wa_dmirs_lookup(search_name: str, trade: str) -> dict | None:
             timeout=12.0,
             headers={"User-Agent": "Mozilla/5.0 (compatible; ServiceSeeking/1.0)"},
             follow_redirects=True,
+            event_hooks=HTTPX_EVENT_HOOKS,
+            transport=LimitedTransport(),
         ) as client:
             # Step 1: GET search page
             resp = await client.get(_WA_DMIRS_URL, params=_WA_DMIRS_PARAMS)
@@ -1543,6 +1546,19 @@ def _map_single_tier(
     return services, mapped_names
 
 
+def _parse_service_names(text: str) -> set[str]:
+    """Parse the JSON array of service names from the verification reply."""
+    raw = text.strip()
+    # Strip code fences
+    raw = re.sub(r'^```(?:json)?\s*', '', raw)
+    raw = re.sub(r'\s*```$', '', raw)
+    names = json.loads(raw)
+    if not isinstance(names, list):
+        raise ValueError(f"Expected a JSON array, got {type(names).__name__}")
+    return set(names)
+
+
+@traced()
 async def verify_evidence_services(
     evidence_services: list[dict],
     evidence_text: str,
@@ -1578,12 +1594,8 @@ async def verify_evidence_services(
 
     try:
         from langchain_core.messages import HumanMessage as _HM
-        response = await _llm_vision.ainvoke([_HM(content=prompt)])
-        raw = response.content.strip()
-        # Strip code fences
-        raw = re.sub(r'^```(?:json)?\s*', '', raw)
-        raw = re.sub(r'\s*```$', '', raw)
-        confirmed_names = set(json.loads(raw))
+        response = await _llm_vision.ainvoke([_HM(content=prompt)], llm_cache=_parse_service_names)
+        confirmed_names = _parse_service_names(response.content)
 
         verified = [s for s in evidence_services
                     if s.get("subcategory_name", s.get("input", "")) in confirmed_names]
@@ -1770,13 +1782,17 @@ def _load_suburbs() -> list[dict]:
 
 def search_suburbs_by_postcode(postcode: str) -> list[dict]:
     """Find suburbs matching a postcode."""
+    store = shared_data.get_store()
+    if store is not None:
+        return store.suburbs_by_postcode(postcode)
     suburbs = _load_suburbs()
     return [s for s in suburbs if s.get("postcode") == postcode]
 
 
 def get_suburbs_within_radius(lat: float, lng: float, radius_km: float) -> list[dict]:
     """Get suburbs within radius of a point using haversine."""
-    suburbs = _load_suburbs()
+    store = shared_data.get_store()
+    suburbs = store.suburbs_near(lat, lng, radius_km) if store is not None else _load_suburbs()
     results = []
 
     for s in suburbs:
@@ -1971,7 +1987,7 @@ async def _get_nsw_trades_token() -> str:
     try:
         # Per Swagger spec: GET with grant_type as query param, Basic auth in header
         resp = await _http_client.get(
-            "https://api.onegov.nsw.gov.au/oauth/client_credential/accesstoken",
+            f"{NSW_TRADES_BASE_URL}/oauth/client_credential/accesstoken",
             params={"grant_type": "client_credentials"},
             headers={"Authorization": NSW_TRADES_AUTH_HEADER},
         )
@@ -1998,6 +2014,7 @@ async def _get_nsw_trades_token() -> str:
         return ""
 
 
+@traced()
 async def nsw_licence_browse(search_term: str) -> dict:
     """Browse the NSW Fair Trading Trades Register by name.
 
@@ -2022,7 +2039,7 @@ async def nsw_licence_browse(search_term: str) -> dict:
         }
 
         resp = await _http_client.get(
-            "https://api.onegov.nsw.gov.au/tradesregister/v1/browse",
+            f"{NSW_TRADES_BASE_URL}/tradesregister/v1/browse",
             headers=headers,
             params={"searchText": search_term},
         )
@@ -2067,6 +2084,7 @@ async def nsw_licence_browse(search_term: str) -> dict:
         return {"results": [], "error": str(e)}
 
 
+@traced()
 async def nsw_licence_details(licence_id: str) -> dict:
     """Get detailed info for a specific licence.
 
@@ -2089,7 +2107,7 @@ async def nsw_licence_details(licence_id: str) -> dict:
         }
 
         resp = await _http_client.get(
-            "https://api.onegov.nsw.gov.au/tradesregister/v1/details",
+            f"{NSW_TRADES_BASE_URL}/tradesregister/v1/details",
             headers=headers,
             params={"licenceid": licence_id},
         )
@@ -2155,7 +2173,7 @@ async def nsw_licence_details(licence_id: str) -> dict:
 
 # ────────── QBCC LICENCE CSV (QLD) ──────────
 
-_qbcc_licences: dict = {"abn_index": {}, "name_index": {}, "loaded": False}
+_qbcc_licences: dict = {"abn_index": {}, "name_index": {}, "loaded": False, "store": None}
 
 
 def qbcc_load_csv() -> None:
@@ -2163,8 +2181,15 @@ def qbcc_load_csv() -> None:
 
     Reads resources/qbcc_licences.csv (UTF-8 with BOM), builds ABN and name indexes.
     All rows in the published CSV are active licences ("Licence In Force").
-    Called once at server startup.
+    Called once at server startup. With SHARED_DATA_PATH set, maps the shared
+    data file instead (agent/shared_data.py) and builds no per-process indexes.
     """
+    store = shared_data.get_store()
+    if store is not None:
+        _qbcc_licences["store"] = store
+        _qbcc_licences["loaded"] = store.qbcc_count > 0
+        return
+
     csv_path = RESOURCES_DIR / "qbcc_licences.csv"
     if not csv_path.exists():
         logger.warning("[QBCC] CSV not found at %s — QLD licence lookup disabled", csv_path)
@@ -2205,30 +2230,40 @@ def qbcc_licence_lookup(abn: str, legal_name: str) -> dict | None:
     if not _qbcc_licences["loaded"]:
         return None
 
+    store = _qbcc_licences["store"]
+    if store is not None:
+        by_abn, by_name = store.qbcc_by_abn, store.qbcc_by_name
+    else:
+        by_abn = lambda key: _qbcc_licences["abn_index"].get(key, [])
+        by_name = lambda key: _qbcc_licences["name_index"].get(key, [])
+
     abn_clean = abn.strip().replace(" ", "") if abn else ""
-    matched_rows = _qbcc_licences["abn_index"].get(abn_clean, [])
+    matched_rows = by_abn(abn_clean) if abn_clean else []
 
     if not matched_rows and legal_name:
         # Exact match first
         name_key = legal_name.strip().upper()
-        matched_rows = _qbcc_licences["name_index"].get(name_key, [])
+        matched_rows = by_name(name_key)
 
         # Normalised fallback: strip punctuation and common suffixes
         if not matched_rows:
             normalised = re.sub(r'[.\',]', '', name_key)
             normalised = re.sub(r'\s+', ' ', normalised).strip()
             if normalised != name_key:
-                matched_rows = _qbcc_licences["name_index"].get(normalised, [])
+                matched_rows = by_name(normalised)
             # Try word-overlap against index keys if still no match
             if not matched_rows:
-                search_words = set(normalised.split()) - {"PTY", "LTD", "LIMITED", "THE", "AND", "&"}
+                search_words = set(normalised.split()) - shared_data.QBCC_STOPWORDS
                 if len(search_words) >= 2:
-                    for idx_key, rows in _qbcc_licences["name_index"].items():
-                        idx_words = set(idx_key.split()) - {"PTY", "LTD", "LIMITED", "THE", "AND", "&"}
+                    # Shared store: only keys sharing a word (indexed), still in CSV order
+                    idx_keys = store.qbcc_name_candidates(search_words) if store is not None \
+                        else _qbcc_licences["name_index"]
+                    for idx_key in idx_keys:
+                        idx_words = set(idx_key.split()) - shared_data.QBCC_STOPWORDS
                         if idx_words and search_words:
                             overlap = len(search_words & idx_words) / min(len(search_words), len(idx_words))
                             if overlap >= 0.8:
-                                matched_rows = rows
+                                matched_rows = by_name(idx_key)
                                 break
 
     if not matched_rows:
@@ -2324,7 +2359,7 @@ async def _vba_bootstrap_session() -> bool:
             page.on("response", _capture_aura)
 
             await page.goto(
-                "https://bams.vba.vic.gov.au/bams/s/practitioner-search",
+                f"{VBA_BASE_URL}/bams/s/practitioner-search",
                 wait_until="networkidle",
                 timeout=30000,
             )
@@ -2440,7 +2475,7 @@ async def _vba_aura_search(name: str, accreditation_type: str) -> list[dict]:
 
     try:
         resp = await _http_client.post(
-            "https://bams.vba.vic.gov.au/bams/s/sfsites/aura?r=1&aura.ApexAction.execute=1",
+            f"{VBA_BASE_URL}/bams/s/sfsites/aura?r=1&aura.ApexAction.execute=1",
             data={
                 "message": json.dumps(message),
                 "aura.context": json.dumps(aura_context),
@@ -2450,8 +2485,8 @@ async def _vba_aura_search(name: str, accreditation_type: str) -> list[dict]:
             headers={
                 "Content-Type": "application/x-www-form-urlencoded",
                 "Accept": "*/*",
-                "Origin": "https://bams.vba.vic.gov.au",
-                "Referer": f"https://bams.vba.vic.gov.au{page_uri}",
+                "Origin": VBA_BASE_URL,
+                "Referer": f"{VBA_BASE_URL}{page_uri}",
                 "Cookie": cookie_str,
             },
             timeout=15.0,
@@ -2515,6 +2550,7 @@ async def _vba_aura_search(name: str, accreditation_type: str) -> list[dict]:
         return []
 
 
+@traced()
 async def vic_vba_lookup(name: str, trade: str) -> dict:
     """Look up a Victorian practitioner on the VBA register.
 
@@ -2573,6 +2609,7 @@ async def vic_vba_lookup(name: str, trade: str) -> dict:
 
 # ────────── VIC ESV LICENCE LOOKUP (PLAYWRIGHT + CAPTCHA) ──────────
 
+@traced()
 async def esv_rec_lookup(name: str) -> dict:
     """Look up a Victorian Registered Electrical Contractor on the ESV register.
 
@@ -2766,6 +2803,7 @@ async def _esv_solve_captcha(frame) -> str:
 
 # ────────── BRAVE WEB SEARCH ──────────
 
+@traced()
 async def brave_web_search(query: str, count: int = 5) -> list[dict]:
     """Search the web using Brave Search API.
 
@@ -2781,7 +2819,7 @@ async def brave_web_search(query: str, count: int = 5) -> list[dict]:
     for attempt in range(2):
         try:
             resp = await _http_client.get(
-                "https://api.search.brave.com/res/v1/web/search",
+                f"{BRAVE_SEARCH_BASE_URL}/res/v1/web/search",
                 headers={
                     "Accept": "application/json",
                     "X-Subscription-Token": BRAVE_SEARCH_API_KEY,
@@ -2836,12 +2874,14 @@ async def brave_web_search(query: str, count: int = 5) -> list[dict]:
 
 # ────────── GOOGLE PLACES API ──────────
 
+@traced()
 async def google_places_search(business_name: str, state_code: str = "") -> dict:
     """Search Google Places for a business and return rating, reviews, website.
 
     Uses the Places API (New) Text Search endpoint.
     Returns dict with: rating, review_count, website, maps_url, address, name.
-    Returns empty dict on failure.
+    Returns empty dict when nothing matches (or no API key is configured), and
+    {"error": "..."} when the call itself fails, so callers can trace the failure.
     """
     if not GOOGLE_PLACES_API_KEY:
         logger.warning("[GOOGLE] No API key configured, skipping Places search")
@@ -2853,7 +2893,7 @@ async def google_places_search(business_name: str, state_code: str = "") -> dict
             query += f" {state_code} Australia"
 
         resp = await _http_client.post(
-            "https://places.googleapis.com/v1/places:searchText",
+            f"{GOOGLE_PLACES_BASE_URL}/v1/places:searchText",
             headers={
                 "Content-Type": "application/json",
                 "X-Goog-Api-Key": GOOGLE_PLACES_API_KEY,
@@ -2864,7 +2904,7 @@ async def google_places_search(business_name: str, state_code: str = "") -> dict
 
         if resp.status_code != 200:
             logger.error(f"[GOOGLE] Places search failed: {resp.status_code} - {resp.text[:200]}")
-            return {}
+            return {"error": f"API returned {resp.status_code}"}
 
         data = resp.json()
         places = data.get("places", [])
@@ -2909,7 +2949,7 @@ async def google_places_search(business_name: str, state_code: str = "") -> dict
         async def _resolve_photo(photo_name: str) -> str:
             try:
                 r = await _http_client.get(
-                    f"https://places.googleapis.com/v1/{photo_name}/media",
+                    f"{GOOGLE_PLACES_BASE_URL}/v1/{photo_name}/media",
                     params={"maxWidthPx": 800, "key": GOOGLE_PLACES_API_KEY, "skipHttpRedirect": "true"},
                 )
                 if r.status_code == 200:
@@ -2944,20 +2984,21 @@ async def google_places_search(business_name: str, state_code: str = "") -> dict
 
     except httpx.TimeoutException as e:
         logger.error(f"[GOOGLE] Places search timeout: {e}")
-        return {}
+        return {"error": "timeout"}
     except httpx.HTTPError as e:
         logger.error(f"[GOOGLE] Places search HTTP error: {e}")
-        return {}
+        return {"error": str(e) or type(e).__name__}
     except (json.JSONDecodeError, KeyError, ValueError) as e:
         logger.error(f"[GOOGLE] Places search parse error: {e}")
-        return {}
+        return {"error": f"Parse error: {e}"}
     except Exception as e:
         logger.error(f"[GOOGLE] Places search unexpected error ({type(e).__name__}): {e}")
-        return {}
+        return {"error": str(e) or type(e).__name__}
 
 
 # ────────── WEBSITE TEXT SCRAPER (lightweight, for evidence keywords) ──────────
 
+@traced()
 async def scrape_website_text(url: str, max_chars: int = 5000) -> str:
     """Fetch a website and extract visible text content for keyword matching.
 
@@ -2995,6 +3036,7 @@ _BIZ_SUFFIXES = re.compile(
     re.IGNORECASE,
 )
 
+@traced()
 async def discover_business_website(business_name: str) -> str:
     """Try to find a business website by inferring common AU domain patterns.
 
@@ -3061,6 +3103,7 @@ _JUNK_PATTERNS = re.compile(
 _IMG_EXTENSIONS = re.compile(r'\.(jpe?g|png|webp)(\?|$)', re.IGNORECASE)
 
 
+@traced()
 async def scrape_website_images(url: str) -> dict:
     """Fetch a website and extract logo + photo URLs from HTML.
 
@@ -3229,6 +3272,7 @@ async def scrape_website_images(url: str) -> dict:
 
 # ────────── SOCIAL MEDIA IMAGE SCRAPER ──────────
 
+@traced()
 async def scrape_social_images(urls: list[str]) -> dict:
     """Fetch og:image from Facebook/Instagram pages.
 
@@ -3294,18 +3338,20 @@ async def scrape_social_images(urls: list[str]) -> dict:
 
 # ────────── AI IMAGE FILTER ──────────
 
-async def ai_filter_photos(photo_urls: list[str], business_type: str = "tradesperson") -> list[str]:
+@traced()
+async def ai_filter_photos(photo_urls: list[str], business_type: str = "tradesperson") -> dict:
     """Use Haiku vision to filter photos, keeping only real work/gallery images.
 
     Downloads each image, sends batch to Haiku for classification.
-    Returns filtered list of URLs that look like genuine work photos.
+    Returns {"photos": [...]} with the URLs that look like genuine work photos,
+    plus "error" when the Haiku call failed (photos is then a best-guess fallback).
     """
     import asyncio
     import base64
     from langchain_core.messages import HumanMessage
 
     if not photo_urls:
-        return []
+        return {"photos": []}
 
     # Download images in parallel using shared client
     async def _download(url: str) -> tuple[str, str, str, int]:
@@ -3353,7 +3399,7 @@ async def ai_filter_photos(photo_urls: list[str], business_type: str = "tradespe
 
     if not valid:
         logger.info("[AI-FILTER] No images downloaded successfully")
-        return []
+        return {"photos": []}
 
     # Build multimodal message with all images
     content_parts = [{
@@ -3396,7 +3442,7 @@ where N is the image number (1-indexed)."""
         logger.info(f"[AI-FILTER] Kept {len(kept)}/{len(valid)} images as work photos")
 
         # Trust the AI verdict — if it says all SKIP, return empty (no work photos)
-        return kept
+        return {"photos": kept}
 
     except Exception as e:
         logger.error(f"[AI-FILTER] LLM error: {e}")
@@ -3405,8 +3451,7 @@ where N is the image number (1-indexed)."""
                         if mt == "image/jpeg" and sz >= 20_000]
         if jpeg_fallback:
             logger.info(f"[AI-FILTER] LLM failed — falling back to {len(jpeg_fallback)} large JPEG(s)")
-            return jpeg_fallback[:4]
-        return []
+        return {"photos": jpeg_fallback[:4], "error": f"{type(e).__name__}: {e}"}
 
 
 # ────────── SEARCH RESULT EXTRACTORS ──────────
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-request rate-limit overhead and memory per key.
+
+Compares the old list-of-timestamps limiter with the sliding-window
+MemoryRateLimiter (and RedisRateLimiter when --redis-url is given):
+  - hot key: one session hitting its limit repeatedly (list trimming cost)
+  - many keys: distinct client IPs, one request each (memory per key)
+
+Usage:
+    python scripts/bench_rate_limit.py
+    python scripts/bench_rate_limit.py --redis-url redis://localhost:6379/0
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.rate_limit import MemoryRateLimiter, RedisRateLimiter
+
+
+class LegacyLimiter:
+    """The previous `_check_rate_limit`: a timestamp list per key, never evicted."""
+
+    def __init__(self):
+        self.log: dict[str, list[float]] = {}
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        window_start = now - window
+        timestamps = [t for t in self.log.get(key, []) if t > window_start]
+        if len(timestamps) >= limit:
+            self.log[key] = timestamps
+            return False
+        timestamps.append(now)
+        self.log[key] = timestamps
+        return True
+
+
+def per_request_us(limiter, n: int, limit: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        limiter.hit("session", limit, 60.0)
+    return (time.perf_counter() - t0) * 1e6 / n
+
+
+def bytes_per_key(make, keys: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    limiter = make()
+    for i in range(keys):
+        limiter.hit(f"ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 5, 60.0)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(s.size_diff for s in after.compare_to(before, "filename")) / keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--keys", type=int, default=50_000)
+    parser.add_argument("--redis-url", default="")
+    args = parser.parse_args()
+
+    limiters = {"legacy list": LegacyLimiter, "sliding window": MemoryRateLimiter}
+    print(f"{'limiter':<16} {'limit=15 us/req':>16} {'limit=1000 us/req':>18} {'bytes/key':>10}")
+    for name, make in limiters.items():
+        small = per_request_us(make(), args.requests, 15)
+        large = per_request_us(make(), args.requests, 1000)
+        mem = bytes_per_key(make, args.keys)
+        print(f"{name:<16} {small:>16.2f} {large:>18.2f} {mem:>10.0f}")
+
+    if args.redis_url:
+        redis = RedisRateLimiter(args.redis_url, prefix="bench:ratelimit:")
+        n = min(args.requests, 10_000)
+        print(f"{'redis':<16} {per_request_us(redis, n, 15):>16.2f} "
+              f"{per_request_us(redis, n, 1000):>18.2f} {'(server)':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Benchmark MemorySessionStore cleanup cost as the session count grows.
+
+Fills the store with N active sessions plus a fixed number of idle and
+expired ones, then times one cleanup tick (expire + evict_oldest +
+compact_idle) and the per-insert cost of a store held at its cap. The
+tick should stay flat as N grows because only sessions that actually
+expire, evict or compact are touched.
+
+Usage:
+    python scripts/bench_session_cleanup.py
+    python scripts/bench_session_cleanup.py --sizes 1000 10000 50000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server.session_store import MemorySessionStore
+
+TTL = 30 * 60
+COMPACT = 2 * 60
+STALE = 50   # sessions per tick that expire and that compact
+
+
+def _state(sid: str, last_active: float) -> dict:
+    return {"session_id": sid, "business_name": f"Biz {sid}", "messages": [],
+            "_last_active": last_active, "_created_at": last_active}
+
+
+def tick_ms(n: int) -> float:
+    store = MemorySessionStore()
+    now = time.time()
+    for i in range(STALE):
+        store[f"x{i}"] = _state(f"x{i}", now - TTL - 60)      # expired
+    for i in range(STALE):
+        store[f"i{i}"] = _state(f"i{i}", now - COMPACT - 60)  # idle, not expired
+    for i in range(n):
+        store[f"a{i}"] = _state(f"a{i}", now - i * 1e-6)
+    t0 = time.perf_counter()
+    expired = store.expire(TTL)
+    store.evict_oldest(n + STALE)
+    compacted = store.compact_idle(COMPACT)
+    elapsed = (time.perf_counter() - t0) * 1000
+    assert len(expired) == STALE and compacted == STALE, (len(expired), compacted)
+    return elapsed
+
+
+def insert_at_cap_us(n: int) -> float:
+    store = MemorySessionStore(max_sessions=n)
+    now = time.time()
+    for i in range(n):
+        store[f"a{i}"] = _state(f"a{i}", now + i * 1e-6)
+    inserts = 2000
+    t0 = time.perf_counter()
+    for i in range(inserts):
+        store[f"b{i}"] = _state(f"b{i}", now + 1 + i * 1e-6)
+    elapsed = (time.perf_counter() - t0) * 1e6 / inserts
+    assert len(store) == n
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'sessions':>10} {'cleanup tick':>14} {'insert at cap':>15}")
+    for n in args.sizes:
+        print(f"{n:>10} {tick_ms(n):>11.2f} ms {insert_at_cap_us(n):>12.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Benchmark memory per session: live OnboardingState dicts vs compact snapshots.
+
+Builds N realistic completed-onboarding sessions (20 messages, NSW licence
+details with raw payload, web results, 5k website text, reviews, services,
+photos) and measures retained memory with tracemalloc, plus snapshot
+encode/decode time.
+
+Usage:
+    python scripts/bench_session_memory.py
+    python scripts/bench_session_memory.py --sessions 500
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.snapshot import dumps_state, loads_state
+
+
+def _words(n: int, rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+        for _ in range(n)
+    )
+
+
+def make_session(i: int) -> dict:
+    """A session shaped like one that has reached the pricing step."""
+    rng = random.Random(i)
+    messages = []
+    for turn in range(10):
+        messages.append(HumanMessage(content=_words(8, rng)))
+        messages.append(AIMessage(
+            content=_words(45, rng),
+            response_metadata={"id": f"msg_{i}_{turn}", "model": "claude-haiku-4-5-20251001",
+                               "stop_reason": "end_turn",
+                               "usage": {"input_tokens": 2400, "output_tokens": 180}},
+            usage_metadata={"input_tokens": 2400, "output_tokens": 180, "total_tokens": 2580},
+        ))
+    raw_licence = {
+        "licenceDetail": {
+            "licenceNumber": f"{300000 + i}C", "licenceType": "Contractor Licence",
+            "status": "Current", "expiryDate": "2027-05-01",
+            "classes": [{"className": c, "classStatus": "Active", "description": _words(20, rng)}
+                        for c in ("Electrician", "Air Conditioning", "Refrigeration")],
+            "associatedParties": [{"name": _words(2, rng), "role": "Director",
+                                   "partyType": "Individual"} for _ in range(3)],
+            "conditions": [_words(30, rng) for _ in range(4)],
+            "history": [{"date": "2015-01-01", "event": _words(10, rng)} for _ in range(12)],
+        }
+    }
+    return {
+        "session_id": f"{i:08x}",
+        "current_node": "pricing",
+        "messages": messages,
+        "business_name": f"Smith {i} Electrical",
+        "legal_name": f"SMITH {i} ELECTRICAL PTY LTD",
+        "abn": f"51{i:09d}",
+        "abr_results": [{"abn": f"51{i + k:09d}", "display_name": _words(3, rng), "state": "NSW",
+                         "postcode": "2150", "status": "Active"} for k in range(8)],
+        "licence_info": {"licence_number": f"{300000 + i}C", "classes": [
+            {"name": "Electrician", "active": True}], "raw": raw_licence},
+        "licence_classes": ["Electrician"],
+        "web_results": [{"title": _words(6, rng), "url": f"https://example{k}.com.au/",
+                         "description": _words(40, rng)} for k in range(3)],
+        "website_text": _words(800, rng)[:5000],
+        "services": [{"input": _words(2, rng), "category_name": "Electrician", "category_id": 30,
+                      "subcategory_name": _words(3, rng), "subcategory_id": 800 + k,
+                      "confidence": "high", "source": "licence"} for k in range(25)],
+        "service_areas": {"base_suburb": "Parramatta", "base_postcode": "2150", "radius_km": 20,
+                          "regions_included": ["Hills District", "Parramatta", "Inner West"],
+                          "regions_excluded": ["Northern Beaches", "Eastern Suburbs"]},
+        "google_reviews": [{"text": _words(60, rng), "rating": 5} for _ in range(5)],
+        "google_photos": [f"https://lh3.googleusercontent.com/places/{_words(1, rng)}{'x' * 200}"
+                          for _ in range(8)],
+        "profile_photos": [f"https://lh3.googleusercontent.com/places/{_words(1, rng)}{'x' * 200}"
+                           for _ in range(6)],
+        "profile_description": _words(60, rng),
+        "profile_description_draft": _words(60, rng),
+        "_created_at": time.time(),
+        "_last_active": time.time(),
+    }
+
+
+def measure(build) -> tuple[object, int]:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    obj = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    return obj, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+    n = args.sessions
+
+    templates = [make_session(i) for i in range(n)]
+
+    live, live_bytes = measure(lambda: [copy.deepcopy(t) for t in templates])
+
+    t0 = time.perf_counter()
+    snaps, snap_bytes = measure(lambda: [dumps_state(s) for s in live])
+    encode_ms = (time.perf_counter() - t0) * 1000 / n
+
+    t0 = time.perf_counter()
+    for s in snaps:
+        loads_state(s)
+    decode_ms = (time.perf_counter() - t0) * 1000 / n
+
+    payload = sum(len(s) for s in snaps) / n
+    print(f"Sessions:               {n}")
+    print(f"Live dict per session:  {live_bytes / n / 1024:8.1f} KB")
+    print(f"Snapshot per session:   {snap_bytes / n / 1024:8.1f} KB  (payload {payload / 1024:.1f} KB)")
+    print(f"Saving:                 {(1 - snap_bytes / live_bytes) * 100:8.1f} %")
+    print(f"Encode / decode:        {encode_ms:.2f} ms / {decode_ms:.2f} ms per session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Build the shared read-only data file (agent/shared_data.py) before workers start.
+
+Run before uvicorn forks, so every worker maps a finished file instead of
+racing to build it. A no-op when SHARED_DATA_PATH is unset or the file is
+already current.
+
+Usage:
+    SHARED_DATA_PATH=data/shared.sqlite python scripts/build_shared_data.py
+    python scripts/build_shared_data.py --path /tmp/shared.sqlite --force
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import shared_data
+from agent.config import SHARED_DATA_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--path", default=SHARED_DATA_PATH, help="output file (default: $SHARED_DATA_PATH)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if current")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not args.path:
+        print("SHARED_DATA_PATH not set — workers load their own data; nothing to build")
+        return
+    built = shared_data.build(args.path, force=args.force)
+    store = shared_data.SharedData(args.path)
+    print(f"{'Built' if built else 'Up to date'}: {args.path} — {store.qbcc_count} QBCC rows, "
+          f"{store.suburb_count} suburbs, {store.category_count} categories, {store.business_count} businesses")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Local stand-in for the external data APIs, with latency and fault injection.
+
+Emulates the endpoints agent/tools.py calls, each under its own prefix:
+
+    /abr     ABR JSONP (AbnDetails, MatchingNames)
+    /nsw     NSW Trades OAuth token, browse, details
+    /google  Google Places text search and photo media
+    /brave   Brave web search
+    /vba     VBA practitioner-search page and Aura action endpoint
+    /wa      WA DMIRS licence search (JSF page + partial AJAX POST)
+    /ss      Service Seeking API (/businesses/{id})
+
+Responses come from a recorded-fixtures JSON file when it has one for the
+request, else a plausible response is synthesised from the query, so a full
+onboarding flow runs offline. Point the server at it with the env vars it
+prints on startup (ABR_BASE_URL etc., see agent/config.py).
+
+Fixtures file: {"<endpoint>": {"<key>": <body>, "*": <fallback body>}} with
+endpoints abr_abn (key: ABN), abr_name, nsw_browse, nsw_details, google,
+brave, vba, wa, ss (key: name/query lowercased, or id). A body is whatever
+the real API returned: JSON for most, the raw JSONP/HTML string for abr/wa.
+
+Faults are per service, seeded for reproducibility:
+    --latency 80,400          lognormal latency with p50=80ms, p95=400ms
+    --rate-429 0.05           fraction answered 429 (Retry-After: 1)
+    --rate-timeout 0.01       fraction that hang for --hang-seconds first
+    --rate-malformed 0.01     fraction with a truncated body
+    --service google:latency=300,1200 --service brave:429=0.2   per-service overrides
+
+Usage:
+    python scripts/fixture_server.py --port 8100 --latency 80,400
+    python scripts/fixture_server.py --fixtures recorded.json --rate-429 0.05 --seed 1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+from dataclasses import dataclass, replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+SERVICES = ("abr", "nsw", "google", "brave", "vba", "wa", "ss")
+ENV_VARS = {
+    "abr": "ABR_BASE_URL", "nsw": "NSW_TRADES_BASE_URL", "google": "GOOGLE_PLACES_BASE_URL",
+    "brave": "BRAVE_SEARCH_BASE_URL", "vba": "VBA_BASE_URL", "wa": "WA_DMIRS_BASE_URL", "ss": "SS_API_URL",
+}
+
+
+@dataclass
+class Faults:
+    latency_p50: float = 0.0   # seconds
+    latency_p95: float = 0.0
+    rate_429: float = 0.0
+    rate_timeout: float = 0.0
+    rate_malformed: float = 0.0
+    hang_seconds: float = 60.0
+
+    def delay(self, rng: random.Random) -> float:
+        if self.latency_p50 <= 0:
+            return 0.0
+        p95 = max(self.latency_p95, self.latency_p50)
+        sigma = (math.log(p95) - math.log(self.latency_p50)) / 1.645
+        return rng.lognormvariate(math.log(self.latency_p50), sigma)
+
+
+def parse_latency(value: str) -> tuple[float, float]:
+    p50, _, p95 = value.partition(",")
+    return float(p50) / 1000, float(p95 or p50) / 1000
+
+
+def parse_override(spec: str, base: Faults) -> tuple[str, Faults]:
+    """"google:latency=300,1200;429=0.1" → ("google", Faults(...))."""
+    service, _, settings = spec.partition(":")
+    if service not in SERVICES:
+        raise ValueError(f"unknown service '{service}' (one of {', '.join(SERVICES)})")
+    faults = replace(base)
+    for item in filter(None, settings.split(";")):
+        key, _, value = item.partition("=")
+        if key == "latency":
+            faults.latency_p50, faults.latency_p95 = parse_latency(value)
+        elif key in ("429", "timeout", "malformed"):
+            setattr(faults, f"rate_{key}", float(value))
+        elif key == "hang":
+            faults.hang_seconds = float(value)
+        else:
+            raise ValueError(f"unknown fault setting '{key}'")
+    return service, faults
+
+
+# ────────── SYNTHESISED RESPONSES ──────────
+
+def _abn_for(name: str) -> str:
+    return str(int(hashlib.sha1(name.lower().encode()).hexdigest(), 16))[:11].rjust(11, "5")
+
+
+def _abr_details(abn: str) -> str:
+    body = {
+        "Abn": abn, "AbnStatus": "Active", "EntityName": f"FIXTURE HOLDINGS {abn[-4:]} PTY LTD",
+        "BusinessName": [], "EntityTypeName": "Australian Private Company", "Gst": "2015-07-01",
+        "AddressState": "NSW", "AddressPostcode": "2000", "EntityStartDate": "2015-07-01", "Message": "",
+    }
+    return f"c({json.dumps(body)})"
+
+
+def _abr_names(name: str) -> str:
+    abn = _abn_for(name)
+    names = [
+        {"Abn": abn, "Name": name.upper(), "NameType": "Business Name", "State": "NSW", "Postcode": "2000", "Score": 100},
+        {"Abn": abn, "Name": f"{name.upper()} PTY LTD", "NameType": "Entity Name", "State": "NSW", "Postcode": "2000", "Score": 98},
+        {"Abn": _abn_for(name + " 2"), "Name": f"{name.upper()} SERVICES", "NameType": "Trading Name",
+         "State": "VIC", "Postcode": "3000", "Score": 90},
+    ]
+    return f"c({json.dumps({'Names': names, 'Message': ''})})"
+
+
+def _nsw_browse(term: str) -> list:
+    return [{
+        "licenceID": f"fx-{_abn_for(term)[:6]}", "licensee": term.upper(), "licenceNumber": _abn_for(term)[:6],
+        "licenceType": "Contractor Licence", "status": "Current", "suburb": "SYDNEY", "postcode": "2000",
+        "expiryDate": "2030-01-01", "categories": None, "classes": ["Electrician"], "businessNames": [term.upper()],
+    }]
+
+
+def _nsw_details(licence_id: str) -> dict:
+    return {
+        "licenceDetail": {"licensee": "FIXTURE LICENSEE", "licenceNumber": licence_id.removeprefix("fx-"),
+                          "licenceType": "Contractor Licence", "status": "Current", "startDate": "2015-01-01",
+                          "expiryDate": "2030-01-01", "abn": "", "acn": ""},
+        "licenceClasses": [{"className": "Electrician", "isActive": "True"}],
+        "conditions": [], "complianceActions": {}, "associatedParties": [],
+    }
+
+
+def _google(query: str, base: str) -> dict:
+    name = re.sub(r"\s+(NSW|VIC|QLD|WA|SA|TAS|ACT|NT)?\s*Australia$", "", query).strip()
+    slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+    return {"places": [{
+        "displayName": {"text": name}, "rating": 4.8, "userRatingCount": 37, "websiteUri": "",
+        "googleMapsUri": f"{base}/maps/{slug}", "formattedAddress": "1 George St, Sydney NSW 2000, Australia",
+        "shortFormattedAddress": "1 George St, Sydney",
+        "addressComponents": [{"longText": "Sydney", "types": ["locality", "political"]}],
+        "nationalPhoneNumber": "(02) 9000 0000",
+        "reviews": [{"rating": 5, "text": {"text": "Turned up on time and did a great job."}}],
+        "primaryType": "electrician", "types": ["electrician", "point_of_interest"],
+        "photos": [{"name": f"places/{slug}/photos/{i}"} for i in range(3)],
+        "pureServiceAreaBusiness": True, "businessStatus": "OPERATIONAL",
+    }]}
+
+
+def _brave(query: str, base: str) -> dict:
+    slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")
+    return {"web": {"results": [
+        {"title": query, "url": f"{base}/site/{slug}", "description": f"{query} — licensed and insured."},
+    ]}}
+
+
+def _vba(name: str) -> dict:
+    practitioner = {
+        "practitionerName": name.upper(), "registrationNumber": f"DB-U {_abn_for(name)[:5]}",
+        "registrationCategoryWithClass": "Domestic Builder - Unlimited", "registrationClass": "Domestic Builder - Unlimited",
+        "status": "Active", "registrationType": "Individual", "accreditationType": "Building",
+        "phoneNumber": "", "detailURL": "",
+    }
+    return {"actions": [{"id": "1;a", "state": "SUCCESS", "returnValue": {"returnValue": {
+        "PractitionerDetailList": [practitioner], "recordCount": 1}}}], "context": {"fwuid": "fixture-fwuid"}}
+
+
+def _wa(name: str) -> str:
+    return ('<partial-response><changes><update id="mainForm:resultsPanel"><![CDATA['
+            f'<a class="licenceElementTitle">{name.upper()}</a><a class="licenceElementTitle">PL{_abn_for(name)[:5]}</a>'
+            '<span class="licenceStatus">Current</span>]]></update></changes></partial-response>')
+
+
+def _ss(business_id: str) -> dict:
+    return {"data": {"id": business_id, "type": "businesses", "attributes": {
+        "businessName": f"Fixture Business {business_id}", "businessDescription": "Local trade business.",
+        "businessNumber": _abn_for(business_id), "logoUrl": "", "hasALogo": False, "hasPortfolio": False,
+        "badges": [], "reviewsCount": 4, "reviewsScore": 4.5, "phoneNumber": "0400 000 000", "websiteUrl": "",
+    }}, "included": [
+        {"type": "jobFilters", "attributes": {"radius": 20, "subcategoryItems": [], "suburb": {
+            "id": 1, "state": "NSW", "postcode": 2000, "name": "Sydney", "region": "Sydney", "area": "CBD"}}},
+        {"type": "users", "attributes": {"name": "Sam Fixture"}},
+    ]}
+
+
+# ────────── APP ──────────
+
+def create_app(fixtures: dict | None = None, faults: dict[str, Faults] | None = None, seed: int = 0) -> FastAPI:
+    fixtures = fixtures or {}
+    faults = faults or {}
+    rng = random.Random(seed)
+    app = FastAPI(title="Upstream fixture server")
+    app.state.counts = {s: 0 for s in SERVICES}
+
+    def recorded(endpoint: str, key: str):
+        table = fixtures.get(endpoint) or {}
+        return table.get(key, table.get(key.lower(), table.get("*")))
+
+    async def respond(request: Request, service: str, body, media_type: str = "application/json") -> Response:
+        app.state.counts[service] += 1
+        f = faults.get(service) or Faults()
+        roll = rng.random()
+        await asyncio.sleep(f.delay(rng))
+        if roll < f.rate_429:
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+        roll -= f.rate_429
+        if roll < f.rate_timeout:
+            await asyncio.sleep(f.hang_seconds)
+        roll -= f.rate_timeout
+        text = body if isinstance(body, str) else json.dumps(body)
+        if roll < f.rate_malformed:
+            text = text[: len(text) // 2]
+        return Response(content=text, media_type=media_type)
+
+    def base(request: Request, service: str) -> str:
+        return f"{str(request.base_url).rstrip('/')}/{service}"
+
+    # ABR
+    @app.get("/abr/json/AbnDetails.aspx")
+    async def abr_details(request: Request, abn: str = ""):
+        body = recorded("abr_abn", abn) or _abr_details(abn)
+        return await respond(request, "abr", body, "text/javascript")
+
+    @app.get("/abr/json/MatchingNames.aspx")
+    async def abr_names(request: Request, name: str = ""):
+        body = recorded("abr_name", name) or _abr_names(name)
+        return await respond(request, "abr", body, "text/javascript")
+
+    # NSW Trades
+    @app.get("/nsw/oauth/client_credential/accesstoken")
+    async def nsw_token(request: Request):
+        return await respond(request, "nsw", {"access_token": "fixture-token", "expires_in": 43200})
+
+    @app.get("/nsw/tradesregister/v1/browse")
+    async def nsw_browse(request: Request, searchText: str = ""):
+        return await respond(request, "nsw", recorded("nsw_browse", searchText) or _nsw_browse(searchText))
+
+    @app.get("/nsw/tradesregister/v1/details")
+    async def nsw_details(request: Request, licenceid: str = ""):
+        return await respond(request, "nsw", recorded("nsw_details", licenceid) or _nsw_details(licenceid))
+
+    # Google Places
+    @app.post("/google/v1/places:searchText")
+    async def google_search(request: Request):
+        query = (await request.json()).get("textQuery", "")
+        return await respond(request, "google", recorded("google", query) or _google(query, base(request, "google")))
+
+    @app.get("/google/v1/places/{place}/photos/{photo}/media")
+    async def google_photo(request: Request, place: str, photo: str):
+        return await respond(request, "google", {"photoUri": f"{base(request, 'google')}/photo/{place}-{photo}.jpg"})
+
+    # Brave
+    @app.get("/brave/res/v1/web/search")
+    async def brave_search(request: Request, q: str = ""):
+        return await respond(request, "brave", recorded("brave", q) or _brave(q, base(request, "brave")))
+
+    @app.get("/brave/site/{slug}")
+    async def brave_site(request: Request, slug: str):
+        title = slug.replace("-", " ").title()
+        html = f"<html><head><title>{title}</title></head><body><h1>{title}</h1><p>Licensed and insured.</p></body></html>"
+        return await respond(request, "brave", html, "text/html")
+
+    # VBA (Salesforce Aura)
+    @app.get("/vba/bams/s/practitioner-search")
+    async def vba_page(request: Request):
+        html = '<html><body><script>var cfg = {"fwuid":"fixture-fwuid"};</script></body></html>'
+        return await respond(request, "vba", html, "text/html")
+
+    @app.post("/vba/bams/s/sfsites/aura")
+    async def vba_aura(request: Request):
+        form = await request.form()
+        try:
+            params = json.loads(form.get("message", "{}"))["actions"][0]["params"]["params"]["searchParamWrapper"]
+            name = params.get("practitionerName", "")
+        except (KeyError, IndexError, ValueError):
+            name = ""
+        return await respond(request, "vba", recorded("vba", name) or _vba(name))
+
+    # WA DMIRS (JSF)
+    @app.get("/wa/onlinelicencesearch/licenceSearch.jspx")
+    async def wa_page(request: Request):
+        html = ('<html><body><form id="mainForm"><input type="hidden" name="javax.faces.ViewState" '
+                'value="fixture-viewstate"/></form></body></html>')
+        return await respond(request, "wa", html, "text/html")
+
+    @app.post("/wa/onlinelicencesearch/licenceSearch.jspx")
+    async def wa_search(request: Request):
+        name = (await request.form()).get("mainForm:nameInput", "")
+        return await respond(request, "wa", recorded("wa", name) or _wa(name), "text/xml")
+
+    # Service Seeking
+    @app.get("/ss/businesses/{business_id}")
+    async def ss_business(request: Request, business_id: str):
+        return await respond(request, "ss", recorded("ss", business_id) or _ss(business_id),
+                             "application/vnd.api+json")
+
+    @app.get("/_stats")
+    async def stats():
+        return app.state.counts
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fixtures", default="", help="recorded responses JSON file")
+    parser.add_argument("--latency", default="0", help="p50,p95 in ms (lognormal)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-timeout", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--service", action="append", default=[],
+                        help="per-service override, e.g. google:latency=300,1200;429=0.1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    p50, p95 = parse_latency(args.latency)
+    default = Faults(p50, p95, args.rate_429, args.rate_timeout, args.rate_malformed, args.hang_seconds)
+    faults = {s: default for s in SERVICES}
+    for spec in args.service:
+        service, override = parse_override(spec, default)
+        faults[service] = override
+    fixtures = {}
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+
+    root = f"http://{args.host}:{args.port}"
+    print("Point the onboarding server at this stand-in with:")
+    for service, var in ENV_VARS.items():
+        print(f"  export {var}={root}/{service}")
+    print("  (plus any non-empty ABR_GUID / NSW_TRADES_API_KEY / GOOGLE_PLACES_API_KEY / BRAVE_SEARCH_API_KEY / "
+          "SS_API_TOKEN, or the tools skip the call)")
+
+    import uvicorn
+    uvicorn.run(create_app(fixtures, faults, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
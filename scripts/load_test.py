@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Load test: many concurrent simulated users through the full onboarding flow.
+
+Each user creates a session, sends an ABN, confirms the business, accepts
+the services, gives a service area, saves the profile and picks a plan —
+the same path as tests/edge_case_test.py, but users arrive as a Poisson
+process at --rate per second and run concurrently.
+
+Reports throughput, per-node latency percentiles (client-measured and the
+server's turn_time), error rates, and server RSS sampled from /metrics.
+
+Usage:
+    python scripts/load_test.py --users 50 --rate 2
+    python scripts/load_test.py --base-url http://staging:8001 --users 200 --rate 5 --json out.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from tests.edge_case_test import TEST_BUSINESSES
+
+MAX_TURNS = 20
+
+
+class Stats:
+    def __init__(self):
+        self.requests: list[dict] = []   # {node, latency, turn_time, status, error}
+        self.flows_started = 0
+        self.flows_completed = 0
+        self.rss: list[float] = []
+
+    def record(self, node: str, latency: float, status: int, turn_time: float | None = None, error: str = ""):
+        self.requests.append({"node": node, "latency": latency, "turn_time": turn_time,
+                              "status": status, "error": error})
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def next_message(node: str, body: dict, biz: dict, area_turns: int) -> str | None:
+    """What a user would send next, given the last response."""
+    response = body.get("response", {})
+    state = body.get("state") or {}
+    buttons = response.get("buttons") or []
+    values = [b.get("value", b.get("label", "")) if isinstance(b, dict) else str(b) for b in buttons]
+
+    if node == "business_verification":
+        if state.get("business_verified"):
+            return "Yes"
+        return next((v for v in values if biz["abn"] in v or "confirm" in v.lower()), values[0] if values else biz["abn"])
+    if node == "service_discovery":
+        return "Looks good"
+    if node == "service_area":
+        return biz["location"] if area_turns == 0 else "All of Sydney"
+    if node == "profile":
+        description = state.get("profile_description") or state.get("profile_description_draft") \
+            or f"{biz['name']} — local {biz['trade'].lower()} services."
+        return "__SAVE_PROFILE__:" + json.dumps({"description": description, "removed_services": [],
+                                                  "removed_areas": []})
+    if node == "pricing":
+        return next((v for v in values if v.startswith("__BILLING__:")),
+                    next((v for v in values if v.startswith("__PLAN__:") and not v.endswith("skip")),
+                         "__PLAN__:skip"))
+    return values[0] if values else None
+
+
+async def run_user(client: httpx.AsyncClient, base_url: str, biz: dict, stats: Stats, timeout: float):
+    stats.flows_started += 1
+    t0 = time.perf_counter()
+    try:
+        resp = await client.post(f"{base_url}/api/session", json={}, timeout=timeout)
+    except httpx.HTTPError as e:
+        stats.record("session", time.perf_counter() - t0, 0, error=type(e).__name__)
+        return
+    body = resp.json() if resp.status_code == 200 else {}
+    stats.record("session", time.perf_counter() - t0, resp.status_code,
+                 body.get("response", {}).get("turn_time"))
+    if resp.status_code != 200:
+        return
+
+    session_id = body["session_id"]
+    message, node, area_turns = biz["abn"], "welcome", 0
+    for _ in range(MAX_TURNS):
+        t0 = time.perf_counter()
+        try:
+            resp = await client.post(f"{base_url}/api/chat", json={"session_id": session_id, "message": message},
+                                     timeout=timeout)
+        except httpx.HTTPError as e:
+            stats.record(node, time.perf_counter() - t0, 0, error=type(e).__name__)
+            return
+        latency = time.perf_counter() - t0
+        if resp.status_code != 200:
+            stats.record(node, latency, resp.status_code, error=resp.text[:100])
+            return
+        body = resp.json()
+        node = body["response"].get("node", "")
+        stats.record(node, latency, 200, body["response"].get("turn_time"))
+        if body.get("completed") or node == "complete":
+            stats.flows_completed += 1
+            return
+        message = next_message(node, body, biz, area_turns)
+        if node == "service_area":
+            area_turns += 1
+        if message is None:
+            return
+
+
+async def sample_rss(client: httpx.AsyncClient, base_url: str, stats: Stats, stop: asyncio.Event):
+    """Poll the server's /metrics for process_resident_memory_bytes."""
+    while not stop.is_set():
+        try:
+            resp = await client.get(f"{base_url}/metrics", timeout=5.0)
+            m = re.search(r"^process_resident_memory_bytes (\S+)$", resp.text, re.M)
+            if m:
+                stats.rss.append(float(m.group(1)))
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args) -> tuple[Stats, float]:
+    stats = Stats()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.users + 1, max_keepalive_connections=args.users + 1)
+    async with httpx.AsyncClient(limits=limits) as client:
+        try:
+            (await client.get(f"{args.base_url}/health", timeout=5.0)).raise_for_status()
+        except httpx.HTTPError as e:
+            sys.exit(f"Server not reachable at {args.base_url}: {e}")
+
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(client, args.base_url, stats, stop))
+        started = time.perf_counter()
+        users = []
+        for i in range(args.users):
+            biz = TEST_BUSINESSES[i % len(TEST_BUSINESSES)]
+            users.append(asyncio.create_task(run_user(client, args.base_url, biz, stats, args.timeout)))
+            if args.rate > 0:
+                await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+    return stats, elapsed
+
+
+def report(stats: Stats, elapsed: float) -> dict:
+    by_node: dict[str, list[dict]] = defaultdict(list)
+    for r in stats.requests:
+        by_node[r["node"]].append(r)
+    nodes = {}
+    for node, rows in by_node.items():
+        latencies = [r["latency"] for r in rows]
+        turn_times = [r["turn_time"] for r in rows if r["turn_time"] is not None]
+        errors = [r for r in rows if r["status"] != 200]
+        nodes[node] = {
+            "requests": len(rows), "errors": len(errors),
+            "error_rate": round(len(errors) / len(rows), 4),
+            "p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "server_p50": percentile(turn_times, 0.5), "server_p95": percentile(turn_times, 0.95),
+            "statuses": sorted({r["status"] for r in errors}),
+        }
+    total_errors = sum(n["errors"] for n in nodes.values())
+    return {
+        "elapsed": round(elapsed, 2),
+        "flows_started": stats.flows_started, "flows_completed": stats.flows_completed,
+        "flows_per_min": round(stats.flows_completed * 60 / elapsed, 2) if elapsed else 0,
+        "requests": len(stats.requests),
+        "requests_per_sec": round(len(stats.requests) / elapsed, 2) if elapsed else 0,
+        "error_rate": round(total_errors / len(stats.requests), 4) if stats.requests else 0,
+        "rss_mb_start": round(stats.rss[0] / 1e6, 1) if stats.rss else None,
+        "rss_mb_peak": round(max(stats.rss) / 1e6, 1) if stats.rss else None,
+        "nodes": nodes,
+    }
+
+
+def print_report(summary: dict):
+    print(f"\n{summary['flows_completed']}/{summary['flows_started']} flows completed in {summary['elapsed']}s "
+          f"({summary['flows_per_min']} flows/min, {summary['requests_per_sec']} req/s, "
+          f"error rate {summary['error_rate']:.1%})")
+    if summary["rss_mb_peak"] is not None:
+        print(f"Server RSS: {summary['rss_mb_start']} MB at start, {summary['rss_mb_peak']} MB peak")
+    print(f"\n{'node':<24} {'reqs':>6} {'err%':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'srv p50':>8} {'srv p95':>8}")
+    for node, n in sorted(summary["nodes"].items(), key=lambda kv: -kv[1]["requests"]):
+        print(f"{node or '?':<24} {n['requests']:>6} {n['error_rate'] * 100:>5.1f}% {n['p50']:>7.2f} {n['p95']:>7.2f} "
+              f"{n['p99']:>7.2f} {n['server_p50']:>8.2f} {n['server_p95']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--users", type=int, default=20, help="simulated users in total")
+    parser.add_argument("--rate", type=float, default=1.0, help="mean arrivals per second (0 = all at once)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default="", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    print(f"Driving {args.users} users at {args.rate}/s against {args.base_url}")
+    stats, elapsed = asyncio.run(run(args))
+    summary = report(stats, elapsed)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Replay logged conversations through run_node and catch turn-time regressions.
+
+Each session in logs/ (new-user flow only) is re-driven in-process: the
+welcome node, then every logged user_message through server.app.run_node.
+Upstream APIs are served by scripts/fixture_server.py over an in-process
+transport and LLM calls are replayed from the cassette (agent/llm.py), so
+what's timed is our own CPU and I/O per turn. HTTP and LLM calls per turn
+are counted from the turn's spans (agent/spans.py).
+
+Results are compared with a stored baseline. The run fails (exit 1) when a
+turn gets slower than baseline * (1 + --tolerance) + --slack, or makes more
+upstream or LLM calls than before.
+
+Typical use:
+    # once, with ANTHROPIC_API_KEY set: record LLM replies against the fixtures
+    python scripts/replay_bench.py --llm record --save-baseline
+    # after a change
+    python scripts/replay_bench.py
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURE_ROOT = "http://fixtures"
+
+
+def configure_env(llm_mode: str, cassette: str):
+    """Must run before agent/server modules are imported — config is read at import."""
+    for service, var in {"abr": "ABR_BASE_URL", "nsw": "NSW_TRADES_BASE_URL", "google": "GOOGLE_PLACES_BASE_URL",
+                         "brave": "BRAVE_SEARCH_BASE_URL", "vba": "VBA_BASE_URL", "wa": "WA_DMIRS_BASE_URL",
+                         "ss": "SS_API_URL"}.items():
+        os.environ[var] = f"{FIXTURE_ROOT}/{service}"
+    for key in ("ABR_GUID", "NSW_TRADES_API_KEY", "NSW_TRADES_AUTH_HEADER", "GOOGLE_PLACES_API_KEY",
+                "BRAVE_SEARCH_API_KEY", "SS_API_TOKEN"):
+        os.environ[key] = "fixture"
+    os.environ["LLM_MODE"] = llm_mode
+    os.environ["LLM_CASSETTE_DIR"] = cassette
+    os.environ["LLM_REPLAY_LATENCY"] = "0"
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"   # repeats would otherwise time cache hits
+    os.environ["CLASSIFICATION_DB_PATH"] = ""
+    os.environ["ENRICH_SPECULATIVE_CANDIDATES"] = "0"  # background work would blur per-turn counts
+    os.environ.setdefault("ANTHROPIC_API_KEY", "replay")
+
+
+def load_conversations(log_dir: str, only: list[str], limit: int) -> dict[str, list[str]]:
+    from server.turn_log import TurnLogWriter
+    log = TurnLogWriter(log_dir)
+    conversations = {}
+    for entry in sorted(log.list_sessions(), key=lambda e: e["session_id"]):
+        sid = entry["session_id"]
+        if only and sid not in only:
+            continue
+        turns = log.read(sid) or []
+        if not turns or turns[0].get("flow_mode") == "improve":
+            continue
+        messages = [t["user_message"] for t in sorted(turns, key=lambda t: t.get("turn", 0)) if t.get("user_message")]
+        if messages:
+            conversations[sid] = messages
+        if limit and len(conversations) >= limit:
+            break
+    return conversations
+
+
+async def replay_session(sid: str, messages: list[str]) -> list[dict]:
+    from langchain_core.messages import HumanMessage
+    from agent import spans
+    from agent.graph import welcome_node
+    import server.app as app
+
+    async def welcome(state):
+        state.update(await welcome_node(state))
+        return state
+
+    bench_sid = f"replay-{sid}"
+    state = app._init_base_state(bench_sid)
+    results = []
+    # Turn 0 is the welcome node, as in create_session
+    for i, message in enumerate([None] + messages):
+        if message is not None:
+            state["messages"].append(HumanMessage(content=message))
+        state["_api_trace"] = []
+        step = app.run_node if message is not None else welcome
+        t0 = time.perf_counter()
+        error = ""
+        try:
+            with spans.recording(bench_sid, "turn"):
+                state = await step(state)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:200]
+        latency = time.perf_counter() - t0
+        recorded = (spans.session_spans(bench_sid) or [[]])[-1]
+        results.append({
+            "key": f"{sid}:{i}", "node": state.get("current_node", ""), "latency": latency,
+            "http_calls": sum(1 for s in recorded if s.cat == "http"),
+            "llm_calls": sum(1 for s in recorded if s.cat == "llm"),
+            "error": error,
+        })
+        if error:
+            break
+    spans.forget(bench_sid)
+    return results
+
+
+async def run_all(conversations: dict[str, list[str]], repeat: int) -> dict[str, dict]:
+    import httpx
+    import agent.tools as tools
+    from agent.spans import HTTPX_EVENT_HOOKS
+    from scripts.fixture_server import create_app
+
+    tools._http_client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=create_app()), base_url=FIXTURE_ROOT, event_hooks=HTTPX_EVENT_HOOKS,
+    )
+    best: dict[str, dict] = {}
+    for _ in range(repeat):
+        for sid, messages in conversations.items():
+            for r in await replay_session(sid, messages):
+                # Keep the fastest run per turn: noise only ever adds time
+                if r["key"] not in best or r["latency"] < best[r["key"]]["latency"]:
+                    best[r["key"]] = r
+    return best
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float, slack: float) -> list[str]:
+    failures = []
+    for key, r in sorted(results.items()):
+        if r["error"]:
+            failures.append(f"{key} [{r['node']}] failed: {r['error']}")
+            continue
+        base = baseline.get(key)
+        if base is None:
+            continue
+        allowed = base["latency"] * (1 + tolerance) + slack
+        if r["latency"] > allowed:
+            failures.append(f"{key} [{r['node']}] {r['latency'] * 1000:.0f}ms > {allowed * 1000:.0f}ms "
+                            f"(baseline {base['latency'] * 1000:.0f}ms)")
+        for calls in ("http_calls", "llm_calls"):
+            if r[calls] > base[calls]:
+                failures.append(f"{key} [{r['node']}] {calls} {base[calls]} → {r[calls]}")
+    return failures
+
+
+def print_summary(results: dict[str, dict], baseline: dict[str, dict]):
+    by_node: dict[str, list[dict]] = defaultdict(list)
+    for r in results.values():
+        by_node[r["node"]].append(r)
+    print(f"\n{'node':<24} {'turns':>6} {'total ms':>9} {'base ms':>8} {'http':>5} {'llm':>5}")
+    for node, rows in sorted(by_node.items()):
+        total = sum(r["latency"] for r in rows) * 1000
+        base_rows = [baseline[r["key"]] for r in rows if r["key"] in baseline]
+        base_total = f"{sum(b['latency'] for b in base_rows) * 1000:.0f}" if base_rows else "-"
+        print(f"{node or '?':<24} {len(rows):>6} {total:>9.0f} {base_total:>8} "
+              f"{sum(r['http_calls'] for r in rows):>5} {sum(r['llm_calls'] for r in rows):>5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--logs", default=os.path.join(ROOT, "logs"))
+    parser.add_argument("--session", action="append", default=[], help="only these session ids")
+    parser.add_argument("--limit", type=int, default=0, help="max sessions (0 = all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per session; fastest turn wins")
+    parser.add_argument("--llm", choices=("replay", "record"), default="replay")
+    parser.add_argument("--cassette", default=os.path.join(ROOT, "data", "replay_cassette"))
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "data", "replay_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown per turn")
+    parser.add_argument("--slack", type=float, default=0.05, help="allowed absolute slowdown per turn (s)")
+    args = parser.parse_args()
+
+    configure_env(args.llm, args.cassette)
+    import asyncio
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    conversations = load_conversations(args.logs, args.session, args.limit)
+    if not conversations:
+        sys.exit(f"No replayable sessions in {args.logs}")
+    repeat = 1 if args.llm == "record" else max(args.repeat, 1)
+    print(f"Replaying {len(conversations)} sessions, {sum(map(len, conversations.values()))} turns, x{repeat}")
+    results = asyncio.run(run_all(conversations, repeat))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(results, baseline)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({k: {kk: v[kk] for kk in ("node", "latency", "http_calls", "llm_calls")}
+                       for k, v in results.items() if not v["error"]}, f, indent=1, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    failures = compare(results, baseline, args.tolerance, args.slack)
+    if not baseline:
+        print("\nNo baseline yet — run with --save-baseline")
+    if failures:
+        print(f"\n{len(failures)} regression(s):")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,31 +3,54 @@ from __future__ import annotations
 from typing import Optional
 
 import asyncio
+import copy
+import hashlib
 import uuid
 import time
 import json
 import logging
 import re
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 
 import os
-import base64
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field
+import jsonpatch
 from langchain_core.messages import HumanMessage, AIMessage
 
 from agent.graph import (
     welcome_node, business_verification_node, service_discovery_node,
     service_area_node, profile_node, pricing_node,
-    complete_node, assessment_node, _enrich_business,
+    complete_node, assessment_node, _enrich_business, cancel_speculative,
 )
-from agent.config import PORT, ALLOWED_ORIGINS, validate_env
+from agent.progress import emit as emit_progress, muted as muted_progress, progress_sink
+from agent import spans
+from agent.config import (
+    PORT, ALLOWED_ORIGINS, validate_env,
+    SESSION_BACKEND, SESSION_DB_PATH, REDIS_URL, RATE_LIMIT_BACKEND, BLOB_DIR, BLOB_RETENTION_DAYS,
+    TURN_LOG_MAX_BYTES, TURN_LOG_ROTATE_IDLE_SECONDS, TURN_LOG_COMPRESS, LOOP_STALL_THRESHOLD_MS,
+    MAX_INFLIGHT_TURNS, TURN_QUEUE_MAX, TURN_QUEUE_TIMEOUT, COMPRESS_MIN_BYTES,
+)
+from agent.limits import Bulkhead, Saturated, upstream_stats
+from agent.llm import cache_stats as llm_cache_stats
+from agent import shared_data
 from agent.tools import _get_nsw_trades_token, qbcc_load_csv, ss_get_business
+from server.session_store import make_session_store, SessionConflict
+from server.rate_limit import make_rate_limiter
+from server.turn_log import TurnLogWriter
+from server.log_index import LogIndex
+from server.blob_store import BlobStore, BlobTooLarge, CONTENT_TYPE_EXT, media_sha, media_url
+from server import metrics
+from server.profiler import SamplingProfiler
+from server.loop_watchdog import LoopWatchdog
+from server.compression import CompressionMiddleware
 
 logging.basicConfig(
     level=logging.INFO,
@@ -38,49 +61,156 @@ logger = logging.getLogger(__name__)
 
 # ────────── SESSION STORE ──────────
 
-sessions: dict = {}
-
 SESSION_TTL_SECONDS = 30 * 60   # 30 minutes inactive
+SESSION_COMPACT_SECONDS = 2 * 60  # idle sessions held as compressed snapshots after 2 minutes
 MAX_SESSIONS = 500
 
+# Sessions this worker has handled, least recently first. With a shared store
+# whichever worker runs expire/evict deletes the rows, so each worker also
+# drops its own per-session state once a session has been idle here for the TTL.
+_local_sessions: OrderedDict[str, float] = OrderedDict()
+
+
+def _touch_local(session_id: str):
+    _local_sessions[session_id] = time.time()
+    _local_sessions.move_to_end(session_id)
+
+
+def _forget_idle_local(ttl_seconds: float) -> list[str]:
+    """Forget sessions this worker hasn't handled for ttl_seconds. Returns their IDs."""
+    cutoff = time.time() - ttl_seconds
+    idle = []
+    while _local_sessions and next(iter(_local_sessions.values())) < cutoff:
+        idle.append(_local_sessions.popitem(last=False)[0])
+    for sid in idle:
+        _forget_session(sid)
+    return idle
+
+
+def _forget_session(session_id: str):
+    """Drop this worker's per-session side state once a session is gone (or idle here)."""
+    _local_sessions.pop(session_id, None)
+    rate_limiter.forget(session_id)
+    cancel_speculative(session_id)
+    spans.forget(session_id)
+
+
+# Dict-like; memory by default, sqlite/redis to share sessions across workers
+sessions = make_session_store(
+    SESSION_BACKEND,
+    sqlite_path=Path(__file__).parent.parent / SESSION_DB_PATH,
+    redis_url=REDIS_URL,
+    ttl_seconds=SESSION_TTL_SECONDS,
+    max_sessions=MAX_SESSIONS,
+    on_drop=_forget_session,
+)
+
+
+async def _save_session(session_id: str, state: dict) -> int:
+    """Persist state, rejecting the write if another worker saved it first.
+
+    Returns the new state version.
+    """
+    _touch_local(session_id)
+    try:
+        await sessions.asave(session_id, state)
+    except SessionConflict:
+        raise HTTPException(
+            status_code=409,
+            detail="Session was updated by another request — please retry",
+        )
+    refs = _media_refs(state)
+    if refs:
+        await asyncio.to_thread(blobs.keep, refs)  # live sessions' uploads outlast the prune cutoff
+    return state["_version"]
+
+
+async def _invalidate_version(session_id: str, state: dict):
+    """After a failed turn, bump the version of a live (memory-store) state the turn may have changed.
+
+    Nothing was saved, but the store's dict was edited in place; without a new
+    version the client's `since_version` would still match and its next patch
+    would be computed against state it never received.
+    """
+    if sessions.blocking:
+        return  # persistent stores handed out a copy; the stored state is untouched
+    try:
+        await sessions.asave(session_id, state)
+    except SessionConflict:
+        pass  # saved elsewhere meanwhile: the version moved on anyway
+
+
+def _state_payload(state: dict, base: dict | None = None) -> dict:
+    """Response fields carrying the frontend state.
+
+    `base` is the safe state the client already holds (captured before the
+    turn ran). When given, only a JSON patch against it is sent.
+    """
+    safe = _safe_state(state)
+    if base is None:
+        return {"state": safe, "state_version": state.get("_version", 0)}
+    return {
+        "state_patch": jsonpatch.make_patch(base, safe).patch,
+        "state_version": state.get("_version", 0),
+    }
+
+
+_ASSESSMENT_FIELDS = ("_assessment_findings", "_assessment_strengths", "_profile_score")
+
+
+def _drop_unchanged_assessment(resp: dict, state: dict):
+    """Slim responses: swap assessment findings identical to the ones this session was last sent
+    for `_assessment_unchanged: true` (the client reuses its copy).
+
+    Call before the session is saved — the digest of what was sent lives in the state.
+    """
+    sent = {k: resp[k] for k in _ASSESSMENT_FIELDS if k in resp}
+    if not sent:
+        return
+    digest = hashlib.sha1(json.dumps(sent, sort_keys=True, default=str).encode()).hexdigest()
+    if state.get("_assessment_sent") == digest:
+        for k in sent:
+            del resp[k]
+        resp["_assessment_unchanged"] = True
+    state["_assessment_sent"] = digest
+
 
 # ────────── RATE LIMITING ──────────
 
-_rate_log: dict[str, list[float]] = {}   # key → [timestamp, ...]
 RATE_LIMIT = 15          # max chat requests per session
 RATE_WINDOW = 60.0       # per 60 seconds
 
 SESSION_CREATE_LIMIT = 5     # max new sessions per IP
 SESSION_CREATE_WINDOW = 60.0  # per 60 seconds
 
+# Sliding-window counters; "redis" shares them across workers
+rate_limiter = make_rate_limiter(RATE_LIMIT_BACKEND, redis_url=REDIS_URL)
 
-def _check_rate_limit(key: str, limit: int = RATE_LIMIT, window: float = RATE_WINDOW) -> bool:
+
+async def _check_rate_limit(key: str, limit: int = RATE_LIMIT, window: float = RATE_WINDOW) -> bool:
     """Return True if request is allowed, False if rate-limited."""
-    now = time.time()
-    window_start = now - window
-    timestamps = _rate_log.get(key, [])
-    # Trim old entries
-    timestamps = [t for t in timestamps if t > window_start]
-    if len(timestamps) >= limit:
-        _rate_log[key] = timestamps
-        return False
-    timestamps.append(now)
-    _rate_log[key] = timestamps
-    return True
+    return await rate_limiter.ahit(key, limit, window)
 
 
 # ────────── SESSION LOGGING ──────────
 
 LOG_DIR = Path(__file__).parent.parent / "logs"
-LOG_DIR.mkdir(exist_ok=True)
+
+# Appends happen on a background thread, in batches
+turn_log = TurnLogWriter(
+    LOG_DIR,
+    max_bytes=TURN_LOG_MAX_BYTES,
+    rotate_idle_seconds=TURN_LOG_ROTATE_IDLE_SECONDS,
+    compress=TURN_LOG_COMPRESS,
+    index=LogIndex(LOG_DIR / "index.sqlite"),  # per-session summaries for /api/logs
+)
 
 
 def _log_turn(session_id: str, turn: dict):
-    """Append a turn entry to the session's JSONL log file.
+    """Queue a turn entry for the session's JSONL log file.
 
     Redacts PII: abn → last 3 digits, contact_name/contact_phone omitted.
     """
-    log_file = LOG_DIR / f"{session_id}.jsonl"
     turn["timestamp"] = datetime.now(timezone.utc).isoformat()
     # Redact PII
     turn.pop("contact_name", None)
@@ -88,39 +218,50 @@ def _log_turn(session_id: str, turn: dict):
     if "abn" in turn:
         abn = str(turn["abn"])
         turn["abn"] = f"***{abn[-3:]}" if len(abn) >= 3 else "***"
-    with open(log_file, "a") as f:
-        f.write(json.dumps(turn, default=str) + "\n")
+    turn_log.write(session_id, turn)
 
 
 # ────────── SESSION CLEANUP ──────────
 
 async def _session_cleanup_loop():
-    """Background task: expire stale sessions every 5 minutes."""
+    """Background task: expire stale sessions, compact idle ones and prune old uploads every 5 minutes."""
     while True:
         await asyncio.sleep(300)  # 5 min
-        now = time.time()
-        expired = [
-            sid for sid, s in sessions.items()
-            if now - s.get("_last_active", s.get("_created_at", now)) > SESSION_TTL_SECONDS
-        ]
+        expired = await sessions.arun(sessions.expire, SESSION_TTL_SECONDS)
         for sid in expired:
-            del sessions[sid]
-            _rate_log.pop(sid, None)
+            _forget_session(sid)
         if expired:
-            logger.info(f"Cleaned up {len(expired)} expired sessions, {len(sessions)} active")
+            logger.info(f"Cleaned up {len(expired)} expired sessions, {await sessions.alen()} active")
+
+        # Cap total sessions — evict oldest by _last_active (memory store also does this on insert)
+        evicted = await sessions.arun(sessions.evict_oldest, MAX_SESSIONS)
+        for sid in evicted:
+            _forget_session(sid)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} oldest sessions (cap={MAX_SESSIONS})")
+
+        forgotten = _forget_idle_local(SESSION_TTL_SECONDS)
+        if forgotten:
+            logger.info(f"Dropped local state for {len(forgotten)} sessions idle on this worker")
+
+        swept = rate_limiter.sweep()
+        if swept:
+            logger.info(f"Swept {swept} idle rate-limit keys")
 
-        # Cap total sessions — evict oldest by _last_active
-        if len(sessions) > MAX_SESSIONS:
-            by_age = sorted(sessions.items(), key=lambda kv: kv[1].get("_last_active", 0))
-            to_evict = len(sessions) - MAX_SESSIONS
-            for sid, _ in by_age[:to_evict]:
-                del sessions[sid]
-                _rate_log.pop(sid, None)
-            logger.info(f"Evicted {to_evict} oldest sessions (cap={MAX_SESSIONS})")
+        compacted = await sessions.acompact_idle(SESSION_COMPACT_SECONDS)
+        if compacted:
+            logger.info(f"Compacted {compacted} idle sessions to snapshots")
+
+        pruned = await asyncio.to_thread(blobs.prune, BLOB_RETENTION_DAYS * 86400)
+        if pruned:
+            logger.info(f"Pruned {pruned} uploaded images older than {BLOB_RETENTION_DAYS:g} days")
 
 
 # ────────── LIFESPAN ──────────
 
+loop_watchdog = LoopWatchdog(threshold=LOOP_STALL_THRESHOLD_MS / 1000)
+
+
 @asynccontextmanager
 async def lifespan(app):
     """Startup/shutdown lifecycle: validate env, pre-warm tokens, start cleanup."""
@@ -133,10 +274,18 @@ async def lifespan(app):
     else:
         logger.warning("NSW Trades OAuth token failed — licence lookups will retry on first request")
 
+    if turn_log.index.is_empty() and any(LOG_DIR.glob("*.jsonl*")):
+        # Every worker gets here at startup; the first to take the log lock rebuilds, the rest skip
+        await asyncio.to_thread(turn_log.rebuild_index, if_empty=True)
+
     cleanup_task = asyncio.create_task(_session_cleanup_loop())
+    if LOOP_STALL_THRESHOLD_MS > 0:
+        loop_watchdog.start()
     logger.info(f"Server started — CORS origins: {ALLOWED_ORIGINS}")
     yield
+    loop_watchdog.stop()
     cleanup_task.cancel()
+    await asyncio.to_thread(turn_log.close)
 
 
 # ────────── APP ──────────
@@ -149,6 +298,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if COMPRESS_MIN_BYTES > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+
+_BUSY_DETAIL = "We're busy right now — please try again in a moment"
+
+
+@app.exception_handler(Saturated)
+async def saturated_handler(request: Request, e: Saturated):
+    """An upstream budget (e.g. "anthropic") filled up mid-turn: 503 + Retry-After, not a 500."""
+    logger.warning(f"[ADMISSION] {request.url.path}: {e}")
+    return JSONResponse(status_code=503, content={"detail": _BUSY_DETAIL},
+                        headers={"Retry-After": str(e.retry_after)})
 
 # Serve static files
 web_dir = Path(__file__).parent.parent / "web"
@@ -159,23 +321,53 @@ app.mount("/static", StaticFiles(directory=str(web_dir)), name="static")
 
 class StartRequest(BaseModel):
     ss_business_id: Optional[str] = None
+    slim: bool = False  # no api_trace; unchanged assessment findings omitted
 
 class MessageRequest(BaseModel):
     session_id: str
     message: str = Field(..., min_length=1, max_length=2000)
+    since_version: Optional[int] = None  # last state_version seen → response carries a patch
+    slim: bool = False  # no api_trace; unchanged assessment findings omitted
 
 
 # ────────── NODE DISPATCH ──────────
 
+def _with_progress(name: str, fn):
+    """Wrap a node so it reports node_start / node_end progress events and latency metrics."""
+    async def run(state):
+        emit_progress("node_start", node=name)
+        t0 = time.time()
+        try:
+            with spans.span(name, "node"):
+                result = await fn(state)
+        except Exception:
+            metrics.record_node(name, time.time() - t0, error=True)
+            raise
+        elapsed = time.time() - t0
+        metrics.record_node(name, elapsed)
+        emit_progress("node_end", node=name, time=round(elapsed, 2))
+        return result
+    run.__name__ = fn.__name__
+    return run
+
+
+async def _without_tokens(coro):
+    """Run a node without streaming its reply text ("token" events); other progress still flows."""
+    with muted_progress("token"):
+        return await coro
+
+
 NODE_FUNCTIONS = {
-    "welcome": welcome_node,
-    "business_verification": business_verification_node,
-    "service_discovery": service_discovery_node,
-    "service_area": service_area_node,
-    "profile": profile_node,
-    "pricing": pricing_node,
-    "complete": complete_node,
-    "assessment": assessment_node,
+    name: _with_progress(name, fn) for name, fn in {
+        "welcome": welcome_node,
+        "business_verification": business_verification_node,
+        "service_discovery": service_discovery_node,
+        "service_area": service_area_node,
+        "profile": profile_node,
+        "pricing": pricing_node,
+        "complete": complete_node,
+        "assessment": assessment_node,
+    }.items()
 }
 
 
@@ -262,7 +454,7 @@ async def run_node(state: dict) -> dict:
             and not state.get("service_areas_confirmed")):
         svc_result, area_result = await asyncio.gather(
             node_fn(state),
-            NODE_FUNCTIONS["service_area"](state),
+            _without_tokens(NODE_FUNCTIONS["service_area"](state)),  # may be discarded: don't stream its text
         )
         _raw_merge(svc_result)
         parallel_handled = True
@@ -340,7 +532,18 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "sessions": len(sessions)}
+    return {"status": "healthy", "sessions": await sessions.alen()}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint: latency histograms per API, node and turn, concurrency budgets, LLM cache."""
+    return Response(
+        content=metrics.render(active_sessions=await sessions.alen(),
+                               bulkheads=[turn_admission.stats(), *upstream_stats()],
+                               llm_cache=llm_cache_stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
 
 # ────────── CSV SEARCH FOR IMPROVE ──────────
@@ -353,33 +556,26 @@ def _load_csv_businesses():
     global _csv_businesses
     if _csv_businesses:
         return
-    csv_path = Path(__file__).parent.parent / "all-contacts_with ID.csv"
+    csv_path = shared_data.BUSINESS_CSV
     if not csv_path.exists():
         logger.warning(f"[CSV] Business CSV not found at {csv_path}")
         return
     import csv as csv_mod
     with open(csv_path, encoding="utf-8-sig") as f:
         reader = csv_mod.DictReader(f)
-        for row in reader:
-            biz_id = (row.get("Business ID") or "").strip()
-            if not biz_id:
-                continue
-            _csv_businesses.append({
-                "id": biz_id,
-                "name": (row.get("Business Name") or "").strip(),
-                "industry": (row.get("Industry") or "").strip(),
-                "city": (row.get("City") or "").strip(),
-                "reviews": row.get("Number of Reviews", "0"),
-                "rating": row.get("Star Rating", "0"),
-                "status": (row.get("Business Status") or "").strip(),
-                "membership": (row.get("membership_status1") or "").strip(),
-            })
+        _csv_businesses.extend(filter(None, (shared_data.business_record(row) for row in reader)))
     logger.info(f"[CSV] Loaded {len(_csv_businesses)} businesses from CSV")
 
 
 @app.get("/api/search-businesses")
 async def search_businesses(q: str = "", limit: int = 20):
     """Search the CSV business list by name or ID."""
+    store = shared_data.get_store()
+    if store is not None:
+        if not q or len(q) < 2:
+            return {"results": [], "total": store.business_count}
+        return {"results": await asyncio.to_thread(store.search_businesses, q, limit), "total": store.business_count}
+
     _load_csv_businesses()
     if not q or len(q) < 2:
         return {"results": [], "total": len(_csv_businesses)}
@@ -625,6 +821,35 @@ def _init_improve_state(ss_profile: dict, session_id: str) -> dict:
     return state
 
 
+# ────────── ADMISSION CONTROL ──────────
+
+# Turns (session creation and chat) in flight at once; the excess queues briefly, then gets 503
+turn_admission = Bulkhead("turns", MAX_INFLIGHT_TURNS, TURN_QUEUE_MAX, TURN_QUEUE_TIMEOUT)
+
+
+async def _admit_turn():
+    """Take a turn slot (caller releases), or raise 503 + Retry-After when turns are saturated."""
+    try:
+        await turn_admission.acquire()
+    except Saturated as e:
+        logger.warning(f"[ADMISSION] Rejected turn — {turn_admission.in_flight} in flight, "
+                       f"{turn_admission.waiting} queued")
+        raise HTTPException(
+            status_code=503,
+            detail=_BUSY_DETAIL,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+@asynccontextmanager
+async def _turn_slot():
+    await _admit_turn()
+    try:
+        yield
+    finally:
+        turn_admission.release()
+
+
 @app.post("/api/session")
 async def create_session(req: StartRequest, request: Request):
     """Create a new onboarding session and get the welcome message.
@@ -634,13 +859,19 @@ async def create_session(req: StartRequest, request: Request):
     """
     # IP-based rate limit on session creation
     client_ip = request.client.host if request.client else "unknown"
-    if not _check_rate_limit(f"ip:{client_ip}", SESSION_CREATE_LIMIT, SESSION_CREATE_WINDOW):
+    if not await _check_rate_limit(f"ip:{client_ip}", SESSION_CREATE_LIMIT, SESSION_CREATE_WINDOW):
         raise HTTPException(
             status_code=429,
             detail="Too many sessions created — please wait a moment",
             headers={"Retry-After": str(int(SESSION_CREATE_WINDOW))},
         )
 
+    async with _turn_slot():
+        return await _start_session(req)
+
+
+async def _start_session(req: StartRequest) -> dict:
+    """Build the new session's state and run its first node (welcome, or assessment in improve mode)."""
     session_id = str(uuid.uuid4())[:8]
     start_time = time.time()
 
@@ -654,7 +885,8 @@ async def create_session(req: StartRequest, request: Request):
         state = _init_improve_state(ss_profile, session_id)
 
         # Run assessment node (enrichment + gap analysis)
-        result = await assessment_node(state)
+        with spans.recording(session_id, "session", mode="improve"), spans.span("assessment", "node"):
+            result = await assessment_node(state)
         for key, value in result.items():
             if key == "messages":
                 state["messages"] = state.get("messages", []) + value
@@ -662,7 +894,6 @@ async def create_session(req: StartRequest, request: Request):
                 state[key] = value
 
         turn_time = round(time.time() - start_time, 2)
-        sessions[session_id] = state
 
         ai_messages = [m for m in state["messages"] if isinstance(m, AIMessage)]
         response_text = ai_messages[-1].content if ai_messages else "Let me have a look at your profile..."
@@ -697,18 +928,27 @@ async def create_session(req: StartRequest, request: Request):
                 resp["_profile_score"] = assessment["profile_score"]
 
         api_trace = state.pop("_api_trace", [])
-
-        return {
+        metrics.record_trace(api_trace)
+        metrics.record_turn("session", "assessment", turn_time)
+        _note_profiled_request()
+        if req.slim:
+            _drop_unchanged_assessment(resp, state)  # first response: records what was sent
+        await _save_session(session_id, state)
+
+        body = {
             "session_id": session_id,
             "response": resp,
-            "state": _safe_state(state),
-            "api_trace": api_trace,
+            **_state_payload(state),
         }
+        if not req.slim:
+            body["api_trace"] = api_trace
+        return body
 
     # ── New user mode ──
     state = _init_base_state(session_id)
 
-    result = await welcome_node(state)
+    with spans.recording(session_id, "session", mode="new"), spans.span("welcome", "node"):
+        result = await welcome_node(state)
 
     # Merge
     for key, value in result.items():
@@ -718,7 +958,10 @@ async def create_session(req: StartRequest, request: Request):
             state[key] = value
 
     turn_time = round(time.time() - start_time, 2)
-    sessions[session_id] = state
+    metrics.record_trace(state.get("_api_trace", []))
+    metrics.record_turn("session", "welcome", turn_time)
+    _note_profiled_request()
+    await _save_session(session_id, state)
 
     # Extract AI response
     ai_messages = [m for m in state["messages"] if isinstance(m, AIMessage)]
@@ -739,27 +982,99 @@ async def create_session(req: StartRequest, request: Request):
             "node": "welcome",
             "turn_time": turn_time,
         },
-        "state": _safe_state(state),
+        **_state_payload(state),
     }
 
 
-@app.post("/api/chat")
-async def chat(req: MessageRequest):
-    """Send a message and get a response."""
-    state = sessions.get(req.session_id)
+async def _load_chat_session(req: MessageRequest) -> dict:
+    """Fetch the session for a chat turn, applying the per-session rate limit."""
+    state = await sessions.aget(req.session_id)
     if not state:
         raise HTTPException(status_code=404, detail="Session not found")
+    _touch_local(req.session_id)
 
     # Rate limit
-    if not _check_rate_limit(req.session_id):
+    if not await _check_rate_limit(req.session_id):
         raise HTTPException(
             status_code=429,
             detail="Too many requests — please wait a moment",
             headers={"Retry-After": str(int(RATE_WINDOW))},
         )
+    return state
+
+
+@app.post("/api/chat")
+async def chat(req: MessageRequest):
+    """Send a message and get a response."""
+    state = await _load_chat_session(req)
+    async with _turn_slot():
+        return await _chat_turn(req, state)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
 
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: MessageRequest):
+    """Streaming variant of /api/chat (Server-Sent Events).
+
+    Events: `start` immediately, then `node_start` / `node_end` per node,
+    `source` as each enrichment or LLM call finishes, `token` for text
+    replies as they generate, and finally `done` with the same body
+    /api/chat returns (or `error` with status + detail).
+    """
+    state = await _load_chat_session(req)
+    await _admit_turn()  # before the response starts, so saturation is still a plain 503
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def turn():
+        try:
+            with progress_sink(lambda event, data: queue.put_nowait((event, data))):
+                return await _chat_turn(req, state)
+        finally:
+            turn_admission.release()
+
+    # Not cancelled on client disconnect — the turn still completes and saves
+    task = asyncio.create_task(turn())
+    task.add_done_callback(lambda _: queue.put_nowait(finished))
+
+    async def events():
+        yield _sse("start", {"session_id": req.session_id})
+        while True:
+            item = await queue.get()
+            if item is finished:
+                break
+            yield _sse(*item)
+        try:
+            yield _sse("done", task.result())
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+        except Saturated as e:
+            logger.warning(f"[STREAM] {req.session_id}: {e}")
+            yield _sse("error", {"status": 503, "detail": _BUSY_DETAIL, "retry_after": e.retry_after})
+        except Exception:
+            logger.exception(f"[STREAM] Turn failed for {req.session_id}")
+            yield _sse("error", {"status": 500, "detail": "Something went wrong — please try again"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _chat_turn(req: MessageRequest, state: dict) -> dict:
+    """Run one chat turn on a loaded session and build the response body."""
     state["_last_active"] = time.time()
 
+    # Client is in sync — snapshot what it holds so we can reply with a diff.
+    # Deep copy: nodes mutate nested lists/dicts in place.
+    base_state = None
+    if req.since_version is not None and req.since_version == state.get("_version"):
+        base_state = copy.deepcopy(_safe_state(state))
+
     # Add user message
     state["messages"].append(HumanMessage(content=req.message))
     state["_api_trace"] = []  # Reset trace for this turn
@@ -767,10 +1082,17 @@ async def chat(req: MessageRequest):
     start_time = time.time()
 
     # Run the appropriate node
-    state = await run_node(state)
+    try:
+        with spans.recording(req.session_id, "turn", message=req.message[:80]):
+            state = await run_node(state)
+    except Exception:
+        metrics.record_turn_error("chat")
+        await _invalidate_version(req.session_id, state)
+        raise
+    finally:
+        _note_profiled_request()
 
     turn_time = round(time.time() - start_time, 2)
-    sessions[req.session_id] = state
 
     # Extract response
     ai_messages = [m for m in state["messages"] if isinstance(m, AIMessage)]
@@ -803,6 +1125,8 @@ async def chat(req: MessageRequest):
     })
 
     api_trace = state.pop("_api_trace", [])
+    metrics.record_trace(api_trace)
+    metrics.record_turn("chat", node, turn_time)
 
     resp = {
         "text": response_text,
@@ -832,69 +1156,125 @@ async def chat(req: MessageRequest):
                 resp["_assessment_strengths"] = assessment["strengths"]
             if assessment.get("profile_score") is not None:
                 resp["_profile_score"] = assessment["profile_score"]
+    if req.slim:
+        _drop_unchanged_assessment(resp, state)
+    await _save_session(req.session_id, state)
 
-    return {
+    body = {
         "session_id": req.session_id,
         "response": resp,
-        "state": _safe_state(state),
+        **_state_payload(state, base_state),
         "completed": completed,
-        "api_trace": api_trace,
     }
+    # Slim clients skip the debug panel's trace (it includes LLM output)
+    if not req.slim:
+        body["api_trace"] = api_trace
+    return body
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match holds `*` or `etag` among its comma-separated tags.
+
+    Weak comparison: the compression middleware serves ETags as W/"...".
+    """
+    header = request.headers.get("if-none-match", "")
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
 
 
 @app.get("/api/session/{session_id}")
-async def get_session(session_id: str):
-    """Get current session state."""
-    state = sessions.get(session_id)
+async def get_session(session_id: str, request: Request, response: Response):
+    """Get current session state. ETag is the state version."""
+    state = await sessions.aget(session_id)
     if not state:
         raise HTTPException(status_code=404, detail="Session not found")
-    return {"session_id": session_id, "state": _safe_state(state)}
+    etag = f'"{session_id}.{state.get("_version", 0)}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"session_id": session_id, **_state_payload(state)}
 
 
 @app.get("/api/session/{session_id}/result")
 async def get_result(session_id: str):
     """Get final structured output for a completed session."""
-    state = sessions.get(session_id)
+    state = await sessions.aget(session_id)
     if not state:
         raise HTTPException(status_code=404, detail="Session not found")
 
     if not state.get("confirmed"):
         return {"status": "in_progress", "result": None}
 
-    return {"status": "complete", "result": state.get("output_json", {})}
+    # /media URLs stop resolving once the blobs are pruned; hand out the images themselves
+    result = await asyncio.to_thread(_inline_media, state.get("output_json", {}))
+    return {"status": "complete", "result": result}
 
 
 @app.get("/api/logs")
-async def list_logs():
-    """List all session logs."""
-    logs = sorted(LOG_DIR.glob("*.jsonl"), key=lambda f: f.stat().st_mtime, reverse=True)
-    return [
-        {
-            "session_id": f.stem,
-            "size_kb": round(f.stat().st_size / 1024, 1),
-            "modified": datetime.fromtimestamp(f.stat().st_mtime).isoformat(),
-        }
-        for f in logs[:50]
-    ]
+async def list_logs(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    completed: Optional[bool] = None,
+    business: Optional[str] = None,
+    node: Optional[str] = None,
+    since: Optional[float] = None,
+):
+    """List session logs, newest first, from the log index.
+
+    Filters: completed, business (substring), node (last node reached),
+    since (unix time). Pass `next_cursor` back as `cursor` for the next page.
+    """
+    limit = max(1, min(limit, 500))
+    try:
+        page, next_cursor = await asyncio.to_thread(
+            turn_log.index.list_sessions, limit=limit, cursor=cursor,
+            completed=completed, business=business, node=node, since=since,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        "sessions": [
+            {
+                "session_id": e["session_id"],
+                "size_kb": round(e["size"] / 1024, 1),
+                "modified": datetime.fromtimestamp(e["mtime"]).isoformat(),
+                "turns": e["turns"],
+                "total_time": e["total_time"],
+                "completed": e["completed"],
+                "business_name": e["business_name"],
+                "last_node": e["last_node"],
+            }
+            for e in page
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 @app.get("/api/logs/{session_id}")
-async def get_log(session_id: str):
-    """Get full session log."""
-    log_file = LOG_DIR / f"{session_id}.jsonl"
-    if not log_file.exists():
-        raise HTTPException(status_code=404, detail="Log not found")
+async def get_log(session_id: str, offset: int = 0, limit: Optional[int] = None, turns: bool = True):
+    """Get a session log: summary from the index plus turns[offset:offset+limit].
 
-    turns = [json.loads(line) for line in log_file.read_text().strip().split("\n") if line.strip()]
-    total_time = sum(t.get("turn_time", 0) for t in turns)
-    return {
+    `turns=false` returns only the summary (no log file read).
+    """
+    await asyncio.to_thread(turn_log.flush)
+    summary = await asyncio.to_thread(turn_log.index.get, session_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Log not found")
+    result = {
         "session_id": session_id,
-        "total_turns": len(turns),
-        "total_time": round(total_time, 2),
-        "completed": turns[-1].get("completed", False) if turns else False,
-        "business_name": next((t["business_name"] for t in reversed(turns) if t.get("business_name")), ""),
-        "turns": turns,
+        "total_turns": summary["turns"],
+        "total_time": summary["total_time"],
+        "completed": summary["completed"],
+        "business_name": summary["business_name"],
+        "node_times": summary["node_times"],
     }
+    if turns:
+        all_turns = await asyncio.to_thread(turn_log.read, session_id) or []
+        end = None if limit is None else offset + max(limit, 0)
+        result["turns"] = all_turns[offset:end]
+    return result
 
 
 def _is_debug_allowed(request: Request) -> bool:
@@ -913,12 +1293,12 @@ def _debug_state(state: dict) -> dict:
         if k == "messages":
             out["_message_count"] = len(v) if isinstance(v, list) else 0
             continue
-        # Skip large binary data
-        if k in ("profile_logo", "profile_photos") and v:
-            if k == "profile_logo":
-                out[k] = "(base64 data)" if v else ""
-            else:
-                out[k] = [f"(photo {i+1})" for i in range(len(v))]
+        # Skip large inline images (sessions from before the blob store)
+        if k == "profile_logo" and str(v).startswith("data:"):
+            out[k] = "(base64 data)"
+            continue
+        if k == "profile_photos" and v:
+            out[k] = [p if not str(p).startswith("data:") else f"(photo {i+1})" for i, p in enumerate(v)]
             continue
         try:
             json.dumps(v)
@@ -939,6 +1319,81 @@ async def debug_page(request: Request):
     raise HTTPException(status_code=404, detail="debug.html not found")
 
 
+# ────────── PROFILER ──────────
+
+PROFILE_MAX_SECONDS = 120
+_profiler: SamplingProfiler | None = None
+
+
+def _note_profiled_request():
+    if _profiler is not None:
+        _profiler.note_request()
+
+
+@app.post("/api/debug/profile")
+async def run_profile(request: Request, seconds: float = 10, requests: Optional[int] = None,
+                      format: str = "speedscope", interval_ms: float = 5, idle: bool = False):
+    """Sample every thread's stack for `seconds`, or until `requests` more turns finish.
+
+    Returns speedscope JSON (default) or collapsed stacks (`format=collapsed`).
+    Gated: only available on localhost or when DEBUG=1 env var is set.
+    """
+    global _profiler
+    if not _is_debug_allowed(request):
+        raise HTTPException(status_code=403, detail="Debug endpoint not available in production")
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be speedscope or collapsed")
+    if _profiler is not None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    profiler = SamplingProfiler(interval=max(interval_ms, 1) / 1000, include_idle=idle)
+    _profiler = profiler
+    deadline = time.time() + min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    profiler.start()
+    try:
+        while time.time() < deadline and (requests is None or profiler.requests < requests):
+            await asyncio.sleep(0.05)
+    finally:
+        _profiler = None
+        await asyncio.to_thread(profiler.stop)
+    logger.info(f"[PROFILE] worker {os.getpid()}: {sum(sum(c.values()) for c in profiler.samples.values())} samples "
+                f"over {profiler.stopped_at - profiler.started_at:.1f}s, {profiler.requests} requests")
+
+    if format == "collapsed":
+        return Response(content=profiler.collapsed(), media_type="text/plain; charset=utf-8")
+    return profiler.speedscope()
+
+
+@app.get("/api/debug/loop-stalls")
+async def get_loop_stalls(request: Request):
+    """Recent event-loop stalls (newest first) with the stack that was running.
+
+    Gated: only available on localhost or when DEBUG=1 env var is set.
+    """
+    if not _is_debug_allowed(request):
+        raise HTTPException(status_code=403, detail="Debug endpoint not available in production")
+    return {
+        "worker": os.getpid(),
+        "running": loop_watchdog.running,
+        "threshold_ms": loop_watchdog.threshold * 1000,
+        "stalls": list(reversed(loop_watchdog.stalls)),
+    }
+
+
+@app.get("/api/debug-trace/{session_id}")
+async def get_debug_trace(session_id: str, request: Request):
+    """Chrome Trace Event JSON of the session's recorded spans (open in Perfetto or chrome://tracing).
+
+    Gated: only available on localhost or when DEBUG=1 env var is set.
+    """
+    if not _is_debug_allowed(request):
+        raise HTTPException(status_code=403, detail="Debug endpoint not available in production")
+    trace = spans.chrome_trace(session_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No spans recorded for this session")
+    return trace
+
+
 @app.get("/api/debug-state/{session_id}")
 async def get_debug_state(session_id: str, request: Request):
     """Return full unfiltered session state for the debug panel.
@@ -947,15 +1402,38 @@ async def get_debug_state(session_id: str, request: Request):
     """
     if not _is_debug_allowed(request):
         raise HTTPException(status_code=403, detail="Debug endpoint not available in production")
-    state = sessions.get(session_id)
+    state = await sessions.aget(session_id)
     if not state:
         raise HTTPException(status_code=404, detail="Session not found")
     return {"session_id": session_id, "debug_state": _debug_state(state)}
 
 
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5MB
-ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+ALLOWED_IMAGE_TYPES = set(CONTENT_TYPE_EXT)
 MAX_PHOTOS = 6
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+blobs = BlobStore(Path(__file__).parent.parent / BLOB_DIR)
+
+
+def _media_refs(state: dict) -> list[str]:
+    """Blob hashes of the session's uploaded logo and photos."""
+    urls = [state.get("profile_logo", ""), *state.get("profile_photos", [])]
+    return [sha for sha in map(media_sha, urls) if sha]
+
+
+def _inline_media(output: dict) -> dict:
+    """Copy of output_json with /media image URLs replaced by data: URLs (blocking: reads blobs)."""
+    profile = output.get("profile")
+    if not profile:
+        return output
+
+    def inline(url):
+        sha = media_sha(url)
+        return (blobs.data_url(sha) or url) if sha else url
+
+    return {**output, "profile": {**profile, "logo": inline(profile.get("logo", "")),
+                                  "photos": [inline(u) for u in profile.get("photos", [])]}}
 
 
 @app.post("/api/upload")
@@ -964,8 +1442,8 @@ async def upload_image(
     upload_type: str = Form(...),
     file: UploadFile = File(...),
 ):
-    """Upload a logo or work photo. Stores as base64 data URL in session state."""
-    state = sessions.get(session_id)
+    """Upload a logo or work photo. Stores it in the blob store and references it by /media URL."""
+    state = await sessions.aget(session_id)
     if not state:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -975,22 +1453,39 @@ async def upload_image(
     if file.content_type not in ALLOWED_IMAGE_TYPES:
         raise HTTPException(status_code=400, detail=f"Invalid image type: {file.content_type}")
 
-    data = await file.read()
-    if len(data) > MAX_UPLOAD_SIZE:
-        raise HTTPException(status_code=400, detail="File exceeds 5MB limit")
+    photos = state.get("profile_photos", [])
+    if upload_type == "photo" and len(photos) >= MAX_PHOTOS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_PHOTOS} photos allowed")
 
-    data_url = f"data:{file.content_type};base64,{base64.b64encode(data).decode()}"
+    try:
+        sha = await asyncio.to_thread(blobs.put_stream, file.file, file.content_type, MAX_UPLOAD_SIZE)
+    except BlobTooLarge:
+        raise HTTPException(status_code=400, detail="File exceeds 5MB limit")
+    url = media_url(sha)
 
     if upload_type == "logo":
-        state["profile_logo"] = data_url
+        state["profile_logo"] = url
     else:
-        photos = state.get("profile_photos", [])
-        if len(photos) >= MAX_PHOTOS:
-            raise HTTPException(status_code=400, detail=f"Maximum {MAX_PHOTOS} photos allowed")
-        photos.append(data_url)
+        photos.append(url)
         state["profile_photos"] = photos
-
-    return {"ok": True, "upload_type": upload_type, "count": len(state.get("profile_photos", []))}
+    await _save_session(session_id, state)
+
+    return {"ok": True, "upload_type": upload_type, "url": url,
+            "count": len(state.get("profile_photos", []))}
+
+
+@app.get("/media/{blob_hash}")
+async def get_media(blob_hash: str, request: Request):
+    """Serve an uploaded image. Content-addressed, so cacheable forever."""
+    found = await asyncio.to_thread(blobs.locate, blob_hash)  # stats files on shared storage
+    if not found:
+        raise HTTPException(status_code=404, detail="Media not found")
+    path, content_type = found
+    etag = f'"{blob_hash}"'
+    headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=content_type, headers=headers)
 
 
 # ────────── HELPERS ──────────
@@ -0,0 +1,143 @@
+"""Content-addressed on-disk store for uploaded images.
+
+Uploads are streamed to `{root}/{sha[:2]}/{sha}.{ext}` and referenced from
+session state by `/media/{sha}` URLs instead of base64 data URLs, so state
+snapshots and chat responses stay small. Identical uploads share one file.
+
+Retention: `prune` deletes blobs whose mtime is older than
+BLOB_RETENTION_DAYS. Saving a session `keep`s the blobs it references
+(refreshes their mtime), so nothing a live session points at is pruned.
+`/media` URLs are only meaningful to this server for that long; the final
+output from /api/session/{id}/result carries the images inline
+(`data_url`) so it stays valid after the blobs are gone.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_EXT = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+_EXT_CONTENT_TYPE = {ext: ct for ct, ext in CONTENT_TYPE_EXT.items()}
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_MEDIA_URL_RE = re.compile(r"^/media/(?P<sha>[0-9a-f]{64})$")
+_CHUNK = 64 * 1024
+
+
+class BlobTooLarge(Exception):
+    """Raised when a streamed upload exceeds the size limit."""
+
+
+class BlobStore:
+    """sha256-addressed blob directory. Writes are atomic (temp file + rename)."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def put_stream(self, src: BinaryIO, content_type: str, max_bytes: int) -> str:
+        """Copy a file-like object into the store. Returns the sha256 hex digest.
+
+        Blocking — call via asyncio.to_thread from request handlers.
+        """
+        ext = CONTENT_TYPE_EXT[content_type]
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = src.read(_CHUNK)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise BlobTooLarge(f"{size} > {max_bytes} bytes")
+                    digest.update(chunk)
+                    out.write(chunk)
+            sha = digest.hexdigest()
+            final = self._path(sha, ext)
+            if final.exists():
+                os.utime(final)  # refresh for prune()
+                os.unlink(tmp_path)
+            else:
+                final.parent.mkdir(exist_ok=True)
+                os.replace(tmp_path, final)
+            return sha
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _path(self, sha: str, ext: str) -> Path:
+        return self.root / sha[:2] / f"{sha}.{ext}"
+
+    def locate(self, sha: str) -> tuple[Path, str] | None:
+        """Return (path, content_type) for a stored blob, or None."""
+        if not _HASH_RE.match(sha):
+            return None
+        for ext, content_type in _EXT_CONTENT_TYPE.items():
+            path = self._path(sha, ext)
+            if path.exists():
+                return path, content_type
+        return None
+
+    def keep(self, shas) -> int:
+        """Refresh the given blobs so prune() spares them. Returns how many were found."""
+        found = 0
+        for sha in shas:
+            located = self.locate(sha)
+            if located is None:
+                continue
+            try:
+                os.utime(located[0])
+                found += 1
+            except FileNotFoundError:
+                pass
+        return found
+
+    def data_url(self, sha: str) -> str | None:
+        """The blob as a self-contained data: URL, or None if it isn't stored."""
+        located = self.locate(sha)
+        if located is None:
+            return None
+        path, content_type = located
+        return f"data:{content_type};base64,{base64.b64encode(path.read_bytes()).decode()}"
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Delete blobs not written or re-uploaded within max_age_seconds."""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for path in self.root.glob("??/*.*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def media_url(sha: str) -> str:
+    """URL path under which the server serves a blob."""
+    return f"/media/{sha}"
+
+
+def media_sha(url: str) -> str | None:
+    """The blob hash in a media_url(), or None for any other URL (data:, external)."""
+    m = _MEDIA_URL_RE.match(url or "")
+    return m["sha"] if m else None
@@ -0,0 +1,144 @@
+"""Response compression middleware (brotli when installed, else gzip).
+
+Chat responses carry the frontend state (services, areas, photos) and, for
+the debug panel, the turn's `api_trace`; they compress 5-10x. Only bodies of
+at least `minimum_size` bytes with a compressible content type are
+compressed, chosen by the request's Accept-Encoding (q-values honoured, br
+preferred over gzip on a tie).
+
+Server-Sent Events are never compressed — a compressor would hold tokens
+back until its buffer fills. Other streamed bodies (e.g. static files) are
+compressed chunk by chunk.
+"""
+from __future__ import annotations
+
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: "br" is only offered when installed
+    brotli = None
+
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "image/svg+xml")
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 4   # ~gzip-6 CPU cost, smaller output
+
+
+def _accepted(header: str) -> dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """"br", "gzip" or None for an Accept-Encoding header value."""
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    options = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in options:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=_BROTLI_QUALITY)
+            self._chunk, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip wrapper
+            self._chunk, self._finish = self._c.compress, self._c.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._chunk(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None or b"range" in headers:
+            await self.app(scope, receive, send)
+            return
+
+        start: dict | None = None
+        compressor: _Compressor | None = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                response_headers = {k.lower(): v for k, v in start.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in response_headers
+                        or content_type.startswith("text/event-stream")
+                        or not content_type.startswith(_COMPRESSIBLE)
+                        or start["status"] in (204, 206, 304)
+                        or (not more and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                out_headers = []
+                for k, v in start.get("headers", []):
+                    if k.lower() == b"content-length":
+                        continue
+                    if k.lower() == b"etag" and not v.startswith(b"W/"):
+                        v = b"W/" + v   # same resource, different bytes: only weakly equal
+                    out_headers.append((k, v))
+                out_headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+                if not more:
+                    # Whole body in one message: compress in one go and keep Content-Length
+                    data = compress(body, encoding)
+                    out_headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start, "headers": out_headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                compressor = _Compressor(encoding)
+                await send({**start, "headers": out_headers})
+
+            data = compressor.compress(body)
+            if not more:
+                data += compressor.finish()
+            if data or not more:
+                await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
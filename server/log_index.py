@@ -0,0 +1,179 @@
+"""SQLite catalogue of turn logs, kept current by the turn-log writer thread.
+
+One summary row per session (turn count, total time, completion, business
+name, last node, bytes logged) plus per-node latency totals, so /api/logs
+can page and filter without touching the log files.
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_sessions (
+    session_id    TEXT PRIMARY KEY,
+    turns         INTEGER NOT NULL,
+    total_time    REAL NOT NULL,
+    completed     INTEGER NOT NULL,
+    business_name TEXT NOT NULL,
+    flow_mode     TEXT NOT NULL,
+    last_node     TEXT NOT NULL,
+    first_ts      TEXT NOT NULL,
+    last_ts       TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    mtime         REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_log_sessions_mtime ON log_sessions(mtime, session_id);
+CREATE TABLE IF NOT EXISTS log_node_times (
+    session_id TEXT NOT NULL,
+    node       TEXT NOT NULL,
+    turns      INTEGER NOT NULL,
+    total_time REAL NOT NULL,
+    max_time   REAL NOT NULL,
+    PRIMARY KEY (session_id, node)
+);
+"""
+
+_UPSERT_SESSION = """
+INSERT INTO log_sessions
+    (session_id, turns, total_time, completed, business_name, flow_mode, last_node,
+     first_ts, last_ts, size, mtime)
+VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(session_id) DO UPDATE SET
+    turns         = turns + 1,
+    total_time    = total_time + excluded.total_time,
+    completed     = MAX(completed, excluded.completed),
+    business_name = CASE WHEN excluded.business_name != '' THEN excluded.business_name ELSE business_name END,
+    flow_mode     = CASE WHEN excluded.flow_mode != '' THEN excluded.flow_mode ELSE flow_mode END,
+    last_node     = excluded.last_node,
+    last_ts       = excluded.last_ts,
+    size          = size + excluded.size,
+    mtime         = excluded.mtime
+"""
+
+_UPSERT_NODE = """
+INSERT INTO log_node_times (session_id, node, turns, total_time, max_time)
+VALUES (?, ?, 1, ?, ?)
+ON CONFLICT(session_id, node) DO UPDATE SET
+    turns      = turns + 1,
+    total_time = total_time + excluded.total_time,
+    max_time   = MAX(max_time, excluded.max_time)
+"""
+
+
+class LogIndex:
+    """Summary rows for every logged session. Thread-safe; one shared connection."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def record(self, entries: list[tuple[str, dict, int]], mtime: float):
+        """Fold a batch of (session_id, turn, bytes written) into the summaries."""
+        session_rows, node_rows = [], []
+        for sid, turn, size in entries:
+            turn_time = float(turn.get("turn_time") or 0)
+            ts = str(turn.get("timestamp", ""))
+            node = str(turn.get("node", ""))
+            session_rows.append((
+                sid, turn_time, int(bool(turn.get("completed"))), str(turn.get("business_name") or ""),
+                str(turn.get("flow_mode") or ""), node, ts, ts, size, mtime,
+            ))
+            if node:
+                node_rows.append((sid, node, turn_time, turn_time))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(_UPSERT_SESSION, session_rows)
+                self._conn.executemany(_UPSERT_NODE, node_rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM log_sessions LIMIT 1").fetchone() is None
+
+    def list_sessions(self, *, limit: int = 50, cursor: str | None = None, completed: bool | None = None,
+                      business: str | None = None, node: str | None = None,
+                      since: float | None = None) -> tuple[list[dict], str | None]:
+        """Newest-first page of session summaries and the cursor for the next page.
+
+        The cursor is keyset-based ("mtime:session_id"), so deep pages cost the
+        same as the first.
+        """
+        where, params = [], []
+        if cursor:
+            mtime, _, sid = cursor.partition(":")
+            where.append("(mtime < ? OR (mtime = ? AND session_id < ?))")
+            params += [float(mtime), float(mtime), sid]
+        if completed is not None:
+            where.append("completed = ?")
+            params.append(int(completed))
+        if business:
+            where.append("business_name LIKE ? ESCAPE '\\'")
+            escaped = business.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if node:
+            where.append("last_node = ?")
+            params.append(node)
+        if since is not None:
+            where.append("mtime >= ?")
+            params.append(since)
+        sql = ("SELECT session_id, turns, total_time, completed, business_name, flow_mode, last_node,"
+               " first_ts, last_ts, size, mtime FROM log_sessions"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY mtime DESC, session_id DESC LIMIT ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+        page = [self._row(r) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = f"{last[10]!r}:{last[0]}"
+        return page, next_cursor
+
+    def get(self, session_id: str) -> dict | None:
+        """Summary for one session, including per-node latency totals."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, turns, total_time, completed, business_name, flow_mode, last_node,"
+                " first_ts, last_ts, size, mtime FROM log_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            nodes = self._conn.execute(
+                "SELECT node, turns, total_time, max_time FROM log_node_times"
+                " WHERE session_id = ? ORDER BY total_time DESC", (session_id,)
+            ).fetchall()
+        summary = self._row(row)
+        summary["node_times"] = {
+            n: {"turns": t, "total_time": round(total, 2), "avg_time": round(total / t, 2) if t else 0.0,
+                "max_time": round(mx, 2)}
+            for n, t, total, mx in nodes
+        }
+        return summary
+
+    @staticmethod
+    def _row(r) -> dict:
+        return {
+            "session_id": r[0], "turns": r[1], "total_time": round(r[2], 2), "completed": bool(r[3]),
+            "business_name": r[4], "flow_mode": r[5], "last_node": r[6],
+            "first_ts": r[7], "last_ts": r[8], "size": r[9], "mtime": r[10],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM log_sessions")
+            self._conn.execute("DELETE FROM log_node_times")
@@ -0,0 +1,115 @@
+"""Event-loop stall detector.
+
+A heartbeat callback on the loop stamps the time every `interval`; a
+watchdog thread checks the stamp. When the loop has gone quiet for longer
+than `threshold`, something synchronous is running on it — a CPU-bound scan,
+a blocking file write, a sync SDK call — and the watchdog snapshots the loop
+thread's stack right then, while the culprit is still on it.
+
+When the heartbeat resumes, the stall is finished: its duration and stack
+are logged, counted in /metrics (`onboarding_loop_stalls_total`,
+`onboarding_loop_stall_seconds`, labelled by the deepest frame in our own
+code) and kept in a short history for /api/debug/loop-stalls.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from server import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 40
+HISTORY = 50
+
+_HERE = os.path.abspath(__file__)
+_ROOT = os.path.dirname(os.path.dirname(_HERE))
+
+
+def _culprit(stack: list[traceback.FrameSummary]) -> str:
+    """Deepest frame in this repo (not stdlib or site-packages), as "file:function"."""
+    for fs in reversed(stack):
+        path = os.path.abspath(fs.filename)
+        if path.startswith(_ROOT) and "site-packages" not in path and path != _HERE:
+            return f"{os.path.relpath(path, _ROOT)}:{fs.name}"
+    return f"{os.path.basename(stack[-1].filename)}:{stack[-1].name}" if stack else "unknown"
+
+
+class LoopWatchdog:
+    """Watches one event loop. `start()` must be called from the loop's thread."""
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.02):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque[dict] = deque(maxlen=HISTORY)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._last_beat = 0.0
+        self._handle: asyncio.TimerHandle | None = None
+        self._stack: list[traceback.FrameSummary] | None = None   # captured during the current stall
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._beat)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout=1)
+
+    # ── loop side ──
+
+    def _beat(self):
+        now = time.monotonic()
+        gap = now - self._last_beat - self.interval
+        self._last_beat = now
+        stack, self._stack = self._stack, None
+        if gap >= self.threshold:
+            self._report(gap, stack)
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _report(self, duration: float, stack: list[traceback.FrameSummary] | None):
+        culprit = _culprit(stack) if stack else "unknown"
+        formatted = "".join(traceback.format_list(stack)) if stack else ""
+        self.stalls.append({
+            "at": time.time() - duration, "duration": round(duration, 4),
+            "culprit": culprit, "stack": formatted,
+        })
+        metrics.record_loop_stall(culprit, duration)
+        logger.warning(f"[LOOP] Event loop blocked {duration * 1000:.0f}ms in {culprit}\n{formatted}")
+
+    # ── watchdog thread ──
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            if self._stack is not None:
+                continue   # already captured this stall; wait for the loop to come back
+            if time.monotonic() - self._last_beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._stack = traceback.extract_stack(frame)[-MAX_STACK_DEPTH:]
@@ -0,0 +1,272 @@
+"""Process-wide latency metrics, exposed in Prometheus text format at /metrics.
+
+Fed from four places:
+- every `_api_trace` entry a turn produced (per external API / LLM call)
+- every node run, including auto-chained ones (per node)
+- every turn's `turn_time`, labelled by the node it ended on
+- event-loop stalls caught by server/loop_watchdog.py
+
+Each series is a fixed-bucket histogram. p50/p95/p99 are estimated from the
+buckets and published alongside as gauges, so the tail is readable without
+PromQL.
+
+Metrics are per worker process. With WEB_CONCURRENCY > 1 every worker
+answers /metrics on the same port, so each scrape returns whichever worker
+took the request; every series then carries a `worker` label (the pid) so
+workers stay separate series instead of one series that jumps between
+scrapes. Aggregate with `sum without (worker)`.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import os
+import threading
+import time
+
+from agent.config import WEB_CONCURRENCY
+
+# Seconds. External APIs and Haiku calls sit between ~50 ms and ~30 s.
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, math.inf)
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Histogram:
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)   # non-cumulative
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i]
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-2]
+
+
+def _fmt(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _worker_labels() -> tuple:
+    # Read at render time: the pid is the forked worker's, not the parent's
+    return (("worker", str(os.getpid())),) if WEB_CONCURRENCY > 1 else ()
+
+
+def _labels(pairs) -> str:
+    pairs = _worker_labels() + tuple(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Histograms and counters keyed by (metric name, label pairs). Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: dict[str, tuple[str, str]] = {}          # name → (type, help)
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self.started = time.time()
+
+    def histogram(self, name: str, help_text: str):
+        self._help.setdefault(name, ("histogram", help_text))
+        self._histograms.setdefault(name, {})
+
+    def counter(self, name: str, help_text: str):
+        self._help.setdefault(name, ("counter", help_text))
+        self._counters.setdefault(name, {})
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + amount
+
+    def snapshot(self, name: str) -> dict[tuple, Histogram]:
+        with self._lock:
+            return dict(self._histograms.get(name, {}))
+
+    def render(self, extra_gauges: dict[str, tuple[str, float]] | None = None) -> str:
+        """Prometheus text exposition (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, series in self._histograms.items():
+                _, help_text = self._help[name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{_labels(key + (('le', _fmt(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {_fmt(round(hist.sum, 6))}")
+                    lines.append(f"{name}_count{_labels(key)} {hist.count}")
+                quantile_name = f"{name.removesuffix('_seconds')}_quantile_seconds"
+                lines += [f"# HELP {quantile_name} Bucket-interpolated quantiles of {name}",
+                          f"# TYPE {quantile_name} gauge"]
+                for key, hist in sorted(series.items()):
+                    for q in QUANTILES:
+                        lines.append(f"{quantile_name}{_labels(key + (('quantile', str(q)),))} "
+                                     f"{_fmt(round(hist.quantile(q), 4))}")
+            for name, series in self._counters.items():
+                _, help_text = self._help[name]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {_fmt(value)}")
+        for name, (help_text, value) in (extra_gauges or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{_labels(())} {_fmt(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+# ────────── ONBOARDING METRICS ──────────
+
+metrics = MetricsRegistry()
+metrics.histogram("onboarding_api_latency_seconds", "Latency of traced external API and LLM calls")
+metrics.counter("onboarding_api_errors_total", "Traced calls that failed (error flag or data.error)")
+metrics.histogram("onboarding_node_latency_seconds", "Wall time of each node run, including auto-chained nodes")
+metrics.counter("onboarding_node_errors_total", "Node runs that raised")
+metrics.histogram("onboarding_turn_seconds", "Request turn time, labelled by the node the turn ended on")
+metrics.counter("onboarding_turn_errors_total", "Turns that failed with a server error")
+metrics.histogram("onboarding_loop_stall_seconds", "Event-loop stalls, labelled by the deepest frame in our code")
+metrics.counter("onboarding_loop_stalls_total", "Event-loop stalls above LOOP_STALL_THRESHOLD_MS")
+metrics.counter("onboarding_llm_tokens_total",
+                "LLM tokens of traced calls by kind: input read from the prompt cache (cached), written to it "
+                "(cache_write), neither (uncached), and output")
+
+
+def _is_error(entry: dict) -> bool:
+    """Failed calls carry `error` (set by `_trace`) or an `error` in their data; summaries are prose."""
+    data = entry.get("data") or {}
+    return bool(entry.get("error") or (isinstance(data, dict) and data.get("error")))
+
+
+def record_trace(api_trace: list[dict]):
+    """Fold a turn's `_api_trace` into the per-API histograms and LLM token counters.
+
+    Zero-duration entries are bookkeeping (guides loaded, matching decisions),
+    not calls, and are skipped.
+    """
+    for entry in api_trace:
+        api = entry.get("api", "unknown")
+        duration = entry.get("time") or 0
+        if _is_error(entry):
+            metrics.inc("onboarding_api_errors_total", api=api)
+        if duration > 0:
+            metrics.observe("onboarding_api_latency_seconds", duration, api=api)
+        data = entry.get("data")
+        tokens = data.get("tokens") if isinstance(data, dict) else None
+        for kind in ("cached", "cache_write", "uncached", "output"):
+            if tokens and tokens.get(kind):
+                metrics.inc("onboarding_llm_tokens_total", tokens[kind], api=api, kind=kind)
+
+
+def record_node(node: str, seconds: float, error: bool = False):
+    metrics.observe("onboarding_node_latency_seconds", seconds, node=node)
+    if error:
+        metrics.inc("onboarding_node_errors_total", node=node)
+
+
+def record_turn(endpoint: str, node: str, seconds: float):
+    metrics.observe("onboarding_turn_seconds", seconds, endpoint=endpoint, node=node)
+
+
+def record_turn_error(endpoint: str):
+    metrics.inc("onboarding_turn_errors_total", endpoint=endpoint)
+
+
+def record_loop_stall(culprit: str, seconds: float):
+    metrics.observe("onboarding_loop_stall_seconds", seconds, culprit=culprit)
+    metrics.inc("onboarding_loop_stalls_total", culprit=culprit)
+
+
+def _rss_bytes() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is peak, in KB on Linux and bytes on macOS — better than nothing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if os.uname().sysname == "Darwin" else 1024)
+
+
+_BULKHEAD_FAMILIES = (
+    ("onboarding_bulkhead_in_flight", "gauge", "in_flight", "Work currently holding a slot in the concurrency budget"),
+    ("onboarding_bulkhead_waiting", "gauge", "waiting", "Work queued for a slot in the concurrency budget"),
+    ("onboarding_bulkhead_limit", "gauge", "limit", "Size of the concurrency budget"),
+    ("onboarding_bulkhead_rejected_total", "counter", "rejected",
+     "Work turned away because the budget and its queue were full"),
+)
+
+
+def _render_bulkheads(bulkheads: list[dict]) -> str:
+    """Families for agent/limits.py budgets (turn admission and per-upstream), labelled by budget name."""
+    lines = []
+    for name, kind, field, help_text in _BULKHEAD_FAMILIES:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for b in sorted(bulkheads, key=lambda b: b["name"]):
+            lines.append(f"{name}{_labels((('bulkhead', b['name']),))} {_fmt(b[field])}")
+    return "\n".join(lines) + "\n"
+
+
+def _render_llm_cache(stats: dict) -> str:
+    """Families for agent/llm.py's response cache: lookups by model and result, entries held."""
+    name = "onboarding_llm_cache_requests_total"
+    lines = [f"# HELP {name} Cacheable LLM calls by model and result (hit, disk_hit, miss)", f"# TYPE {name} counter"]
+    for (model, result), n in sorted(stats["requests"].items()):
+        lines.append(f"{name}{_labels((('model', model), ('result', result)))} {_fmt(n)}")
+    lines += ["# HELP onboarding_llm_cache_entries LLM responses held in the in-memory cache",
+              "# TYPE onboarding_llm_cache_entries gauge",
+              f"onboarding_llm_cache_entries{_labels(())} {_fmt(stats['entries'])}",
+              "# HELP onboarding_llm_cache_evictions_total Entries evicted from the in-memory cache (LRU)",
+              "# TYPE onboarding_llm_cache_evictions_total counter",
+              f"onboarding_llm_cache_evictions_total{_labels(())} {_fmt(stats['evictions'])}"]
+    return "\n".join(lines) + "\n"
+
+
+def render(active_sessions: int | None = None, bulkheads: list[dict] | None = None,
+           llm_cache: dict | None = None) -> str:
+    gauges = {
+        "process_resident_memory_bytes": ("Resident memory size in bytes", _rss_bytes()),
+        "process_uptime_seconds": ("Seconds since the metrics registry started", time.time() - metrics.started),
+    }
+    if active_sessions is not None:
+        gauges["onboarding_active_sessions"] = ("Sessions currently held by the session store", active_sessions)
+    text = metrics.render(gauges)
+    if bulkheads:
+        text += _render_bulkheads(bulkheads)
+    if llm_cache:
+        text += _render_llm_cache(llm_cache)
+    return text
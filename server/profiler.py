@@ -0,0 +1,133 @@
+"""On-demand statistical sampling profiler.
+
+A background thread snapshots every thread's Python stack via
+`sys._current_frames()` at a fixed interval: the event loop thread (where
+`run_node` and the nodes run) and the executor threads behind
+`asyncio.to_thread` (e.g. `qbcc_load_csv`). Nothing is instrumented, so the
+cost is one stack walk per thread per sample and zero while not profiling.
+
+Output is collapsed stacks (flamegraph.pl / speedscope import) or a
+speedscope JSON document with one sampled profile per thread.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_DEPTH = 128
+
+# Leaf frames in these files mean the thread is parked, not working
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """One profile at a time: `start()`, let traffic run, `stop()`, then export."""
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples: dict[str, Counter] = {}   # thread name → Counter of root-first frame tuples
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self.requests = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError("profiler already running")
+            self.samples = {}
+            self.requests = 0
+            self.started_at = time.time()
+            self.stopped_at = 0.0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout=5)
+        self.stopped_at = time.time()
+
+    def note_request(self):
+        """Count a finished request while profiling (for "next N requests" windows)."""
+        if self._thread is not None:
+            self.requests += 1
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                if not self.include_idle and os.path.basename(stack[0].co_filename) in _IDLE_FILES:
+                    continue
+                stack.reverse()
+                name = names.get(ident, f"thread-{ident}")
+                self.samples.setdefault(name, Counter())[tuple(_frame_label(c) for c in stack)] += 1
+
+    # ── export ──
+
+    def collapsed(self) -> str:
+        """Brendan Gregg folded format: `thread;root;...;leaf count` per line."""
+        lines = []
+        for thread, counter in sorted(self.samples.items()):
+            for stack, count in counter.most_common():
+                lines.append(";".join((thread,) + stack).replace(" ", "_") + f" {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self) -> dict:
+        """speedscope file format (https://www.speedscope.app/file-format-schema.json)."""
+        frames: list[dict] = []
+        index: dict[str, int] = {}
+        profiles = []
+        duration = (self.stopped_at or time.time()) - self.started_at
+        for thread, counter in sorted(self.samples.items()):
+            samples, weights = [], []
+            for stack, count in counter.most_common():
+                ids = []
+                for label in stack:
+                    if label not in index:
+                        name, _, where = label.partition(" (")
+                        file, _, line = where.rstrip(")").rpartition(":")
+                        index[label] = len(frames)
+                        frames.append({"name": name, "file": file, "line": int(line)})
+                    ids.append(index[label])
+                samples.append(ids)
+                weights.append(round(count * self.interval, 6))
+            profiles.append({
+                "type": "sampled", "name": thread, "unit": "seconds",
+                "startValue": 0, "endValue": round(duration, 6),
+                "samples": samples, "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": f"onboarding profile ({duration:.1f}s, {self.requests} requests)",
+            "exporter": "server/profiler.py",
+        }
@@ -0,0 +1,178 @@
+"""Request rate limiting for the onboarding server.
+
+Sliding-window counters: each key holds the request count for the current
+and previous fixed window, and the previous count is weighted by how much
+of it still overlaps the sliding window. That is O(1) time and memory per
+key, unlike keeping every timestamp.
+
+Backends:
+- memory: per-process (each worker enforces its own limit)
+- redis:  counters on a Redis-protocol server, so limits hold across workers
+
+Select with RATE_LIMIT_BACKEND (see agent/config.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import threading
+import time
+
+from server.resp import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+
+def _allowed(prev: int, cur: int, elapsed_fraction: float, limit: int) -> bool:
+    return prev * (1.0 - elapsed_fraction) + cur < limit
+
+
+class RateLimiter:
+    """`hit(key, limit, window)` records a request and returns False if over the limit.
+
+    Rejected requests are not counted, so a client that backs off is let in
+    again as soon as the window slides.
+    """
+
+    # True when `hit` does network I/O (async callers use `ahit`)
+    blocking = True
+
+    def hit(self, key: str, limit: int, window: float) -> bool:
+        raise NotImplementedError
+
+    async def ahit(self, key: str, limit: int, window: float) -> bool:
+        """`hit` without blocking the event loop."""
+        if not self.blocking:
+            return self.hit(key, limit, window)
+        return await asyncio.to_thread(self.hit, key, limit, window)
+
+    def forget(self, key: str):
+        """Drop a key's counters (e.g. its session ended)."""
+
+    def sweep(self) -> int:
+        """Drop counters idle long enough to no longer matter. Returns how many."""
+        return 0
+
+
+# ────────── MEMORY ──────────
+
+class MemoryRateLimiter(RateLimiter):
+    """In-process counters, ordered by last hit so `sweep` only visits idle keys."""
+
+    blocking = False
+
+    def __init__(self):
+        # key → [window, window_index, prev_count, cur_count, last_hit]
+        self._counters: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            entry = self._counters.pop(key, None)
+            if entry is None:
+                entry = [window, index, 0, 0, now]
+            elif index != entry[1]:
+                entry[2] = entry[3] if index == entry[1] + 1 else 0
+                entry[3] = 0
+                entry[1] = index
+            self._counters[key] = entry  # re-insert: dict order is last-hit order
+            entry[4] = now
+            if not _allowed(entry[2], entry[3], now / window - index, limit):
+                return False
+            entry[3] += 1
+            return True
+
+    def forget(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def sweep(self):
+        """Drop keys with no hits for two of their windows (both counts would be zero)."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._counters:
+                key, entry = next(iter(self._counters.items()))
+                if now - entry[4] < 2 * entry[0]:
+                    break
+                del self._counters[key]
+                removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._counters)
+
+
+# ────────── REDIS ──────────
+
+class RedisRateLimiter(RateLimiter):
+    """Counters shared through Redis: `{prefix}{key}:{window_index}` with a 2-window TTL.
+
+    Keys expire on their own, so there is nothing to sweep. If Redis is
+    unreachable the limiter fails open rather than taking the site down, and
+    stops asking for `retry_interval` seconds: one probe per interval decides
+    whether it is back, instead of every request waiting out a timeout.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:", *,
+                 timeout: float = 0.5, connect_timeout: float = 0.2, retry_interval: float = 10.0):
+        self.client = RespClient(url, timeout=timeout, connect_timeout=connect_timeout)
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        with self._lock:
+            if now < self._down_until:
+                return True
+            if self._down_until:
+                # Circuit open: this request is the probe; the rest keep failing open meanwhile
+                self._down_until = now + self.retry_interval
+        try:
+            allowed = self._hit(key, limit, window, now)
+        except (OSError, RespError) as e:
+            with self._lock:
+                if not self._down_until:
+                    logger.warning(f"[RATE] Redis unavailable, allowing requests for "
+                                   f"{self.retry_interval:g}s: {e}")
+                self._down_until = time.time() + self.retry_interval
+            return True
+        with self._lock:
+            if self._down_until:
+                logger.info("[RATE] Redis reachable again")
+            self._down_until = 0.0
+        return allowed
+
+    def _hit(self, key, limit, window, now):
+        index = int(now // window)
+        cur_key = f"{self.prefix}{key}:{index}"
+        cur, _, prev = self.client.pipeline([
+            ("INCR", cur_key),
+            ("PEXPIRE", cur_key, int(math.ceil(2 * window * 1000))),
+            ("GET", f"{self.prefix}{key}:{index - 1}"),
+        ])
+        if isinstance(cur, RespError):
+            raise cur
+        # INCR counted this request; take it back if it's rejected
+        if not _allowed(int(prev or 0), cur - 1, now / window - index, limit):
+            self.client.execute("DECR", cur_key)
+            return False
+        return True
+
+
+# ────────── FACTORY ──────────
+
+def make_rate_limiter(backend: str, *, redis_url: str = "") -> RateLimiter:
+    """Build the configured rate limiter ("memory" or "redis")."""
+    backend = (backend or "memory").lower()
+    if backend == "redis":
+        logger.info(f"[RATE] Redis rate limiter at {redis_url}")
+        return RedisRateLimiter(redis_url)
+    if backend != "memory":
+        logger.warning(f"[RATE] Unknown RATE_LIMIT_BACKEND '{backend}' — using memory")
+    return MemoryRateLimiter()
@@ -0,0 +1,166 @@
+"""Minimal Redis (RESP2) client for shared server state.
+
+Only the handful of commands the session store and rate limiter need.
+Kept dependency-free so any Redis-protocol server works — real Redis,
+KeyDB, Dragonfly, or the local stand-in used by the tests.
+"""
+from __future__ import annotations
+
+import socket
+import threading
+from urllib.parse import urlparse
+
+
+# Read-only commands: safe to re-send on a fresh connection
+_RETRYABLE = frozenset({"GET", "EXISTS", "ZCARD", "ZRANGE", "ZRANGEBYSCORE", "PING"})
+
+
+class RespError(Exception):
+    """Error reply from the server (e.g. WRONGTYPE, unknown command)."""
+
+
+class RespClient:
+    """Blocking, thread-safe RESP2 client over a single TCP connection.
+
+    Calls block for up to `timeout` per socket operation, so async callers
+    run them in a thread. `connect_timeout` (default: `timeout`) bounds
+    opening the connection. After a socket error the next call reconnects.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", timeout: float = 2.0,
+                 connect_timeout: float | None = None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password or ""
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.timeout = timeout
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self._sock: socket.socket | None = None
+        self._buf = b""
+        self._watching = False
+        self.lock = threading.RLock()
+
+    # ── connection ──
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        self._sock.settimeout(self.timeout)
+        self._buf = b""
+        if self.password:
+            self._roundtrip(("AUTH", self.password))
+        if self.db:
+            self._roundtrip(("SELECT", str(self.db)))
+
+    def close(self):
+        with self.lock:
+            self._watching = False   # the server drops WATCHes with the connection
+            if self._sock:
+                try:
+                    self._sock.close()
+                except OSError:
+                    pass
+            self._sock = None
+
+    # ── protocol ──
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            if isinstance(a, bytes):
+                b = a
+            elif isinstance(a, (int, float)):
+                b = repr(a).encode()
+            else:
+                b = str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    def _readline(self) -> bytes:
+        while b"\r\n" not in self._buf:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Connection closed by server")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\r\n", 1)
+        return line
+
+    def _readexact(self, n: int) -> bytes:
+        while len(self._buf) < n + 2:
+            chunk = self._sock.recv(max(65536, n + 2 - len(self._buf)))
+            if not chunk:
+                raise ConnectionError("Connection closed by server")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n + 2:]
+        return data
+
+    def _read_reply(self):
+        line = self._readline()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n == -1 else self._readexact(n)
+        if kind == b"*":
+            n = int(rest)
+            return None if n == -1 else [self._read_reply() for _ in range(n)]
+        raise ConnectionError(f"Bad RESP reply: {line[:50]!r}")
+
+    def _roundtrip(self, args):
+        self._sock.sendall(self._encode(args))
+        reply = self._read_reply()
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def execute(self, *args):
+        """Send one command and return its reply (bytes/int/str/list/None).
+
+        A connection error is raised to the caller. Only read-only commands
+        sent outside a WATCH block are retried (once, on a new connection):
+        re-sending a write could apply it twice, and a new connection has
+        silently dropped any WATCH.
+        """
+        command = str(args[0]).upper()
+        with self.lock:
+            retry = command in _RETRYABLE and not self._watching
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    reply = self._roundtrip(args)
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt == 2 or not retry:
+                        raise
+                    continue
+                if command == "WATCH":
+                    self._watching = True
+                elif command in ("UNWATCH", "EXEC", "DISCARD"):
+                    self._watching = False
+                return reply
+
+    def pipeline(self, commands: list[tuple]) -> list:
+        """Send several commands in one write and return all replies.
+
+        Error replies are returned in place (not raised) so callers can
+        inspect MULTI/EXEC results.
+        """
+        with self.lock:
+            if self._sock is None:
+                self._connect()
+            try:
+                self._sock.sendall(b"".join(self._encode(c) for c in commands))
+                replies = [self._read_reply() for _ in commands]
+            except (OSError, ConnectionError):
+                self.close()
+                raise
+            if any(str(c[0]).upper() in ("EXEC", "DISCARD", "UNWATCH") for c in commands):
+                self._watching = False
+            return replies
@@ -0,0 +1,477 @@
+"""Session storage backends for the onboarding server.
+
+`server.app.sessions` is one of these stores. All backends are dict-like
+(`get`, `[]`, `del`, `in`, `len`) so endpoint code reads the same whatever
+is configured, and all keep a per-session version so a stale write from
+another worker is rejected instead of silently overwriting newer state.
+Async handlers use `aget` / `asave` / `alen`, which run the disk or network
+round trip of the persistent backends in a thread instead of on the loop.
+
+Backends:
+- memory: in-process dict (single worker, lost on redeploy)
+- sqlite: local file shared by every worker on the same host
+- redis:  any Redis-protocol server, shared across hosts
+
+Select with SESSION_BACKEND (see agent/config.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+from agent.snapshot import dumps_state, loads_state
+from server.resp import RespClient
+
+logger = logging.getLogger(__name__)
+
+
+class SessionConflict(Exception):
+    """Raised when a session was saved elsewhere since this copy was loaded."""
+
+
+# ────────── BASE ──────────
+
+class SessionStore(ABC):
+    """Dict-like session store with optimistic per-session versioning.
+
+    `put` bumps `state["_version"]`. When `expected_version` is given (the
+    dict-style `store[sid] = state` passes the version the state was loaded
+    with), a mismatch with the stored version raises SessionConflict.
+    """
+
+    # True when calls do disk or network I/O (run them in a thread from async code)
+    blocking = True
+
+    @abstractmethod
+    def get(self, session_id: str, default=None):
+        ...
+
+    @abstractmethod
+    def put(self, session_id: str, state: dict, expected_version: int | None = None) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def expire(self, ttl_seconds: float) -> list[str]:
+        """Delete sessions idle longer than ttl_seconds. Returns deleted IDs."""
+
+    @abstractmethod
+    def evict_oldest(self, max_sessions: int) -> list[str]:
+        """Delete least-recently-active sessions beyond max_sessions. Returns deleted IDs."""
+
+    def compact_idle(self, idle_seconds: float, limit: int | None = None) -> int:
+        """Shrink up to `limit` idle sessions held in process memory. Persistent stores hold snapshots already."""
+        return 0
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __getitem__(self, session_id: str) -> dict:
+        state = self.get(session_id)
+        if state is None:
+            raise KeyError(session_id)
+        return state
+
+    def __setitem__(self, session_id: str, state: dict):
+        self.put(session_id, state, expected_version=state.get("_version", 0))
+
+    def __delitem__(self, session_id: str):
+        if not self.delete(session_id):
+            raise KeyError(session_id)
+
+    async def arun(self, fn, *args):
+        """Call `fn(*args)` (one of this store's methods) without blocking the event loop."""
+        if not self.blocking:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def aget(self, session_id: str, default=None):
+        return await self.arun(self.get, session_id, default)
+
+    async def asave(self, session_id: str, state: dict) -> int:
+        """Async `store[sid] = state`: put with the version the state was loaded with."""
+        return await self.arun(self.put, session_id, state, state.get("_version", 0))
+
+    async def alen(self) -> int:
+        return await self.arun(len, self)
+
+    async def acompact_idle(self, idle_seconds: float, batch: int = 20) -> int:
+        """`compact_idle` in batches, yielding to the event loop between them.
+
+        Compaction works on live dicts that requests also touch, so it stays on
+        the loop rather than moving to a thread; batching bounds each stall.
+        """
+        total = 0
+        while True:
+            compacted = self.compact_idle(idle_seconds, batch)
+            total += compacted
+            if compacted < batch:
+                return total
+            await asyncio.sleep(0)
+
+
+# ────────── MEMORY ──────────
+
+class MemorySessionStore(SessionStore):
+    """In-process store. `get` returns the live dict, so in-place edits stick.
+
+    Sessions idle longer than `compact_idle()`'s threshold are swapped for a
+    compressed snapshot (agent/snapshot.py) and inflated again on next access.
+
+    A min-heap of (last_active, id) orders sessions for expiry and eviction,
+    so neither scans the whole store. Superseded heap entries are skipped
+    lazily and the heap is rebuilt once they outnumber live sessions. With
+    `max_sessions` / `ttl_seconds` set, `put` enforces both immediately and
+    reports each dropped ID to `on_drop(session_id)`.
+    """
+
+    blocking = False   # live dicts; also keeps on_drop callbacks on the event loop
+
+    def __init__(self, max_sessions: int | None = None, ttl_seconds: float | None = None,
+                 on_drop: Callable[[str], None] | None = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_drop = on_drop
+        self._data: OrderedDict[str, dict] = OrderedDict()   # live dicts, least recently used first
+        self._frozen: dict[str, bytes] = {}                  # id → snapshot
+        self._last_active: dict[str, float] = {}             # every stored id (live or frozen); set by put
+        self._accessed: dict[str, float] = {}                # live id → last get/put, for compact_idle
+        self._heap: list[tuple[float, str]] = []
+
+    def get(self, session_id, default=None):
+        if self.ttl_seconds is not None and session_id in self._last_active \
+                and time.time() - self._last_active[session_id] > self.ttl_seconds:
+            self._drop(session_id)
+            return default
+        state = self._data.get(session_id)
+        if state is None:
+            blob = self._frozen.pop(session_id, None)
+            if blob is None:
+                return default
+            state = self._data[session_id] = loads_state(blob)
+        # A read may start a turn: keep compact_idle off the dict, but (like the shared
+        # stores) only a put counts as activity for expiry and eviction
+        self._accessed[session_id] = time.time()
+        self._data.move_to_end(session_id)
+        return state
+
+    def put(self, session_id, state, expected_version=None):
+        current = self.get(session_id)
+        stored_version = current.get("_version", 0) if current is not None else 0
+        if expected_version is not None and current is not state and stored_version != expected_version:
+            raise SessionConflict(session_id)
+        state["_version"] = stored_version + 1
+        self._data[session_id] = state
+        self._data.move_to_end(session_id)
+        last_active = state.get("_last_active", state.get("_created_at", time.time()))
+        self._accessed[session_id] = last_active
+        self._touch(session_id, last_active)
+        if current is None:
+            self._enforce_limits()
+        return state["_version"]
+
+    def _touch(self, session_id, last_active: float):
+        if self._last_active.get(session_id) == last_active:
+            return
+        self._last_active[session_id] = last_active
+        heapq.heappush(self._heap, (last_active, session_id))
+        if len(self._heap) > 2 * len(self._last_active) + 64:
+            self._heap = [(t, sid) for sid, t in self._last_active.items()]
+            heapq.heapify(self._heap)
+
+    def _enforce_limits(self):
+        dropped = []
+        if self.ttl_seconds is not None:
+            dropped += self.expire(self.ttl_seconds)
+        if self.max_sessions is not None:
+            dropped += self.evict_oldest(self.max_sessions)
+        if self.on_drop:
+            for sid in dropped:
+                self.on_drop(sid)
+
+    def _drop(self, session_id):
+        self.delete(session_id)
+        if self.on_drop:
+            self.on_drop(session_id)
+
+    def delete(self, session_id):
+        live = self._data.pop(session_id, None)
+        frozen = self._frozen.pop(session_id, None)
+        self._last_active.pop(session_id, None)   # its heap entries are now stale
+        self._accessed.pop(session_id, None)
+        return live is not None or frozen is not None
+
+    def _pop_oldest(self) -> tuple[float, str] | None:
+        """Remove and return the least-recently-active session's (last_active, id)."""
+        while self._heap:
+            last_active, sid = heapq.heappop(self._heap)
+            if self._last_active.get(sid) == last_active:
+                self.delete(sid)
+                return last_active, sid
+        return None
+
+    def _peek_oldest(self) -> float | None:
+        while self._heap:
+            last_active, sid = self._heap[0]
+            if self._last_active.get(sid) == last_active:
+                return last_active
+            heapq.heappop(self._heap)
+        return None
+
+    def compact_idle(self, idle_seconds: float, limit: int | None = None) -> int:
+        """Snapshot up to `limit` sessions idle longer than idle_seconds. Returns how many were compacted.
+
+        Walks live sessions least-recently-used first (reads and writes both move
+        a session to the end) and stops at the first one read or written since
+        the cutoff, so the cost tracks the number compacted, not the store size.
+        """
+        cutoff = time.time() - idle_seconds
+        compacted = 0
+        while self._data and (limit is None or compacted < limit):
+            sid = next(iter(self._data))
+            if self._accessed.get(sid, cutoff) >= cutoff:
+                break
+            self._accessed.pop(sid, None)
+            self._frozen[sid] = dumps_state(self._data.pop(sid))
+            compacted += 1
+        return compacted
+
+    def expire(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        expired = []
+        while (oldest := self._peek_oldest()) is not None and oldest < cutoff:
+            expired.append(self._pop_oldest()[1])
+        return expired
+
+    def evict_oldest(self, max_sessions):
+        evicted = []
+        while len(self) > max_sessions:
+            evicted.append(self._pop_oldest()[1])
+        return evicted
+
+    def __len__(self):
+        return len(self._last_active)
+
+    def __contains__(self, session_id):
+        return session_id in self._last_active
+
+
+# ────────── SQLITE ──────────
+
+class SQLiteSessionStore(SessionStore):
+    """Single-file store for several workers on one host (WAL mode)."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False,
+                                     isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY,"
+                " version INTEGER NOT NULL,"
+                " last_active REAL NOT NULL,"
+                " data BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active)")
+
+    def get(self, session_id, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, data FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if not row:
+            return default
+        state = loads_state(row[1])
+        state["_version"] = row[0]
+        return state
+
+    def put(self, session_id, state, expected_version=None):
+        last_active = state.get("_last_active", time.time())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT version FROM sessions WHERE id = ?", (session_id,)
+                ).fetchone()
+                stored_version = row[0] if row else 0
+                if expected_version is not None and stored_version != expected_version:
+                    raise SessionConflict(session_id)
+                new_version = stored_version + 1
+                state["_version"] = new_version
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, version, last_active, data) VALUES (?, ?, ?, ?)",
+                    (session_id, new_version, last_active, dumps_state(state)),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return new_version
+
+    def delete(self, session_id):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return cur.rowcount > 0
+
+    def _select_and_delete(self, select_sql: str, params: tuple) -> list[str]:
+        """Delete the rows `select_sql` picks and return their ids, in one write transaction
+        so another worker can't refresh a row between the two statements."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [r[0] for r in self._conn.execute(select_sql, params)]
+                self._conn.executemany("DELETE FROM sessions WHERE id = ?", [(sid,) for sid in ids])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def expire(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        return self._select_and_delete("SELECT id FROM sessions WHERE last_active < ?", (cutoff,))
+
+    def evict_oldest(self, max_sessions):
+        return self._select_and_delete(
+            "SELECT id FROM sessions ORDER BY last_active"
+            " LIMIT max(0, (SELECT COUNT(*) FROM sessions) - ?)", (max_sessions,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+# ────────── REDIS ──────────
+
+class RedisSessionStore(SessionStore):
+    """Store on a Redis-protocol server, shared across hosts.
+
+    Layout (all under `prefix`):
+      s:{id}  → serialised state, expires after ttl_seconds
+      v:{id}  → version counter, same expiry
+      active  → sorted set of id scored by last_active (for len/eviction)
+
+    Writes use WATCH/MULTI/EXEC on the version key, so two workers saving
+    the same session concurrently cannot both win.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "onboarding:"):
+        self.client = RespClient(url)
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+
+    def _k(self, kind: str, session_id: str = "") -> str:
+        return f"{self.prefix}{kind}:{session_id}" if session_id else f"{self.prefix}{kind}"
+
+    def get(self, session_id, default=None):
+        blob, version = self.client.pipeline([
+            ("GET", self._k("s", session_id)),
+            ("GET", self._k("v", session_id)),
+        ])
+        if blob is None:
+            return default
+        state = loads_state(blob)
+        state["_version"] = int(version or 0)
+        return state
+
+    def put(self, session_id, state, expected_version=None):
+        vkey, skey = self._k("v", session_id), self._k("s", session_id)
+        last_active = state.get("_last_active", time.time())
+        with self.client.lock:
+            self.client.execute("WATCH", vkey)
+            stored_version = int(self.client.execute("GET", vkey) or 0)
+            if expected_version is not None and stored_version != expected_version:
+                self.client.execute("UNWATCH")
+                raise SessionConflict(session_id)
+            new_version = stored_version + 1
+            state["_version"] = new_version
+            blob = dumps_state(state)
+            replies = self.client.pipeline([
+                ("MULTI",),
+                ("SET", skey, blob, "EX", self.ttl_seconds),
+                ("SET", vkey, new_version, "EX", self.ttl_seconds),
+                ("ZADD", self._k("active"), last_active, session_id),
+                ("EXEC",),
+            ])
+        if replies[-1] is None:
+            raise SessionConflict(session_id)
+        return new_version
+
+    def delete(self, session_id):
+        removed, _, _ = self.client.pipeline([
+            ("DEL", self._k("s", session_id)),
+            ("DEL", self._k("v", session_id)),
+            ("ZREM", self._k("active"), session_id),
+        ])
+        return bool(removed)
+
+    def expire(self, ttl_seconds):
+        # Keys expire on their own; this just trims the activity index.
+        # One MULTI/EXEC, so a session re-saved in between isn't reported as expired
+        cutoff = time.time() - ttl_seconds
+        replies = self.client.pipeline([
+            ("MULTI",),
+            ("ZRANGEBYSCORE", self._k("active"), "-inf", cutoff),
+            ("ZREMRANGEBYSCORE", self._k("active"), "-inf", cutoff),
+            ("EXEC",),
+        ])
+        expired = (replies[-1] or [[]])[0] or []
+        return [sid.decode() for sid in expired]
+
+    def evict_oldest(self, max_sessions):
+        count = self.client.execute("ZCARD", self._k("active"))
+        if count <= max_sessions:
+            return []
+        oldest = self.client.execute("ZRANGE", self._k("active"), 0, count - max_sessions - 1) or []
+        evicted = [sid.decode() for sid in oldest]
+        for sid in evicted:
+            self.delete(sid)
+        return evicted
+
+    def __len__(self):
+        return self.client.execute("ZCARD", self._k("active"))
+
+    def __contains__(self, session_id):
+        return bool(self.client.execute("EXISTS", self._k("s", session_id)))
+
+
+# ────────── FACTORY ──────────
+
+def make_session_store(backend: str, *, sqlite_path: str | Path = "", redis_url: str = "",
+                       ttl_seconds: int = 1800, max_sessions: int | None = None,
+                       on_drop: Callable[[str], None] | None = None) -> SessionStore:
+    """Build the configured session store ("memory", "sqlite" or "redis").
+
+    max_sessions / on_drop apply to the memory store, which enforces the cap
+    and TTL on insert; shared stores rely on the periodic cleanup.
+    """
+    backend = (backend or "memory").lower()
+    if backend == "sqlite":
+        logger.info(f"[SESSIONS] SQLite store at {sqlite_path}")
+        return SQLiteSessionStore(sqlite_path)
+    if backend == "redis":
+        logger.info(f"[SESSIONS] Redis store at {redis_url}")
+        return RedisSessionStore(redis_url, ttl_seconds)
+    if backend != "memory":
+        logger.warning(f"[SESSIONS] Unknown SESSION_BACKEND '{backend}' — using memory")
+    return MemorySessionStore(max_sessions=max_sessions, ttl_seconds=ttl_seconds, on_drop=on_drop)
@@ -0,0 +1,266 @@
+"""Background writer for per-session turn logs (`logs/{session_id}.jsonl`).
+
+Request handlers only enqueue; a daemon thread serialises and appends turns
+in batches, opening each session's file once per batch. Files are rotated
+into numbered segments, `{id}.jsonl.{n}` (`.gz` when compression is on), when
+they grow past `max_bytes` or the session stops writing for
+`rotate_idle_seconds`. `read` stitches segments back together in order.
+
+With a LogIndex attached, each batch also updates the per-session summary
+rows that /api/logs pages through.
+
+Several workers share one log directory. Appends (and their index updates)
+and reads hold a shared `flock` on `{log_dir}/.lock`; rotation and
+`rebuild_index` hold it exclusively, so no worker appends to a file while
+another is moving it, segment numbers are never handed out twice, and only
+one worker rebuilds the index. Idle rotation goes by the live file's mtime,
+not just this worker's last write, so a session another worker is still
+writing is left alone.
+"""
+from __future__ import annotations
+
+import fcntl
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from server.log_index import LogIndex
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_RE = re.compile(r"^(?P<sid>.+)\.jsonl(?:\.(?P<n>\d+)(?P<gz>\.gz)?)?$")
+_STOP = object()
+
+
+class TurnLogWriter:
+    def __init__(self, log_dir: str | Path, *, max_bytes: int = 5 * 1024 * 1024,
+                 rotate_idle_seconds: float = 3600, compress: bool = True,
+                 flush_interval: float = 0.5, max_batch: int = 500, max_queue: int = 10_000,
+                 index: LogIndex | None = None):
+        self.log_dir = Path(log_dir)
+        self.index = index
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.rotate_idle_seconds = rotate_idle_seconds
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._last_write: dict[str, float] = {}   # sessions with a live .jsonl this process wrote
+        self._file_lock = threading.Lock()        # rotation vs. read (within this process; after _dir_lock)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    # ── producer side (event loop) ──
+
+    def write(self, session_id: str, turn: dict):
+        """Queue a turn for writing. Never blocks; drops the turn if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((session_id, turn))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"[TURNLOG] Queue full — dropped {self.dropped} turns so far")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far is on disk. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((None, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="turn-log-writer", daemon=True)
+                    self._thread.start()
+
+    @contextmanager
+    def _dir_lock(self, exclusive: bool = False):
+        """Cross-worker lock on the log directory: shared to append/read, exclusive to rotate/rebuild."""
+        with open(self.log_dir / ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield   # released when the file closes
+
+    # ── writer thread ──
+
+    def _run(self):
+        last_idle_check = time.time()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(sid is _STOP for sid, _ in batch)
+            waiters = [item for sid, item in batch if sid is None]
+            turns = [(sid, turn) for sid, turn in batch if sid is not None and sid is not _STOP]
+            try:
+                self._write_batch(turns)
+            except Exception:
+                logger.exception("[TURNLOG] Failed to write batch")
+            for done in waiters:
+                done.set()
+            if stop:
+                return
+
+            now = time.time()
+            if now - last_idle_check >= min(60.0, self.rotate_idle_seconds):
+                last_idle_check = now
+                self._rotate_idle(now)
+
+    def _write_batch(self, turns: list):
+        by_session: dict[str, list[str]] = {}
+        indexed = []
+        for sid, turn in turns:
+            line = json.dumps(turn, default=str) + "\n"
+            by_session.setdefault(sid, []).append(line)
+            indexed.append((sid, turn, len(line)))
+        now = time.time()
+        oversized = []
+        with self._dir_lock():
+            for sid, lines in by_session.items():
+                path = self.log_dir / f"{sid}.jsonl"
+                with self._file_lock:
+                    with open(path, "a") as f:
+                        f.writelines(lines)
+                        size = f.tell()
+                if size >= self.max_bytes:
+                    oversized.append(sid)
+                self._last_write[sid] = now
+            if self.index is not None and indexed:
+                try:
+                    self.index.record(indexed, now)
+                except Exception:
+                    logger.exception("[TURNLOG] Failed to update log index")
+        if oversized:
+            with self._dir_lock(exclusive=True), self._file_lock:
+                for sid in oversized:
+                    live = self.log_dir / f"{sid}.jsonl"
+                    if live.exists() and live.stat().st_size >= self.max_bytes:   # not already rotated elsewhere
+                        self._rotate(sid)
+                    self._last_write.pop(sid, None)
+
+    def _rotate_idle(self, now: float):
+        idle = [sid for sid, t in self._last_write.items() if now - t >= self.rotate_idle_seconds]
+        if not idle:
+            return
+        with self._dir_lock(exclusive=True), self._file_lock:
+            for sid in idle:
+                live = self.log_dir / f"{sid}.jsonl"
+                try:
+                    idle_for = now - live.stat().st_mtime
+                except FileNotFoundError:
+                    idle_for = None   # already rotated by another worker
+                if idle_for is not None and idle_for >= self.rotate_idle_seconds:
+                    self._rotate(sid)
+                del self._last_write[sid]   # a worker still writing it tracks it itself
+
+    def _rotate(self, session_id: str):
+        """Move the live file to the next numbered segment (caller holds both locks, _dir_lock exclusive)."""
+        live = self.log_dir / f"{session_id}.jsonl"
+        if not live.exists():
+            return
+        n = max((num for num, _ in self._segments(session_id)), default=0) + 1
+        segment = self.log_dir / f"{session_id}.jsonl.{n}"
+        if self.compress:
+            with open(live, "rb") as src, gzip.open(f"{segment}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.unlink(live)
+        else:
+            os.replace(live, segment)
+
+    # ── readers ──
+
+    def _segments(self, session_id: str) -> list[tuple[int, Path]]:
+        segments = []
+        for path in self.log_dir.glob(f"{session_id}.jsonl.*"):
+            m = _SEGMENT_RE.match(path.name)
+            if m and m["n"] and m["sid"] == session_id:
+                segments.append((int(m["n"]), path))
+        return sorted(segments)
+
+    def read(self, session_id: str) -> list[dict] | None:
+        """All logged turns for a session, oldest first, or None if it has no log."""
+        self.flush()
+        with self._dir_lock(), self._file_lock:
+            return self._read(session_id)
+
+    def _read(self, session_id: str) -> list[dict] | None:
+        paths = [p for _, p in self._segments(session_id)]
+        live = self.log_dir / f"{session_id}.jsonl"
+        if live.exists():
+            paths.append(live)
+        if not paths:
+            return None
+        turns = []
+        for path in paths:
+            opener = gzip.open if path.suffix == ".gz" else open
+            with opener(path, "rt") as f:
+                turns.extend(json.loads(line) for line in f if line.strip())
+        return turns
+
+    def list_sessions(self) -> list[dict]:
+        """One entry per logged session: total size on disk and last modified time."""
+        sessions: dict[str, dict] = {}
+        for path in self.log_dir.iterdir():
+            m = _SEGMENT_RE.match(path.name)
+            if not m:
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entry = sessions.setdefault(m["sid"], {"session_id": m["sid"], "size": 0, "mtime": 0.0})
+            entry["size"] += st.st_size
+            entry["mtime"] = max(entry["mtime"], st.st_mtime)
+        return list(sessions.values())
+
+    def rebuild_index(self, *, if_empty: bool = False):
+        """Recompute the attached index from the files on disk (e.g. first run with an index).
+
+        With `if_empty`, does nothing once the index has rows, so when every
+        worker asks at startup only the first to get the lock rebuilds.
+        Appends wait on the lock meanwhile, so none is counted twice or lost.
+        """
+        if self.index is None:
+            return
+        with self._dir_lock(exclusive=True), self._file_lock:
+            if if_empty and not self.index.is_empty():
+                return
+            self.index.clear()
+            listed = self.list_sessions()
+            for entry in listed:
+                turns = self._read(entry["session_id"]) or []
+                if turns:
+                    per_turn = entry["size"] // len(turns)
+                    self.index.record([(entry["session_id"], t, per_turn) for t in turns], entry["mtime"])
+        logger.info(f"[TURNLOG] Rebuilt log index for {len(listed)} sessions")
@@ -0,0 +1,19 @@
+"""Shared fixtures for tests that drive server/app.py through a TestClient."""
+import pytest
+from fastapi.testclient import TestClient
+
+import server.app as app_module
+from server.session_store import MemorySessionStore
+from server.turn_log import TurnLogWriter
+
+
+@pytest.fixture
+def app_client(monkeypatch, tmp_path):
+    """TestClient on the real app with in-memory sessions, a saved session "abc",
+    and turn logs written under tmp_path instead of the repo's logs/."""
+    monkeypatch.setattr(app_module, "sessions", MemorySessionStore())
+    writer = TurnLogWriter(tmp_path / "logs")
+    monkeypatch.setattr(app_module, "turn_log", writer)
+    app_module.sessions["abc"] = app_module._init_base_state("abc")
+    yield TestClient(app_module.app)
+    writer.close()
@@ -0,0 +1,191 @@
+"""Local Redis-protocol stand-in for tests.
+
+Serves the subset of RESP2 commands used by server/resp.py callers from an
+in-process dict, so the Redis-backed stores can be exercised without a real
+Redis server. Not for production use.
+"""
+from __future__ import annotations
+
+import socketserver
+import threading
+import time
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data: dict[bytes, object] = {}
+        self.expires: dict[bytes, float] = {}
+        self.mod: dict[bytes, int] = {}   # per-key modification counter (for WATCH)
+
+    def _alive(self, key: bytes) -> bool:
+        exp = self.expires.get(key)
+        if exp is not None and exp <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+            self._touch(key)
+        return key in self.data
+
+    def _touch(self, key: bytes):
+        self.mod[key] = self.mod.get(key, 0) + 1
+
+    def execute(self, conn: "_Conn", args: list[bytes]):
+        cmd = args[0].upper().decode()
+        a = args[1:]
+        with self.lock:
+            if cmd == "MULTI":
+                conn.queue = []
+                return "OK"
+            if conn.queue is not None and cmd not in ("EXEC", "DISCARD"):
+                conn.queue.append(args)
+                return "QUEUED"
+            if cmd == "EXEC":
+                queued, conn.queue = conn.queue or [], None
+                dirty = any(self.mod.get(k, 0) != v for k, v in conn.watched.items())
+                conn.watched = {}
+                if dirty:
+                    return None
+                return [self.execute(conn, q) for q in queued]
+            if cmd == "WATCH":
+                for k in a:
+                    self._alive(k)
+                    conn.watched[k] = self.mod.get(k, 0)
+                return "OK"
+            if cmd == "UNWATCH":
+                conn.watched = {}
+                return "OK"
+            if cmd in ("PING", "AUTH", "SELECT"):
+                return "PONG" if cmd == "PING" else "OK"
+            if cmd == "GET":
+                return self.data.get(a[0]) if self._alive(a[0]) else None
+            if cmd == "SET":
+                self.data[a[0]] = a[1]
+                self.expires.pop(a[0], None)
+                if len(a) >= 4 and a[2].upper() == b"EX":
+                    self.expires[a[0]] = time.time() + int(a[3])
+                elif len(a) >= 4 and a[2].upper() == b"PX":
+                    self.expires[a[0]] = time.time() + int(a[3]) / 1000
+                self._touch(a[0])
+                return "OK"
+            if cmd == "DEL":
+                n = 0
+                for k in a:
+                    if self._alive(k):
+                        del self.data[k]
+                        self.expires.pop(k, None)
+                        self._touch(k)
+                        n += 1
+                return n
+            if cmd == "EXISTS":
+                return sum(1 for k in a if self._alive(k))
+            if cmd in ("INCR", "INCRBY", "DECR"):
+                cur = int(self.data.get(a[0], b"0")) if self._alive(a[0]) else 0
+                cur += int(a[1]) if cmd == "INCRBY" else -1 if cmd == "DECR" else 1
+                self.data[a[0]] = str(cur).encode()
+                self._touch(a[0])
+                return cur
+            if cmd in ("EXPIRE", "PEXPIRE"):
+                if not self._alive(a[0]):
+                    return 0
+                secs = int(a[1]) if cmd == "EXPIRE" else int(a[1]) / 1000
+                self.expires[a[0]] = time.time() + secs
+                return 1
+            if cmd == "ZADD":
+                self._alive(a[0])
+                z = self.data.setdefault(a[0], {})
+                added = 0
+                for i in range(1, len(a), 2):
+                    member = a[i + 1]
+                    added += member not in z
+                    z[member] = float(a[i])
+                self._touch(a[0])
+                return added
+            if cmd == "ZREM":
+                z = self.data.get(a[0]) or {}
+                n = sum(1 for m in a[1:] if z.pop(m, None) is not None)
+                self._touch(a[0])
+                return n
+            if cmd == "ZCARD":
+                return len(self.data.get(a[0]) or {})
+            if cmd == "ZRANGE":
+                items = sorted((self.data.get(a[0]) or {}).items(), key=lambda kv: (kv[1], kv[0]))
+                start, stop = int(a[1]), int(a[2])
+                stop = len(items) + stop if stop < 0 else stop
+                return [m for m, _ in items[start:stop + 1]]
+            if cmd in ("ZRANGEBYSCORE", "ZREMRANGEBYSCORE"):
+                z = self.data.get(a[0]) or {}
+                lo = float("-inf") if a[1] == b"-inf" else float(a[1])
+                hi = float("inf") if a[2] == b"+inf" else float(a[2])
+                hits = sorted((m for m, s in z.items() if lo <= s <= hi), key=lambda m: z[m])
+                if cmd == "ZRANGEBYSCORE":
+                    return hits
+                for m in hits:
+                    del z[m]
+                self._touch(a[0])
+                return len(hits)
+            return Exception(f"ERR unknown command '{cmd}'")
+
+
+class _Conn(socketserver.StreamRequestHandler):
+    queue = None
+    watched: dict
+
+    def _read_command(self) -> list[bytes] | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        n = int(line[1:].strip())
+        args = []
+        for _ in range(n):
+            size = int(self.rfile.readline()[1:].strip())
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _write(self, reply):
+        self.wfile.write(_encode(reply))
+
+    def handle(self):
+        self.queue = None
+        self.watched = {}
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            self._write(self.server.store.execute(self, args))
+
+
+def _encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-" + str(reply).encode() + b"\r\n"
+    if isinstance(reply, str):
+        return b"+" + reply.encode() + b"\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode(r) for r in reply)
+    raise TypeError(type(reply))
+
+
+class RespStandin(socketserver.ThreadingTCPServer):
+    """Start with `with RespStandin() as srv:` and connect to `srv.url`."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Conn)
+        self.store = _Store()
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
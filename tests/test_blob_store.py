@@ -0,0 +1,107 @@
+"""Tests for server/blob_store.py and the /media endpoint."""
+import asyncio
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server.app as app_module
+from server.blob_store import BlobStore, BlobTooLarge, media_sha, media_url
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200
+
+
+class TestBlobStore:
+
+    def test_put_returns_sha256_and_dedupes(self, tmp_path):
+        store = BlobStore(tmp_path)
+        sha1 = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        sha2 = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        assert sha1 == sha2 == hashlib.sha256(PNG).hexdigest()
+        assert len(list(tmp_path.glob("??/*.png"))) == 1
+        path, content_type = store.locate(sha1)
+        assert path.read_bytes() == PNG
+        assert content_type == "image/png"
+
+    def test_too_large_leaves_nothing_behind(self, tmp_path):
+        store = BlobStore(tmp_path)
+        with pytest.raises(BlobTooLarge):
+            store.put_stream(io.BytesIO(b"x" * 5000), "image/jpeg", 1000)
+        assert list(tmp_path.rglob("*")) == []
+
+    def test_locate_rejects_non_hash(self, tmp_path):
+        store = BlobStore(tmp_path)
+        assert store.locate("../../etc/passwd") is None
+        assert store.locate("0" * 64) is None
+
+    def test_prune_old(self, tmp_path):
+        store = BlobStore(tmp_path)
+        sha = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        path, _ = store.locate(sha)
+        old = time.time() - 10 * 86400
+        os.utime(path, (old, old))
+        assert store.prune(7 * 86400) == 1
+        assert store.locate(sha) is None
+
+    def test_keep_spares_referenced_blobs(self, tmp_path):
+        store = BlobStore(tmp_path)
+        sha = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        path, _ = store.locate(sha)
+        old = time.time() - 10 * 86400
+        os.utime(path, (old, old))
+        assert store.keep([sha, "0" * 64]) == 1
+        assert store.prune(7 * 86400) == 0
+
+    def test_media_sha_and_data_url(self, tmp_path):
+        store = BlobStore(tmp_path)
+        sha = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        assert media_sha(media_url(sha)) == sha
+        assert media_sha("https://example.com/logo.png") is None
+        assert store.data_url(sha).startswith("data:image/png;base64,iVBORw0K")
+
+
+class TestMediaEndpoint:
+
+    def test_serves_with_cache_headers_and_304(self, tmp_path, monkeypatch):
+        store = BlobStore(tmp_path)
+        sha = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        monkeypatch.setattr(app_module, "blobs", store)
+        client = TestClient(app_module.app)
+
+        resp = client.get(media_url(sha))
+        assert resp.status_code == 200
+        assert resp.content == PNG
+        assert resp.headers["content-type"] == "image/png"
+        assert resp.headers["etag"] == f'"{sha}"'
+        assert "immutable" in resp.headers["cache-control"]
+
+        resp = client.get(media_url(sha), headers={"If-None-Match": f'"{sha}"'})
+        assert resp.status_code == 304
+
+        assert client.get(media_url("f" * 64)).status_code == 404
+
+
+class TestSessionMedia:
+
+    def test_save_keeps_uploads_and_result_inlines_them(self, app_client, tmp_path, monkeypatch):
+        store = BlobStore(tmp_path / "blobs")
+        monkeypatch.setattr(app_module, "blobs", store)
+        sha = store.put_stream(io.BytesIO(PNG), "image/png", 1024)
+        path, _ = store.locate(sha)
+        old = time.time() - 10 * 86400
+        os.utime(path, (old, old))
+
+        state = app_module.sessions.get("abc")
+        state.update(profile_logo=media_url(sha), confirmed=True,
+                     output_json={"profile": {"logo": media_url(sha), "photos": [media_url(sha)]}})
+        asyncio.run(app_module._save_session("abc", state))
+        assert store.prune(7 * 86400) == 0
+
+        result = app_client.get("/api/session/abc/result").json()["result"]
+        assert result["profile"]["logo"].startswith("data:image/png;base64,")
+        assert result["profile"]["photos"] == [result["profile"]["logo"]]
+        assert state["output_json"]["profile"]["logo"] == media_url(sha)   # state keeps the small URL
+
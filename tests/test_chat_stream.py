@@ -0,0 +1,112 @@
+"""Tests for the SSE /api/chat/stream endpoint and agent/progress.py."""
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+import server.app as app_module
+from agent.graph import _trace
+from agent.progress import ainvoke_json, ainvoke_text, muted, progress_sink
+
+
+def _parse_sse(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(app_client, monkeypatch):
+    async def fake_verify(state):
+        _trace(state, "ABR Lookup", 0.4, "1 result")
+        return {"current_node": "business_verification",
+                "messages": [AIMessage(content="Found you!")]}
+
+    monkeypatch.setitem(app_module.NODE_FUNCTIONS, "business_verification",
+                        app_module._with_progress("business_verification", fake_verify))
+    return app_client
+
+
+class TestChatStream:
+
+    def test_event_sequence(self, client):
+        resp = client.post("/api/chat/stream", json={"session_id": "abc", "message": "hi"})
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(resp.text)
+        names = [e for e, _ in events]
+        assert names == ["start", "node_start", "source", "node_end", "done"]
+        assert events[2][1]["api"] == "ABR Lookup"
+        done = events[-1][1]
+        assert done["response"]["text"] == "Found you!"
+        assert done["state"]["current_node"] == "business_verification"
+
+    def test_missing_session_is_plain_404(self, client):
+        resp = client.post("/api/chat/stream", json={"session_id": "nope", "message": "hi"})
+        assert resp.status_code == 404
+
+
+class TestProgress:
+
+    def test_ainvoke_text_streams_tokens_to_sink(self):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="G'day mate, welcome")]))
+        events = []
+
+        async def run():
+            with progress_sink(lambda event, data: events.append((event, data))):
+                return await ainvoke_text(llm, [HumanMessage(content="hi")])
+
+        result = asyncio.run(run())
+        assert result.content == "G'day mate, welcome"
+        tokens = [d["text"] for e, d in events if e == "token"]
+        assert len(tokens) > 1 and "".join(tokens) == result.content
+
+    @pytest.mark.parametrize("invoke", [ainvoke_text, ainvoke_json])
+    def test_streamed_reply_keeps_token_usage(self, invoke):
+        class _Usage(GenericFakeChatModel):
+            async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+                yield ChatGenerationChunk(message=AIMessageChunk(content='{"response": "hi'))
+                yield ChatGenerationChunk(message=AIMessageChunk(content='"}', usage_metadata={
+                    "input_tokens": 120, "output_tokens": 8, "total_tokens": 128}))
+
+        async def run():
+            with progress_sink(lambda event, data: None):
+                return await invoke(_Usage(messages=iter([])), [HumanMessage(content="hi")])
+
+        result = asyncio.run(run())
+        assert result.content == '{"response": "hi"}'
+        assert result.usage_metadata["input_tokens"] == 120
+
+    def test_no_sink_no_events(self):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="hello")]))
+        result = asyncio.run(ainvoke_text(llm, [HumanMessage(content="hi")]))
+        assert result.content == "hello"
+
+    def test_ainvoke_json_streams_only_the_response_field(self):
+        reply = '{"response": "Nice one, I have added those.", "services": [{"response": "x"}], "buttons": []}'
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content=reply)]))
+        events = []
+
+        async def run():
+            with progress_sink(lambda event, data: events.append((event, data))):
+                return await ainvoke_json(llm, [HumanMessage(content="hi")])
+
+        result = asyncio.run(run())
+        assert result.content == reply
+        tokens = [d["text"] for e, d in events if e == "token"]
+        assert len(tokens) > 1 and "".join(tokens) == "Nice one, I have added those."
+
+    def test_muted_tokens(self):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content='{"response": "hello there"}')]))
+        events = []
+
+        async def run():
+            with progress_sink(lambda event, data: events.append(event)), muted("token"):
+                return await ainvoke_json(llm, [HumanMessage(content="hi")])
+
+        assert asyncio.run(run()).content == '{"response": "hello there"}'
+        assert events == []
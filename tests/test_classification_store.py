@@ -0,0 +1,70 @@
+"""Tests for agent/classification_store.py and its use in classify_business_from_web."""
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import agent.graph as graph
+from agent import classification_store
+from agent.classification_store import ClassificationStore, normalise_abn, signals_hash
+
+RESULT = {"is_trade": True, "categories": ["Plumber"], "reason": "Plumbing website"}
+
+
+class TestStore:
+
+    def test_keyed_by_abn_and_signals(self, tmp_path):
+        store = ClassificationStore(tmp_path / "c.sqlite", ttl_seconds=60)
+        store.put("51824753556", "sig-a", RESULT)
+        assert store.get("51824753556", "sig-a") == RESULT
+        assert store.get("51824753556", "sig-b") is None
+        store.put("51824753556", "sig-b", {**RESULT, "categories": ["Electrician"]})
+        assert store.get("51824753556", "sig-a") is None   # replaced, not kept alongside
+        assert len(store) == 1
+        assert (store.hits, store.misses) == (1, 2)
+
+    def test_expired_rows_ignored(self, tmp_path, monkeypatch):
+        store = ClassificationStore(tmp_path / "c.sqlite", ttl_seconds=60)
+        store.put("1", "sig", RESULT)
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 61)
+        assert store.get("1", "sig") is None
+
+    def test_helpers(self):
+        assert normalise_abn("51 824 753 556") == "51824753556"
+        assert signals_hash("1", "a") != signals_hash("1", "b")
+
+
+class TestClassifyUsesStore:
+
+    @pytest.fixture
+    def llm(self, monkeypatch, tmp_path):
+        store = ClassificationStore(tmp_path / "c.sqlite", ttl_seconds=60)
+        monkeypatch.setattr(classification_store, "get_store", lambda: store)
+        fake = GenericFakeChatModel(messages=iter([
+            AIMessage(content='{"is_trade": true, "categories": ["Plumber"], "reason": "r1"}'),
+            AIMessage(content='{"is_trade": true, "categories": ["Electrician"], "reason": "r2"}'),
+        ]))
+        monkeypatch.setattr(graph, "llm_fast", fake)
+        return fake
+
+    def _classify(self, abn="51 824 753 556", google_type="plumber"):
+        return asyncio.run(graph.classify_business_from_web(
+            "Smith Plumbing", google_name="Smith Plumbing", google_type=google_type, abn=abn))
+
+    def test_same_abn_and_signals_skip_llm(self, llm):
+        first = self._classify()
+        again = self._classify(abn="51824753556")
+        assert first["reason"] == again["reason"] == "r1"
+        assert "stored" not in first and again["stored"] is True
+
+    def test_changed_signals_reclassify(self, llm):
+        self._classify()
+        changed = self._classify(google_type="electrician")
+        assert (changed["reason"], changed.get("stored")) == ("r2", None)
+
+    def test_without_abn_always_calls_llm(self, llm):
+        assert self._classify(abn="")["reason"] == "r1"
+        assert self._classify(abn="")["reason"] == "r2"
@@ -0,0 +1,115 @@
+"""Tests for server/compression.py and slim chat responses."""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+import server.app as app_module
+from server.compression import CompressionMiddleware, choose_encoding
+
+BIG = {"items": ["x" * 40] * 100}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return JSONResponse(BIG, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/events")
+    async def events():
+        return StreamingResponse(iter([b"data: " + b"x" * 600 + b"\n\n"]), media_type="text/event-stream")
+
+    @app.get("/streamed")
+    async def streamed():
+        return StreamingResponse(iter([b"a" * 400, b"b" * 400]), media_type="text/plain")
+
+    @app.get("/binary")
+    async def binary():
+        return PlainTextResponse("x" * 1000, media_type="application/octet-stream")
+
+    return TestClient(app)
+
+
+class TestChooseEncoding:
+
+    def test_gzip_and_q_values(self):
+        assert choose_encoding("gzip, deflate") == "gzip"
+        assert choose_encoding("gzip;q=0, deflate") is None
+        assert choose_encoding("") is None
+        assert choose_encoding("identity") is None
+
+
+class TestCompressionMiddleware:
+
+    def test_large_json_gzipped(self, client):
+        resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.headers["vary"] == "Accept-Encoding"
+        assert resp.headers["etag"] == 'W/"v1"'
+        assert int(resp.headers["content-length"]) < 500
+        assert resp.json() == BIG   # the client decodes it
+
+    def test_streamed_body_compressed_in_chunks(self, client):
+        resp = client.get("/streamed", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.text == "a" * 400 + "b" * 400
+
+    @pytest.mark.parametrize("path", ["/small", "/events", "/binary"])
+    def test_left_alone(self, client, path):
+        resp = client.get(path, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in resp.headers
+
+    def test_not_accepted(self, client):
+        resp = client.get("/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in resp.headers
+        assert resp.headers["etag"] == '"v1"'
+
+
+class TestWeakETag:
+
+    def test_session_304_with_weak_etag(self, app_client):
+        state = app_module.sessions.get("abc")
+        state["services"] = [{"name": "x" * 50}] * 40   # large enough to compress
+        app_module.sessions["abc"] = state
+        first = app_client.get("/api/session/abc", headers={"Accept-Encoding": "gzip"})
+        assert first.headers["etag"].startswith("W/")
+        again = app_client.get("/api/session/abc", headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 304
+
+
+class TestSlimAssessment:
+
+    def test_unchanged_findings_replaced_by_marker(self):
+        state = {}
+        resp = {"message": "hi", "_assessment_findings": [{"id": 1}], "_profile_score": 60}
+        app_module._drop_unchanged_assessment(resp, state)
+        assert resp["_assessment_findings"] == [{"id": 1}]
+        assert "_assessment_unchanged" not in resp
+
+        repeat = {"message": "again", "_assessment_findings": [{"id": 1}], "_profile_score": 60}
+        app_module._drop_unchanged_assessment(repeat, state)
+        assert repeat == {"message": "again", "_assessment_unchanged": True}
+
+        changed = {"message": "new", "_assessment_findings": [{"id": 2}], "_profile_score": 60}
+        app_module._drop_unchanged_assessment(changed, state)
+        assert changed["_assessment_findings"] == [{"id": 2}]
+
+    def test_slim_chat_omits_api_trace(self, app_client, monkeypatch):
+        async def fake_verify(state):
+            return {"current_node": "business_verification", "messages": [AIMessage(content="Found you!")]}
+
+        monkeypatch.setitem(app_module.NODE_FUNCTIONS, "business_verification", fake_verify)
+        full = app_client.post("/api/chat", json={"session_id": "abc", "message": "hi"}).json()
+        slim = app_client.post("/api/chat", json={"session_id": "abc", "message": "hi", "slim": True}).json()
+        assert "api_trace" in full
+        assert "api_trace" not in slim
+        assert slim["response"]
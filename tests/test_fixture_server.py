@@ -0,0 +1,75 @@
+"""Tests for scripts/fixture_server.py upstream stand-in and overridable base URLs."""
+import asyncio
+import random
+
+import httpx
+import pytest
+
+import agent.tools as tools
+from scripts.fixture_server import Faults, create_app, parse_override
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fixtures")
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    def install(app):
+        monkeypatch.setattr(tools, "_http_client", _client(app))
+        monkeypatch.setattr(tools, "ABR_GUID", "fixture")
+        monkeypatch.setattr(tools, "ABR_BASE_URL", "http://fixtures/abr")
+        monkeypatch.setattr(tools, "BRAVE_SEARCH_API_KEY", "fixture")
+        monkeypatch.setattr(tools, "BRAVE_SEARCH_BASE_URL", "http://fixtures/brave")
+        monkeypatch.setattr(tools, "GOOGLE_PLACES_API_KEY", "fixture")
+        monkeypatch.setattr(tools, "GOOGLE_PLACES_BASE_URL", "http://fixtures/google")
+    return install
+
+
+class TestFixtureServer:
+
+    def test_tools_parse_synthesised_responses(self, upstreams):
+        upstreams(create_app())
+
+        async def run():
+            by_name = await tools.abr_lookup("Acme Electrical", "name")
+            by_abn = await tools.abr_lookup(by_name["results"][0]["abn"], "abn")
+            place = await tools.google_places_search("Acme Electrical", "NSW")
+            web = await tools.brave_web_search("Acme Electrical Sydney")
+            return by_name, by_abn, place, web
+
+        by_name, by_abn, place, web = asyncio.run(run())
+        assert by_name["count"] == 2
+        assert by_name["results"][0]["display_name"] == "Acme Electrical"
+        assert by_abn["results"][0]["status"] == "Active"
+        assert place["name"] == "Acme Electrical" and len(place["photos"]) == 3
+        assert web[0]["url"].startswith("http://fixtures/brave/site/")
+
+    def test_recorded_fixture_wins(self, upstreams):
+        recorded = 'c({"Abn": "11111111111", "AbnStatus": "Cancelled", "EntityName": "OLD CO"})'
+        upstreams(create_app(fixtures={"abr_abn": {"11111111111": recorded}}))
+        result = asyncio.run(tools.abr_lookup("11111111111", "abn"))
+        assert result["results"][0]["legal_name"] == "OLD CO"
+        assert result["results"][0]["status"] == "Cancelled"
+
+    def test_429_and_malformed_faults(self, upstreams):
+        app = create_app(faults={"abr": Faults(rate_429=1.0), "brave": Faults(rate_malformed=1.0)})
+        upstreams(app)
+        abr = asyncio.run(tools.abr_lookup("Acme", "name"))
+        assert abr["error"] == "ABR API returned 429"
+        assert asyncio.run(tools.brave_web_search("Acme")) == []  # truncated JSON → parse error path
+        assert app.state.counts["brave"] == 1
+
+    def test_latency_distribution_matches_percentiles(self):
+        f = Faults(latency_p50=0.1, latency_p95=0.4)
+        rng = random.Random(3)
+        samples = sorted(f.delay(rng) for _ in range(2000))
+        assert samples[1000] == pytest.approx(0.1, rel=0.15)
+        assert samples[1900] == pytest.approx(0.4, rel=0.2)
+
+    def test_parse_override(self):
+        service, faults = parse_override("google:latency=300,1200;429=0.1", Faults(rate_timeout=0.5))
+        assert service == "google"
+        assert (faults.latency_p50, faults.latency_p95, faults.rate_429, faults.rate_timeout) == (0.3, 1.2, 0.1, 0.5)
+        with pytest.raises(ValueError):
+            parse_override("bing:429=1", Faults())
@@ -0,0 +1,48 @@
+"""Tests for agent/json_stream.py incremental field extraction."""
+import json
+
+import pytest
+
+from agent.json_stream import JsonFieldStream
+
+REPLY = json.dumps({
+    "services": [{"response": "nested, ignored", "subcategory_id": 854}],
+    "response": 'Done \u2014 "Switchboards" added.\nAnything else? \U0001F44D \\o/',
+    "buttons": ["Yes", "No"],
+    "step_complete": False,
+})
+
+
+def _stream(text, field="response", size=1):
+    parser = JsonFieldStream(field)
+    return "".join(parser.feed(text[i:i + size]) for i in range(0, len(text), size)), parser
+
+
+class TestJsonFieldStream:
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(REPLY)])
+    def test_matches_json_loads_at_any_chunking(self, size):
+        text, parser = _stream(REPLY, size=size)
+        assert text == json.loads(REPLY)["response"]
+        assert parser.done
+
+    def test_ascii_escapes_and_surrogate_pairs(self):
+        raw = json.dumps({"response": "caf\u00e9 \U0001F44D"}, ensure_ascii=True)
+        assert "\\ud83d" in raw
+        assert _stream(raw)[0] == "caf\u00e9 \U0001F44D"
+
+    def test_fence_and_other_field(self):
+        raw = '```json\n{"intro": "Here\'s your profile", "description": "..."}\n```'
+        assert _stream(raw, field="intro", size=5)[0] == "Here's your profile"
+
+    def test_missing_or_non_string_field(self):
+        text, parser = _stream('{"services": [], "step_complete": true}')
+        assert (text, parser.done) == ("", False)
+        text, parser = _stream('{"response": null, "buttons": ["response", "x"]}')
+        assert (text, parser.done) == ("", False)
+
+    def test_partial_text_available_before_close(self):
+        parser = JsonFieldStream()
+        assert parser.feed('{"response": "Hel') == "Hel"
+        assert parser.feed('lo", "services": [') == "lo"
+        assert parser.done
@@ -0,0 +1,148 @@
+"""Tests for agent/limits.py concurrency budgets and turn admission control."""
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+import agent.limits as limits
+import server.app as app_module
+from agent.limits import Bulkhead, LimitedTransport, Saturated, UpstreamSaturated, limited, service_for
+from server import metrics
+
+
+class TestBulkhead:
+
+    def test_queues_then_rejects(self):
+        async def run():
+            b = Bulkhead("t", limit=1, max_queue=1, max_wait=0.05)
+            await b.acquire()
+            waiter = asyncio.create_task(b.acquire())
+            await asyncio.sleep(0)
+            assert b.waiting == 1
+            with pytest.raises(Saturated):      # queue full: rejected without waiting
+                await b.acquire()
+            with pytest.raises(Saturated):      # queued, but the slot never freed in time
+                await waiter
+            b.release()
+            await b.acquire()                   # free again
+            return b.stats()
+
+        stats = asyncio.run(run())
+        assert stats == {"name": "t", "limit": 1, "in_flight": 1, "waiting": 0, "admitted": 2, "rejected": 2}
+
+    def test_queued_holder_gets_freed_slot(self):
+        async def run():
+            b = Bulkhead("t", limit=1, max_wait=1.0)
+            order = []
+
+            async def job(n):
+                async with b.slot():
+                    order.append(n)
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(job(n) for n in range(3)))
+            return order, b
+
+        order, b = asyncio.run(run())
+        assert order == [0, 1, 2]
+        assert b.rejected == 0 and b.in_flight == 0
+
+
+class TestUpstreamBudgets:
+
+    def test_service_for(self):
+        assert service_for(httpx.URL("https://abr.business.gov.au/json/AbnDetails.aspx")) == "abr"
+        assert service_for(httpx.URL("https://places.googleapis.com/v1/places:searchText")) == "google"
+        assert service_for(httpx.URL("https://www.example-plumbing.com.au/")) == "web"
+
+    def test_transport_caps_concurrency_and_fails_fast(self, monkeypatch):
+        monkeypatch.setattr(limits, "_bulkheads", {"web": Bulkhead("web", limit=2, max_queue=1, max_wait=1.0)})
+        peak = {"now": 0, "max": 0}
+
+        async def handler(request):
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await asyncio.sleep(0.05)
+            peak["now"] -= 1
+            return httpx.Response(200)
+
+        async def run():
+            transport = LimitedTransport(httpx.MockTransport(handler))
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await asyncio.gather(*(client.get("https://example.com/") for _ in range(4)),
+                                            return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert peak["max"] == 2
+        assert sum(isinstance(r, httpx.Response) for r in results) == 3
+        errors = [r for r in results if isinstance(r, Exception)]
+        assert len(errors) == 1 and isinstance(errors[0], UpstreamSaturated)
+        assert isinstance(errors[0], httpx.TransportError)
+
+    def test_limited_chat_model(self, monkeypatch):
+        budget = Bulkhead("anthropic", limit=1)
+        monkeypatch.setattr(limits, "_bulkheads", {"anthropic": budget})
+        model = limited(GenericFakeChatModel(messages=iter([AIMessage(content="hi there"),
+                                                           AIMessage(content="streamed reply")])))
+
+        async def run():
+            reply = await model.ainvoke([HumanMessage(content="hello")])
+            chunks = [c.content async for c in model.astream([HumanMessage(content="hello")])]
+            return reply, chunks
+
+        reply, chunks = asyncio.run(run())
+        assert reply.content == "hi there"
+        assert "".join(chunks) == "streamed reply" and len(chunks) > 1
+        assert budget.admitted == 2 and budget.in_flight == 0
+
+
+class TestTurnAdmission:
+
+    @pytest.fixture
+    def client(self, app_client, monkeypatch):
+        monkeypatch.setattr(app_module, "turn_admission", Bulkhead("turns", limit=0, max_queue=0))
+        return app_client
+
+    def test_chat_503_with_retry_after(self, client):
+        for path in ("/api/chat", "/api/chat/stream"):
+            resp = client.post(path, json={"session_id": "abc", "message": "hi"})
+            assert resp.status_code == 503
+            assert resp.headers["retry-after"] == "5"
+        assert app_module.turn_admission.rejected == 2
+
+    def test_session_create_503(self, client):
+        assert client.post("/api/session", json={}).status_code == 503
+
+    def test_metrics_expose_budgets(self, client):
+        body = client.get("/metrics").text
+        assert 'onboarding_bulkhead_rejected_total{bulkhead="turns"} 0' in body
+        assert 'onboarding_bulkhead_limit{bulkhead="turns"} 0' in body
+        assert "onboarding_bulkhead_in_flight" in metrics.render(bulkheads=[Bulkhead("x", 1).stats()])
+
+
+class TestUpstreamSaturatedMidTurn:
+    """A full "anthropic" budget inside a node answers 503, like turn admission does."""
+
+    @pytest.fixture
+    def client(self, app_client, monkeypatch):
+        monkeypatch.setattr(limits, "_bulkheads", {"anthropic": Bulkhead("anthropic", limit=0, max_queue=0)})
+        model = limited(GenericFakeChatModel(messages=iter([AIMessage(content="unused")])))
+
+        async def llm_node(state):
+            await model.ainvoke([HumanMessage(content="hi")])
+            return state
+
+        monkeypatch.setitem(app_module.NODE_FUNCTIONS, "business_verification", llm_node)
+        return app_client
+
+    def test_chat_503(self, client):
+        resp = client.post("/api/chat", json={"session_id": "abc", "message": "hi"})
+        assert resp.status_code == 503
+        assert resp.headers["retry-after"] == "5"
+
+    def test_stream_error_event_503(self, client):
+        body = client.post("/api/chat/stream", json={"session_id": "abc", "message": "hi"}).text
+        assert "event: error" in body and '"status": 503' in body
+
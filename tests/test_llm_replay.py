@@ -0,0 +1,148 @@
+"""Tests for agent/llm.py: record/replay chat model layer and the response cache."""
+import asyncio
+import json
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agent import llm
+from agent.llm import CassetteMiss, RecordReplayChatModel, ResponseCache, cached, prompt_key
+
+
+def _model(mode, tmp_path, replies=("Hello there",), latency="0"):
+    inner = GenericFakeChatModel(messages=iter([AIMessage(content=r) for r in replies]))
+    return RecordReplayChatModel(inner=inner, name_tag="fast", params={"max_tokens": 512}, mode=mode,
+                                 cassette_dir=str(tmp_path), replay_latency=latency)
+
+
+PROMPT = [SystemMessage(content="You are  helpful.\n"), HumanMessage(content="Hi")]
+
+
+class TestRecordReplay:
+
+    def test_record_then_replay(self, tmp_path):
+        recorded = asyncio.run(_model("record", tmp_path).ainvoke(PROMPT))
+        assert recorded.content == "Hello there"
+        assert len(list(tmp_path.glob("*.json"))) == 1
+
+        replayer = _model("replay", tmp_path, replies=())
+        replayed = asyncio.run(replayer.ainvoke(PROMPT))
+        assert replayed.content == "Hello there"
+        assert replayer.invoke(PROMPT).content == "Hello there"
+
+    def test_whitespace_normalised_but_content_and_settings_distinct(self):
+        same = [SystemMessage(content="You are helpful."), HumanMessage(content=" Hi ")]
+        assert prompt_key("fast", {}, PROMPT) == prompt_key("fast", {}, same)
+        assert prompt_key("fast", {}, PROMPT) != prompt_key("fast_json", {}, PROMPT)
+        assert prompt_key("fast", {}, PROMPT) != prompt_key("fast", {"max_tokens": 1}, PROMPT)
+        assert prompt_key("fast", {}, PROMPT) != prompt_key("fast", {}, [HumanMessage(content="Hi")])
+
+    def test_miss_raises(self, tmp_path):
+        with pytest.raises(CassetteMiss):
+            asyncio.run(_model("replay", tmp_path).ainvoke(PROMPT))
+
+    def test_recorded_latency(self, tmp_path):
+        asyncio.run(_model("record", tmp_path).ainvoke(PROMPT))
+        path = next(tmp_path.glob("*.json"))
+        path.write_text(json.dumps({**json.loads(path.read_text()), "latency": 0.2}))
+        t0 = time.perf_counter()
+        asyncio.run(_model("replay", tmp_path, latency="recorded").ainvoke(PROMPT))
+        assert time.perf_counter() - t0 >= 0.2
+
+    def test_wrap_live_is_passthrough(self):
+        inner = GenericFakeChatModel(messages=iter([]))
+        assert llm.wrap(inner, "fast", mode="live") is inner
+        assert isinstance(llm.wrap(inner, "fast", mode="replay"), RecordReplayChatModel)
+
+
+class _Counting(GenericFakeChatModel):
+    calls: int = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def _cached(cache, replies=("one", "two", "three")):
+    inner = _Counting(messages=iter([AIMessage(content=r) for r in replies]))
+    return cached(inner, "fast", cache=cache), inner
+
+
+class TestResponseCache:
+
+    def test_opt_in_per_call(self):
+        model, inner = _cached(ResponseCache(8, 60))
+        assert asyncio.run(model.ainvoke(PROMPT)).content == "one"
+        assert asyncio.run(model.ainvoke(PROMPT, llm_cache=True)).content == "two"
+        hit = asyncio.run(model.ainvoke(PROMPT, llm_cache=True))
+        assert (hit.content, hit.response_metadata.get("cached")) == ("two", True)
+        assert inner.calls == 2
+        assert model.store.stats()["requests"] == {("fast", "miss"): 1, ("fast", "hit"): 1}
+
+    def test_streamed_miss_fills_cache(self):
+        model, inner = _cached(ResponseCache(8, 60), replies=("hello world",))
+
+        async def stream():
+            return "".join([c.content async for c in model.astream(PROMPT, llm_cache=True)])
+
+        assert asyncio.run(stream()) == "hello world"
+        assert asyncio.run(stream()) == "hello world"
+        assert inner.calls == 1
+
+    def test_unusable_replies_not_cached(self):
+        cache = ResponseCache(8, 60)
+        inner = _Counting(messages=iter([
+            AIMessage(content=""),
+            AIMessage(content='{"a": ', response_metadata={"stop_reason": "max_tokens"}),
+            AIMessage(content="Sorry, no JSON"),
+            AIMessage(content='{"a": 1}'),
+        ]))
+        model = cached(inner, "fast", cache=cache)
+        for _ in range(4):
+            asyncio.run(model.ainvoke(PROMPT, llm_cache=json.loads))
+        hit = asyncio.run(model.ainvoke(PROMPT, llm_cache=json.loads))
+        assert (hit.content, inner.calls) == ('{"a": 1}', 4)
+
+    def test_lru_and_ttl_eviction(self, monkeypatch):
+        cache = ResponseCache(2, 60)
+        for key in ("a", "b"):
+            cache.put(key, key)
+        cache.get("fast", "a")            # a is now most recent
+        cache.put("c", "c")
+        assert cache.get("fast", "b") is None
+        assert cache.stats()["evictions"] == 1
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 61)
+        assert cache.get("fast", "a") is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        model, _ = _cached(ResponseCache(8, 60, tmp_path))
+        asyncio.run(model.ainvoke(PROMPT, llm_cache=True))
+        restarted, inner = _cached(ResponseCache(8, 60, tmp_path), replies=())
+        assert asyncio.run(restarted.ainvoke(PROMPT, llm_cache=True)).content == "one"
+        assert inner.calls == 0
+        assert restarted.store.stats()["requests"] == {("fast", "disk_hit"): 1}
+
+    def test_corrupt_disk_entry_is_a_miss(self, tmp_path):
+        model, _ = _cached(ResponseCache(8, 60, tmp_path))
+        asyncio.run(model.ainvoke(PROMPT, llm_cache=True))
+        path = next(tmp_path.glob("*.json"))
+        path.write_text('{"content": "on')
+        restarted, inner = _cached(ResponseCache(8, 60, tmp_path), replies=("fresh",))
+        assert asyncio.run(restarted.ainvoke(PROMPT, llm_cache=True)).content == "fresh"
+        assert inner.calls == 1
+        assert json.loads(path.read_text())["content"] == "fresh"
+
+    def test_disabled_cache_still_accepts_opt_in(self):
+        model, inner = _cached(ResponseCache(0, 60))
+        asyncio.run(model.ainvoke(PROMPT, llm_cache=True))
+        asyncio.run(model.ainvoke(PROMPT, llm_cache=True))
+        assert inner.calls == 2
+
+    def test_key_includes_model_settings(self):
+        cache = ResponseCache(8, 60)
+        inner = _Counting(messages=iter([AIMessage(content="x"), AIMessage(content="y")]))
+        asyncio.run(cached(inner, "fast", cache=cache).ainvoke(PROMPT, llm_cache=True))
+        assert asyncio.run(cached(inner, "fast_json", cache=cache).ainvoke(PROMPT, llm_cache=True)).content == "y"
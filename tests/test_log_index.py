@@ -0,0 +1,107 @@
+"""Tests for server/log_index.py and the /api/logs endpoints."""
+import pytest
+from fastapi.testclient import TestClient
+
+import server.app as app_module
+from server.log_index import LogIndex
+from server.turn_log import TurnLogWriter
+
+
+def _turn(node, turn_time, **extra):
+    return {"node": node, "turn_time": turn_time, "timestamp": "2026-01-01T00:00:00+00:00", **extra}
+
+
+class TestLogIndex:
+
+    def test_summary_accumulates(self, tmp_path):
+        index = LogIndex(tmp_path / "index.sqlite")
+        index.record([
+            ("abc", _turn("welcome", 1.0), 100),
+            ("abc", _turn("business_verification", 4.0, business_name="Smith Plumbing"), 120),
+            ("abc", _turn("business_verification", 2.0, completed=False), 80),
+        ], mtime=1000.0)
+        index.record([("abc", _turn("complete", 0.5, completed=True), 50)], mtime=1010.0)
+        s = index.get("abc")
+        assert s["turns"] == 4 and s["total_time"] == 7.5
+        assert s["completed"] is True
+        assert s["business_name"] == "Smith Plumbing"
+        assert s["last_node"] == "complete" and s["size"] == 350
+        bv = s["node_times"]["business_verification"]
+        assert bv == {"turns": 2, "total_time": 6.0, "avg_time": 3.0, "max_time": 4.0}
+
+    def test_pagination_and_filters(self, tmp_path):
+        index = LogIndex(tmp_path / "index.sqlite")
+        for i in range(25):
+            index.record([(f"s{i:02d}", _turn("welcome", 1.0, completed=i % 5 == 0,
+                                              business_name=f"Biz {i}"), 10)], mtime=1000.0 + i)
+        seen, cursor = [], None
+        while True:
+            page, cursor = index.list_sessions(limit=10, cursor=cursor)
+            seen += [e["session_id"] for e in page]
+            if cursor is None:
+                break
+        assert seen == [f"s{i:02d}" for i in reversed(range(25))]
+
+        done, _ = index.list_sessions(completed=True)
+        assert [e["session_id"] for e in done] == ["s20", "s15", "s10", "s05", "s00"]
+        named, _ = index.list_sessions(business="Biz 1")
+        assert {e["session_id"] for e in named} == {"s01"} | {f"s{i}" for i in range(10, 20)}
+        recent, _ = index.list_sessions(since=1020.0)
+        assert len(recent) == 5
+
+    def test_writer_updates_and_rebuilds_index(self, tmp_path):
+        writer = TurnLogWriter(tmp_path, flush_interval=0.05, index=LogIndex(tmp_path / "index.sqlite"))
+        writer.write("abc", _turn("welcome", 1.5))
+        writer.write("abc", _turn("profile", 2.5))
+        writer.flush()
+        assert writer.index.get("abc")["turns"] == 2
+        writer.rebuild_index()
+        rebuilt = writer.index.get("abc")
+        assert rebuilt["turns"] == 2 and rebuilt["total_time"] == 4.0
+        writer.close()
+
+    def test_rebuild_if_empty_runs_once_across_workers(self, tmp_path):
+        first = TurnLogWriter(tmp_path, flush_interval=0.05, index=LogIndex(tmp_path / "index.sqlite"))
+        first.write("abc", _turn("welcome", 1.5))
+        first.flush()
+        first.index.clear()
+        other = TurnLogWriter(tmp_path, flush_interval=0.05, index=LogIndex(tmp_path / "index.sqlite"))
+        first.rebuild_index(if_empty=True)
+        other.write("abc", _turn("profile", 2.5))
+        other.flush()
+        (tmp_path / "abc.jsonl").unlink()   # a real rebuild now would drop the row
+        other.rebuild_index(if_empty=True)   # index already rebuilt: leaves it alone
+        assert other.index.get("abc")["turns"] == 2
+        first.close()
+        other.close()
+
+
+class TestLogsEndpoints:
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        writer = TurnLogWriter(tmp_path, flush_interval=0.05, index=LogIndex(tmp_path / "index.sqlite"))
+        monkeypatch.setattr(app_module, "turn_log", writer)
+        for i in range(3):
+            writer.write(f"s{i}", _turn("welcome", 1.0, completed=i == 2))
+        writer.write("s2", _turn("complete", 3.0, completed=True))
+        writer.flush()
+        yield TestClient(app_module.app)
+        writer.close()
+
+    def test_list_paginates(self, client):
+        data = client.get("/api/logs", params={"limit": 2}).json()
+        assert len(data["sessions"]) == 2 and data["next_cursor"]
+        rest = client.get("/api/logs", params={"limit": 2, "cursor": data["next_cursor"]}).json()
+        assert len(rest["sessions"]) == 1 and rest["next_cursor"] is None
+        done = client.get("/api/logs", params={"completed": "true"}).json()["sessions"]
+        assert [e["session_id"] for e in done] == ["s2"]
+
+    def test_get_log_summary_and_turn_slice(self, client):
+        data = client.get("/api/logs/s2", params={"offset": 1, "limit": 5}).json()
+        assert data["total_turns"] == 2 and data["total_time"] == 4.0 and data["completed"]
+        assert [t["node"] for t in data["turns"]] == ["complete"]
+        summary = client.get("/api/logs/s2", params={"turns": "false"}).json()
+        assert "turns" not in summary and "complete" in summary["node_times"]
+        assert client.get("/api/logs/nope").status_code == 404
+        assert client.get("/api/logs", params={"cursor": "bad"}).status_code == 400
@@ -0,0 +1,65 @@
+"""Tests for server/loop_watchdog.py stall detection and its debug endpoint."""
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import server.app as app_module
+from server import metrics
+from server.loop_watchdog import LoopWatchdog
+
+
+def _blocking_scan():
+    time.sleep(0.2)
+
+
+async def _run_with_watchdog(body, threshold=0.05):
+    watchdog = LoopWatchdog(threshold=threshold, interval=0.01)
+    watchdog.start()
+    try:
+        await body()
+        await asyncio.sleep(0.05)  # let the heartbeat come back and report
+    finally:
+        watchdog.stop()
+    return watchdog
+
+
+class TestLoopWatchdog:
+
+    def test_reports_blocking_call_with_stack(self):
+        async def body():
+            _blocking_scan()
+
+        watchdog = asyncio.run(_run_with_watchdog(body))
+        assert len(watchdog.stalls) == 1
+        stall = watchdog.stalls[0]
+        assert stall["culprit"] == "tests/test_loop_watchdog.py:_blocking_scan"
+        assert 0.15 < stall["duration"] < 0.5
+        assert "_blocking_scan" in stall["stack"]
+        series = metrics.metrics.snapshot("onboarding_loop_stall_seconds")
+        assert (("culprit", stall["culprit"]),) in series
+        assert not watchdog.running
+
+    def test_awaiting_is_not_a_stall(self):
+        async def body():
+            await asyncio.sleep(0.2)
+            await asyncio.to_thread(_blocking_scan)
+
+        watchdog = asyncio.run(_run_with_watchdog(body))
+        assert list(watchdog.stalls) == []
+
+
+class TestLoopStallsEndpoint:
+
+    def test_gated(self):
+        client = TestClient(app_module.app)
+        assert client.get("/api/debug/loop-stalls").status_code == 403
+
+    def test_lists_newest_first(self, monkeypatch):
+        monkeypatch.setenv("DEBUG", "1")
+        watchdog = LoopWatchdog(threshold=0.1)
+        watchdog.stalls.extend([{"at": 1.0, "duration": 0.2}, {"at": 2.0, "duration": 0.3}])
+        monkeypatch.setattr(app_module, "loop_watchdog", watchdog)
+        body = TestClient(app_module.app).get("/api/debug/loop-stalls").json()
+        assert [s["at"] for s in body["stalls"]] == [2.0, 1.0]
+        assert body["threshold_ms"] == 100
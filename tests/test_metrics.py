@@ -0,0 +1,147 @@
+"""Tests for server/metrics.py latency histograms and the /metrics endpoint."""
+import asyncio
+import math
+import os
+
+import httpx
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import agent.graph as graph
+import agent.tools as tools
+import server.app as app_module
+from agent import classification_store
+from agent.graph import _trace
+from server import metrics
+from server.metrics import Histogram, MetricsRegistry
+
+
+class TestHistogram:
+
+    def test_quantiles_interpolate_within_buckets(self):
+        h = Histogram(buckets=(1.0, 2.0, math.inf))
+        for v in [0.5] * 50 + [1.5] * 45 + [10.0] * 5:
+            h.observe(v)
+        assert h.count == 100
+        assert h.quantile(0.5) == pytest.approx(1.0)
+        assert 1.0 < h.quantile(0.9) <= 2.0
+        assert h.quantile(0.99) == 2.0  # +Inf bucket reports its lower bound
+
+    def test_empty_quantile_is_nan(self):
+        assert math.isnan(Histogram().quantile(0.5))
+
+
+class TestRegistry:
+
+    def test_render_prometheus_text(self):
+        reg = MetricsRegistry()
+        reg.histogram("x_seconds", "Test latency")
+        reg.counter("x_errors_total", "Test errors")
+        reg.observe("x_seconds", 0.3, api='ABR "Lookup"')
+        reg.observe("x_seconds", 3.0, api='ABR "Lookup"')
+        reg.inc("x_errors_total", api="ABR")
+        text = reg.render({"up": ("Always one", 1)})
+        assert "# TYPE x_seconds histogram" in text
+        assert 'x_seconds_bucket{api="ABR \\"Lookup\\"",le="0.5"} 1' in text
+        assert 'x_seconds_bucket{api="ABR \\"Lookup\\"",le="+Inf"} 2' in text
+        assert 'x_seconds_count{api="ABR \\"Lookup\\""} 2' in text
+        assert 'x_quantile_seconds{api="ABR \\"Lookup\\"",quantile="0.5"}' in text
+        assert 'x_errors_total{api="ABR"} 1' in text
+        assert "up 1" in text
+
+    def test_record_trace_skips_markers_and_counts_errors(self):
+        before = metrics.metrics.snapshot("onboarding_api_latency_seconds")
+        metrics.record_trace([
+            {"api": "Test Marker", "time": 0, "summary": "loaded"},
+            {"api": "Test API", "time": 1.2, "summary": "Request failed: 500", "error": "API returned 500"},
+            {"api": "Test OK", "time": 0.4, "summary": "No errors found"},
+        ])
+        after = metrics.metrics.snapshot("onboarding_api_latency_seconds")
+        assert (("api", "Test Marker"),) not in after
+        assert after[(("api", "Test API"),)].count == 1 + (
+            before[(("api", "Test API"),)].count if (("api", "Test API"),) in before else 0)
+        text = metrics.render()
+        assert 'onboarding_api_errors_total{api="Test API"}' in text
+        assert 'onboarding_api_errors_total{api="Test OK"}' not in text
+
+    def test_trace_error_flag_counts(self):
+        state = {}
+        _trace(state, "Test Flagged", 0.3, "0 results", error="ABR API returned 503")
+        _trace(state, "Test Flagged", 0.3, "3 results")
+        metrics.record_trace(state["_api_trace"])
+        assert 'onboarding_api_errors_total{api="Test Flagged"} 1' in metrics.render()
+
+    def test_failed_places_and_haiku_calls_counted(self, monkeypatch):
+        monkeypatch.setattr(tools, "GOOGLE_PLACES_API_KEY", "test")
+        monkeypatch.setattr(tools, "_http_client", httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(503, text="unavailable"))))
+        monkeypatch.setattr(classification_store, "get_store", lambda: None)
+
+        class _Down(GenericFakeChatModel):
+            def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+                raise RuntimeError("overloaded")
+
+        monkeypatch.setattr(graph, "llm_fast", _Down(messages=iter([])))
+
+        async def run():
+            return (await tools.google_places_search("Smith Plumbing", "NSW"),
+                    await graph.classify_business_from_web("Smith Plumbing", google_type="plumber"))
+
+        place, classification = asyncio.run(run())
+        assert place == {"error": "API returned 503"}
+        state = {}
+        _trace(state, "Test Places", 0.2, "failed", error=place["error"])
+        _trace(state, "Test Haiku", 0.3, classification["reason"], error=classification.get("error", ""))
+        metrics.record_trace(state["_api_trace"])
+        text = metrics.render()
+        assert 'onboarding_api_errors_total{api="Test Places"} 1' in text
+        assert 'onboarding_api_errors_total{api="Test Haiku"} 1' in text
+
+    def test_llm_cache_families(self):
+        text = metrics.render(llm_cache={"entries": 3, "evictions": 1,
+                                         "requests": {("fast", "hit"): 2, ("fast", "miss"): 1}})
+        assert 'onboarding_llm_cache_requests_total{model="fast",result="hit"} 2' in text
+        assert "onboarding_llm_cache_entries 3" in text
+        assert "onboarding_llm_cache_evictions_total 1" in text
+
+    def test_worker_label_with_several_workers(self, monkeypatch):
+        monkeypatch.setattr(metrics, "WEB_CONCURRENCY", 4)
+        registry = MetricsRegistry()
+        registry.counter("c_total", "c")
+        registry.inc("c_total", api="X")
+        worker = f'worker="{os.getpid()}"'
+        assert f'c_total{{{worker},api="X"}} 1' in registry.render()
+        text = metrics.render(active_sessions=2, llm_cache={"entries": 3, "evictions": 1, "requests": {}})
+        samples = [line for line in text.splitlines() if not line.startswith("#")]
+        assert samples and all(worker in line for line in samples)
+
+
+class TestMetricsEndpoint:
+
+    def test_chat_turn_feeds_histograms(self, app_client, monkeypatch):
+        registry = MetricsRegistry()
+        for name, kind in [("onboarding_api_latency_seconds", "h"), ("onboarding_node_latency_seconds", "h"),
+                           ("onboarding_turn_seconds", "h"), ("onboarding_api_errors_total", "c"),
+                           ("onboarding_node_errors_total", "c"), ("onboarding_turn_errors_total", "c")]:
+            (registry.histogram if kind == "h" else registry.counter)(name, name)
+        monkeypatch.setattr(metrics, "metrics", registry)
+
+        async def fake_verify(state):
+            _trace(state, "ABR Lookup", 0.4, "1 result")
+            return {"current_node": "business_verification",
+                    "messages": [AIMessage(content="Found you!")]}
+
+        monkeypatch.setitem(app_module.NODE_FUNCTIONS, "business_verification",
+                            app_module._with_progress("business_verification", fake_verify))
+
+        assert app_client.post("/api/chat", json={"session_id": "abc", "message": "Acme Plumbing"}).status_code == 200
+        body = app_client.get("/metrics")
+        assert body.status_code == 200
+        assert body.headers["content-type"].startswith("text/plain")
+        text = body.text
+        assert 'onboarding_api_latency_seconds_count{api="ABR Lookup"} 1' in text
+        assert 'onboarding_node_latency_seconds_count{node="business_verification"} 1' in text
+        assert 'onboarding_turn_seconds_count{endpoint="chat",node="business_verification"} 1' in text
+        assert "process_resident_memory_bytes" in text
+        assert "onboarding_active_sessions 1" in text
@@ -0,0 +1,87 @@
+"""Tests for server/profiler.py sampling profiler and its debug endpoint."""
+import threading
+import time
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+import server.app as app_module
+from server.profiler import SamplingProfiler
+
+
+def _busy_worker_fn(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def _with_busy_thread(fn):
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_worker_fn, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        return fn()
+    finally:
+        stop.set()
+        worker.join()
+
+
+class TestSamplingProfiler:
+
+    def test_samples_other_threads(self):
+        profiler = SamplingProfiler(interval=0.002)
+
+        def run():
+            profiler.start()
+            time.sleep(0.3)
+            profiler.stop()
+
+        _with_busy_thread(run)
+        assert "busy-worker" in profiler.samples
+        assert any("_busy_worker_fn" in frame for stack in profiler.samples["busy-worker"] for frame in stack)
+        assert "sampling-profiler" not in profiler.samples
+        assert not profiler.running
+
+    def test_idle_threads_skipped_by_default(self):
+        stop = threading.Event()
+        parked = threading.Thread(target=stop.wait, name="parked")
+        parked.start()
+        profiler = SamplingProfiler(interval=0.002)
+        profiler.start()
+        time.sleep(0.1)
+        profiler.stop()
+        stop.set()
+        parked.join()
+        assert "parked" not in profiler.samples
+
+    def test_exports(self):
+        profiler = SamplingProfiler(interval=0.01)
+        profiler.samples = {"MainThread": Counter({("main (app.py:1)", "run_node (app.py:300)"): 3})}
+        profiler.started_at, profiler.stopped_at = 100.0, 101.0
+        assert profiler.collapsed() == "MainThread;main_(app.py:1);run_node_(app.py:300) 3\n"
+        doc = profiler.speedscope()
+        assert doc["shared"]["frames"][1] == {"name": "run_node", "file": "app.py", "line": 300}
+        profile = doc["profiles"][0]
+        assert profile["samples"] == [[0, 1]]
+        assert profile["weights"] == [0.03]
+        assert profile["endValue"] == 1.0
+
+
+class TestProfileEndpoint:
+
+    def test_gated(self):
+        client = TestClient(app_module.app)
+        assert client.post("/api/debug/profile?seconds=0.1").status_code == 403
+
+    def test_returns_collapsed_profile(self, monkeypatch):
+        monkeypatch.setenv("DEBUG", "1")
+        client = TestClient(app_module.app)
+        resp = _with_busy_thread(lambda: client.post("/api/debug/profile?seconds=0.3&format=collapsed&interval_ms=2"))
+        assert resp.status_code == 200
+        assert "busy-worker;" in resp.text
+        assert app_module._profiler is None
+
+    def test_rejects_concurrent_profile(self, monkeypatch):
+        monkeypatch.setenv("DEBUG", "1")
+        monkeypatch.setattr(app_module, "_profiler", SamplingProfiler())
+        client = TestClient(app_module.app)
+        assert client.post("/api/debug/profile?seconds=0.1").status_code == 409
@@ -0,0 +1,71 @@
+"""Tests for the static/dynamic prompt split (prompt caching) and token reporting in agent/graph.py."""
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import agent.graph as graph
+from agent import classification_store
+from server import metrics
+
+
+class _Capturing(GenericFakeChatModel):
+    prompts: list = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(messages)
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def _reply(usage=None):
+    return AIMessage(content='{"is_trade": true, "categories": [], "reason": "r"}', usage_metadata=usage)
+
+
+USAGE = {"input_tokens": 3000, "output_tokens": 40, "total_tokens": 3040,
+         "input_token_details": {"cache_read": 2500, "cache_creation": 0}}
+
+
+class TestSystemPrompt:
+
+    def test_static_block_carries_the_cache_breakpoint(self):
+        message = graph._system("static rules", "business details")
+        assert message.content == [
+            {"type": "text", "text": "static rules", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "business details"},
+        ]
+        assert len(graph._system("static only").content) == 1
+        assert graph._system("static rules", "business details", cache=False).content == \
+            "static rules\n\nbusiness details"
+
+    def test_token_usage(self):
+        assert graph._token_usage(_reply(USAGE)) == {
+            "input": 3000, "cached": 2500, "cache_write": 0, "uncached": 500, "output": 40}
+        assert graph._token_usage(_reply()) == {}
+
+
+class TestClassifierPrompt:
+
+    def test_static_prefix_shared_across_businesses(self, monkeypatch):
+        monkeypatch.setattr(classification_store, "get_store", lambda: None)
+        model = _Capturing(messages=iter([_reply(USAGE), _reply(USAGE)]), prompts=[])
+        monkeypatch.setattr(graph, "llm_fast", model)
+        first = asyncio.run(graph.classify_business_from_web("Smith Plumbing", google_type="plumber"))
+        asyncio.run(graph.classify_business_from_web("Jones Electrical", google_type="electrician"))
+
+        # Too short to cache, so no breakpoint — but the shared instructions still come first
+        prompt_a, prompt_b = [p[0].content for p in model.prompts]
+        assert prompt_a.startswith(graph._CLASSIFIER_PROMPT) and prompt_b.startswith(graph._CLASSIFIER_PROMPT)
+        assert "Accountant" in graph._CLASSIFIER_PROMPT and "Smith" not in graph._CLASSIFIER_PROMPT
+        assert "Smith Plumbing" in prompt_a and "Jones Electrical" in prompt_b
+        assert first["tokens"]["cached"] == 2500
+
+
+class TestTokenMetrics:
+
+    def test_record_trace_counts_tokens_by_kind(self):
+        metrics.record_trace([{"api": "Test LLM", "time": 0.5, "summary": "ok",
+                               "data": {"tokens": graph._token_usage(_reply(USAGE))}}])
+        text = metrics.render()
+        assert 'onboarding_llm_tokens_total{api="Test LLM",kind="cached"} 2500' in text
+        assert 'onboarding_llm_tokens_total{api="Test LLM",kind="uncached"} 500' in text
+        assert 'kind="cache_write"' not in text
@@ -0,0 +1,104 @@
+"""Tests for server/rate_limit.py.
+
+Redis limiter runs against the local RESP stand-in — no real Redis needed.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import server.rate_limit as rate_limit
+from server.rate_limit import MemoryRateLimiter, RedisRateLimiter
+from tests.resp_standin import RespStandin
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(t=1_000_020.0)  # start of a 60s window
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: now.t))
+    return now
+
+
+@pytest.fixture(params=["memory", "redis"])
+def limiter(request):
+    if request.param == "memory":
+        yield MemoryRateLimiter()
+    else:
+        with RespStandin() as srv:
+            yield RedisRateLimiter(srv.url)
+
+
+class TestRateLimiter:
+
+    def test_limit_within_window(self, limiter, clock):
+        assert all(limiter.hit("s1", 3, 60) for _ in range(3))
+        assert not limiter.hit("s1", 3, 60)
+        assert limiter.hit("s2", 3, 60)  # keys are independent
+
+    def test_rejected_requests_not_counted(self, limiter, clock):
+        for _ in range(3):
+            limiter.hit("s1", 3, 60)
+        for _ in range(10):
+            assert not limiter.hit("s1", 3, 60)
+        clock.t += 60 + 30  # halfway through next window: previous counts 1.5 of 3
+        assert limiter.hit("s1", 3, 60)
+        assert limiter.hit("s1", 3, 60)
+        assert not limiter.hit("s1", 3, 60)
+
+    def test_previous_window_slides_out(self, limiter, clock):
+        for _ in range(3):
+            limiter.hit("s1", 3, 60)
+        clock.t += 60  # start of next window: previous still fully weighted
+        assert not limiter.hit("s1", 3, 60)
+        clock.t += 120  # two windows later: nothing carries over
+        assert all(limiter.hit("s1", 3, 60) for _ in range(3))
+
+
+class TestMemorySweep:
+
+    def test_sweep_drops_only_idle_keys(self, clock):
+        limiter = MemoryRateLimiter()
+        limiter.hit("ip:1.2.3.4", 5, 60)
+        clock.t += 100
+        limiter.hit("ip:5.6.7.8", 5, 60)
+        clock.t += 30
+        assert limiter.sweep() == 1
+        assert len(limiter) == 1
+
+    def test_forget(self, clock):
+        limiter = MemoryRateLimiter()
+        limiter.hit("abc", 1, 60)
+        limiter.forget("abc")
+        assert limiter.hit("abc", 1, 60)
+
+
+class TestRedisFailOpen:
+
+    def test_unreachable_redis_allows(self):
+        limiter = RedisRateLimiter("redis://127.0.0.1:1/0")
+        assert limiter.hit("s1", 1, 60)
+
+    def test_circuit_opens_after_failure(self, monkeypatch):
+        limiter = RedisRateLimiter("redis://127.0.0.1:1/0", retry_interval=60)
+        calls = []
+        real = limiter._hit
+        monkeypatch.setattr(limiter, "_hit", lambda *a: calls.append(a) or real(*a))
+        assert limiter.hit("s1", 1, 60)
+        assert all(limiter.hit("s1", 1, 60) for _ in range(5))
+        assert len(calls) == 1  # one probe, then fail open without touching Redis
+
+    def test_circuit_closes_when_redis_returns(self, clock):
+        with RespStandin() as srv:
+            limiter = RedisRateLimiter(srv.url, retry_interval=10)
+            limiter._down_until = clock.t + 10
+            assert limiter.hit("s1", 1, 60)  # still open: not counted
+            clock.t += 10
+            assert limiter.hit("s1", 1, 60)  # probe succeeds and counts
+            assert not limiter.hit("s1", 1, 60)
+
+
+class TestAsyncHit:
+
+    def test_ahit(self, limiter, clock):
+        assert asyncio.run(limiter.ahit("s1", 1, 60))
+        assert not asyncio.run(limiter.ahit("s1", 1, 60))
@@ -0,0 +1,40 @@
+"""Tests for scripts/replay_bench.py baseline comparison and log loading."""
+import json
+
+from scripts.replay_bench import compare, load_conversations
+
+
+def _result(latency, http=1, llm=1, error=""):
+    return {"node": "service_area", "latency": latency, "http_calls": http, "llm_calls": llm, "error": error}
+
+
+class TestCompare:
+    BASELINE = {"s:1": {"node": "service_area", "latency": 0.2, "http_calls": 1, "llm_calls": 1}}
+
+    def test_within_tolerance(self):
+        assert compare({"s:1": _result(0.29)}, self.BASELINE, tolerance=0.25, slack=0.05) == []
+
+    def test_slower_turn_fails(self):
+        failures = compare({"s:1": _result(0.31)}, self.BASELINE, tolerance=0.25, slack=0.05)
+        assert len(failures) == 1 and "310ms > 300ms" in failures[0]
+
+    def test_extra_calls_fail(self):
+        failures = compare({"s:1": _result(0.1, http=2, llm=2)}, self.BASELINE, tolerance=0.25, slack=0.05)
+        assert [f.split()[2] for f in failures] == ["http_calls", "llm_calls"]
+
+    def test_errors_fail_and_new_turns_pass(self):
+        results = {"s:1": _result(0.1, error="CassetteMiss: x"), "s:2": _result(9.0)}
+        failures = compare(results, self.BASELINE, tolerance=0.25, slack=0.05)
+        assert len(failures) == 1 and "CassetteMiss" in failures[0]
+
+
+class TestLoadConversations:
+
+    def test_skips_improve_sessions_and_empty_messages(self, tmp_path):
+        def write(sid, turns):
+            (tmp_path / f"{sid}.jsonl").write_text("".join(json.dumps(t) + "\n" for t in turns))
+
+        write("new", [{"turn": 0, "node": "welcome", "user_message": ""},
+                      {"turn": 2, "user_message": "Looks good"}, {"turn": 1, "user_message": "12345678901"}])
+        write("improve", [{"turn": 0, "flow_mode": "improve"}, {"turn": 1, "user_message": "hi"}])
+        assert load_conversations(str(tmp_path), [], 0) == {"new": ["12345678901", "Looks good"]}
@@ -0,0 +1,281 @@
+"""Tests for server/session_store.py backends.
+
+Redis store runs against the local RESP stand-in — no real Redis needed.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+from langchain_core.messages import HumanMessage, AIMessage
+
+from agent.snapshot import dumps_state, loads_state
+from server.session_store import (
+    MemorySessionStore, SQLiteSessionStore, RedisSessionStore, SessionConflict, SessionStore,
+)
+from server.resp import RespClient
+from tests.resp_standin import RespStandin
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySessionStore()
+    elif request.param == "sqlite":
+        yield SQLiteSessionStore(tmp_path / "sessions.sqlite")
+    else:
+        with RespStandin() as srv:
+            yield RedisSessionStore(srv.url, ttl_seconds=60)
+
+
+def _state(sid: str, last_active: float = None) -> dict:
+    now = last_active or time.time()
+    return {
+        "session_id": sid,
+        "business_name": "Smith Plumbing",
+        "messages": [HumanMessage(content="hi"), AIMessage(content="G'day!")],
+        "services": [{"subcategory_id": 1, "subcategory_name": "Blocked Drains"}],
+        "_last_active": now,
+        "_created_at": now,
+    }
+
+
+class TestSessionStore:
+
+    def test_roundtrip_preserves_messages(self, store):
+        store["abc"] = _state("abc")
+        loaded = store.get("abc")
+        assert loaded["business_name"] == "Smith Plumbing"
+        assert isinstance(loaded["messages"][0], HumanMessage)
+        assert isinstance(loaded["messages"][1], AIMessage)
+        assert loaded["messages"][1].content == "G'day!"
+        assert "abc" in store
+        assert len(store) == 1
+
+    def test_missing_session(self, store):
+        assert store.get("nope") is None
+        assert "nope" not in store
+
+    def test_version_increments(self, store):
+        store["abc"] = _state("abc")
+        first = store.get("abc")
+        assert first["_version"] == 1
+        first["business_name"] = "Jones Electrical"
+        store["abc"] = first
+        second = store.get("abc")
+        assert second["_version"] == 2
+        assert second["business_name"] == "Jones Electrical"
+
+    def test_stale_write_rejected(self, store):
+        if isinstance(store, MemorySessionStore):
+            pytest.skip("memory store hands out the live dict — no stale copies")
+        store["abc"] = _state("abc")
+        a = store.get("abc")
+        b = store.get("abc")
+        store["abc"] = a
+        with pytest.raises(SessionConflict):
+            store["abc"] = b
+
+    def test_delete(self, store):
+        store["abc"] = _state("abc")
+        del store["abc"]
+        assert store.get("abc") is None
+        with pytest.raises(KeyError):
+            del store["abc"]
+
+    def test_expire_idle(self, store):
+        store["old"] = _state("old", last_active=time.time() - 3600)
+        store["new"] = _state("new")
+        expired = store.expire(1800)
+        assert expired == ["old"]
+        assert len(store) == 1
+
+    def test_evict_oldest(self, store):
+        now = time.time()
+        for i in range(5):
+            store[f"s{i}"] = _state(f"s{i}", last_active=now - 100 + i)
+        evicted = store.evict_oldest(3)
+        assert sorted(evicted) == ["s0", "s1"]
+        assert len(store) == 3
+        assert store.get("s4") is not None
+
+    def test_async_calls_off_loop_for_persistent_backends(self, store, monkeypatch):
+        threads = []
+        get = store.get
+        monkeypatch.setattr(store, "get", lambda *a: threads.append(threading.get_ident()) or get(*a))
+
+        async def run():
+            version = await store.asave("abc", _state("abc"))
+            loaded = await store.aget("abc")
+            return version, loaded, await store.alen()
+
+        version, loaded, count = asyncio.run(run())
+        assert version == loaded["_version"] == 1 and count == 1
+        on_loop = all(t == threading.get_ident() for t in threads)
+        assert on_loop == isinstance(store, MemorySessionStore)
+
+
+class TestBackendInterface:
+
+    def test_incomplete_backend_fails_on_construction(self):
+        class GetOnly(SessionStore):
+            def get(self, session_id, default=None):
+                return default
+
+        with pytest.raises(TypeError):
+            GetOnly()
+
+
+class TestRespClient:
+
+    def test_only_reads_outside_watch_are_resent(self):
+        with RespStandin() as srv:
+            client = RespClient(srv.url)
+            client.execute("SET", "k", 1)
+            client._sock.close()   # connection lost under the client
+            with pytest.raises(OSError):
+                client.execute("INCR", "k")
+            assert client.execute("GET", "k") == b"1"   # not re-sent: still 1
+            client._sock.close()
+            assert client.execute("GET", "k") == b"1"   # reads are retried
+            client.execute("WATCH", "k")
+            client._sock.close()
+            with pytest.raises(OSError):
+                client.execute("GET", "k")   # a new connection would have dropped the WATCH
+
+
+class TestSnapshot:
+    """Tests for agent/snapshot.py compact state encoding."""
+
+    def test_roundtrip(self):
+        state = _state("abc")
+        state["licence_info"] = {"licence_number": "123", "raw": {"nested": [1, 2, {"a": None}]}}
+        state["custom_field"] = "kept by name"
+        loaded = loads_state(dumps_state(state))
+        assert loaded["licence_info"] == state["licence_info"]
+        assert loaded["custom_field"] == "kept by name"
+        assert [type(m) for m in loaded["messages"]] == [HumanMessage, AIMessage]
+        assert loaded["messages"][0].content == "hi"
+
+    def test_drops_message_metadata(self):
+        state = _state("abc")
+        state["messages"] = [AIMessage(content="ok", response_metadata={"usage": {"input_tokens": 9}})]
+        loaded = loads_state(dumps_state(state))
+        assert loaded["messages"][0].content == "ok"
+        assert loaded["messages"][0].response_metadata == {}
+
+    def test_compresses_large_text(self):
+        state = _state("abc")
+        state["website_text"] = "Licensed electrician servicing the Hills District. " * 100
+        assert len(dumps_state(state)) < len(state["website_text"]) / 4
+
+    def test_rejects_foreign_bytes(self):
+        with pytest.raises(ValueError):
+            loads_state(b'{"not": "a snapshot"}')
+
+
+class TestMemoryCompaction:
+
+    def test_idle_session_compacted_and_inflated(self):
+        store = MemorySessionStore()
+        store["old"] = _state("old", last_active=time.time() - 600)
+        store["new"] = _state("new")
+        assert store.compact_idle(120) == 1
+        assert len(store) == 2 and "old" in store
+        state = store.get("old")
+        assert state["business_name"] == "Smith Plumbing"
+        assert isinstance(state["messages"][1], AIMessage)
+        # Inflated copy is now the live dict
+        assert store.get("old") is state
+
+    def test_read_session_kept_live_then_recompacted(self, monkeypatch):
+        store = MemorySessionStore()
+        now = time.time()
+        store["old"] = _state("old", last_active=now - 600)
+        assert store.compact_idle(120) == 1
+        state = store.get("old")           # a turn starts on the frozen session
+        assert store.compact_idle(120) == 0
+        assert store.get("old") is state
+        store["new"] = _state("new")
+        monkeypatch.setattr(time, "time", lambda: now + 600)
+        assert store.compact_idle(120) == 2
+        assert set(store._frozen) == {"old", "new"}
+
+    def test_compaction_in_batches(self):
+        store = MemorySessionStore()
+        for i in range(5):
+            store[f"s{i}"] = _state(f"s{i}", last_active=time.time() - 600)
+        assert store.compact_idle(120, limit=2) == 2
+        assert asyncio.run(store.acompact_idle(120, batch=2)) == 3
+        assert len(store._frozen) == 5
+
+    def test_reads_do_not_extend_ttl(self):
+        store = MemorySessionStore()
+        store["old"] = _state("old", last_active=time.time() - 3600)
+        store.get("old")                   # e.g. GET /api/session polling
+        assert store.expire(1800) == ["old"]
+
+    def test_expire_covers_compacted(self):
+        store = MemorySessionStore()
+        store["old"] = _state("old", last_active=time.time() - 3600)
+        store.compact_idle(120)
+        assert store.expire(1800) == ["old"]
+        assert len(store) == 0
+
+
+class TestMemoryLimits:
+
+    def test_cap_enforced_on_insert(self):
+        dropped = []
+        store = MemorySessionStore(max_sessions=3, on_drop=dropped.append)
+        now = time.time()
+        for i in range(5):
+            store[f"s{i}"] = _state(f"s{i}", last_active=now - 100 + i)
+        assert len(store) == 3
+        assert dropped == ["s0", "s1"]
+        assert "s0" not in store and "s4" in store
+
+    def test_touched_session_not_evicted(self):
+        store = MemorySessionStore(max_sessions=2)
+        now = time.time()
+        store["a"] = _state("a", last_active=now - 50)
+        store["b"] = _state("b", last_active=now - 40)
+        a = store.get("a")
+        a["_last_active"] = now
+        store["a"] = a
+        store["c"] = _state("c", last_active=now - 10)
+        assert "b" not in store
+        assert "a" in store and "c" in store
+
+    def test_ttl_enforced_on_access(self):
+        dropped = []
+        store = MemorySessionStore(ttl_seconds=1800, on_drop=dropped.append)
+        store["old"] = _state("old", last_active=time.time() - 3600)
+        assert store.get("old") is None
+        assert dropped == ["old"] and len(store) == 0
+
+    def test_heap_stays_bounded_under_repeated_writes(self):
+        store = MemorySessionStore()
+        state = _state("abc")
+        store["abc"] = state
+        for i in range(1000):
+            state["_last_active"] = time.time() + i
+            store["abc"] = state
+        assert len(store._heap) < 100
+        assert store.evict_oldest(0) == ["abc"]
+
+
+class TestWorkerLocalCleanup:
+
+    def test_idle_sessions_forgotten_on_this_worker(self, monkeypatch):
+        # With a shared store another worker may expire the session; this one still cleans up
+        import server.app as app_module
+        cancelled = []
+        monkeypatch.setattr(app_module, "_local_sessions", OrderedDict())
+        monkeypatch.setattr(app_module, "cancel_speculative", cancelled.append)
+        app_module._local_sessions["old"] = time.time() - 3600
+        app_module._touch_local("new")
+        assert app_module._forget_idle_local(1800) == ["old"]
+        assert cancelled == ["old"]
+        assert list(app_module._local_sessions) == ["new"]
@@ -0,0 +1,136 @@
+"""Tests for agent/shared_data.py: the shared read-only data file and the lookups that use it."""
+import csv
+import json
+
+import pytest
+
+import agent.tools as tools
+from agent import shared_data
+from agent.shared_data import SharedData, build
+
+QBCC_ROWS = [
+    {"ABN": "56 051 254 301", "Licensee Name": "PROTECH COAT PTY LTD", "Licence Number": "1001",
+     "Licence Class Type": "Painting", "Licence Grade": "Trade", "Licensee Business Address": "1 A St"},
+    {"ABN": "56051254301", "Licensee Name": "PROTECH COAT PTY LTD", "Licence Number": "1001",
+     "Licence Class Type": "Waterproofing", "Licence Grade": "Trade", "Licensee Business Address": "1 A St"},
+    {"ABN": "11111111111", "Licensee Name": "SMITH AND SONS PLUMBING PTY LTD", "Licence Number": "2002",
+     "Licence Class Type": "Plumbing", "Licence Grade": "Contractor", "Licensee Business Address": "2 B St"},
+]
+SUBURB_ROWS = [
+    {"id": "1", "name": "Sydney", "state": "NSW", "postcode": "2000", "lat": "-33.8688", "lng": "151.2093"},
+    {"id": "2", "name": "Parramatta", "state": "NSW", "postcode": "2150", "lat": "-33.8150", "lng": "151.0011"},
+    {"id": "3", "name": "Newcastle", "state": "NSW", "postcode": "2300", "lat": "-32.9283", "lng": "151.7817"},
+    {"id": "4", "name": "Nowhere", "state": "NSW", "postcode": "2000", "lat": "0", "lng": "0"},
+]
+
+TAXONOMY = {
+    "Plumber": {"category_name": "Plumber", "category_id": 7, "subcategories": [
+        {"subcategory_name": "Blocked Drains", "subcategory_id": 71},
+        {"subcategory_name": "Hot Water", "subcategory_id": 72}]},
+    "Insurance": {"category_name": "Insurance", "category_id": 9},
+}
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def sources(tmp_path):
+    resources = tmp_path / "resources"
+    resources.mkdir()
+    _write_csv(resources / "qbcc_licences.csv", QBCC_ROWS)
+    _write_csv(resources / "suburbs.csv", SUBURB_ROWS)
+    (resources / "subcategories.json").write_text(json.dumps(TAXONOMY))
+    businesses = tmp_path / "businesses.csv"
+    _write_csv(businesses, [
+        {"Business ID": "123", "Business Name": "Acme Plumbing", "Industry": "Plumber", "City": "Sydney"},
+        {"Business ID": "456", "Business Name": "100% Painting", "Industry": "Painter", "City": "Perth"},
+        {"Business ID": "", "Business Name": "No ID", "Industry": "Plumber", "City": "Perth"},
+    ])
+    return resources, businesses
+
+
+@pytest.fixture
+def store(tmp_path, sources):
+    resources, businesses = sources
+    path = tmp_path / "shared.sqlite"
+    assert build(path, resources=resources, business_csv=businesses) is True
+    return SharedData(path)
+
+
+class TestBuild:
+
+    def test_rebuilds_only_when_sources_change(self, tmp_path, sources):
+        resources, businesses = sources
+        path = tmp_path / "shared.sqlite"
+        assert build(path, resources=resources, business_csv=businesses) is True
+        assert build(path, resources=resources, business_csv=businesses) is False
+        _write_csv(resources / "suburbs.csv", SUBURB_ROWS[:2])
+        assert build(path, resources=resources, business_csv=businesses) is True
+        assert SharedData(path).suburb_count == 2
+        assert not list(tmp_path.glob("*.building"))
+
+    def test_counts(self, store):
+        assert (store.qbcc_count, store.suburb_count, store.category_count, store.business_count) == (3, 4, 2, 2)
+
+
+class TestQueries:
+
+    def test_suburbs(self, store):
+        assert [s["name"] for s in store.suburbs_by_postcode("2000")] == ["Sydney", "Nowhere"]
+        near = [s["name"] for s in store.suburbs_near(-33.8688, 151.2093, 30)]
+        assert near == ["Sydney", "Parramatta"]
+
+    def test_taxonomy(self, store):
+        assert list(store.categories) == ["Plumber", "Insurance"]
+        assert "Plumber" in store.categories and "Builder" not in store.categories
+        assert store.categories["Plumber"] == TAXONOMY["Plumber"]
+        assert store.categories.get("Builder") is None
+        assert store.taxonomy_text() == shared_data.taxonomy_text(TAXONOMY)
+        assert "  - Hot Water (id: 72)" in store.taxonomy_text().splitlines()
+
+    def test_search_businesses(self, store):
+        assert [b["id"] for b in store.search_businesses("456", 20)] == ["456"]
+        assert [b["name"] for b in store.search_businesses("plumb", 20)] == ["Acme Plumbing"]
+        assert [b["name"] for b in store.search_businesses("100%", 20)] == ["100% Painting"]
+        assert store.search_businesses("_", 20) == []   # LIKE wildcards match literally
+
+
+class TestToolsUseSharedStore:
+
+    @pytest.fixture
+    def shared(self, monkeypatch, store):
+        monkeypatch.setattr(shared_data, "get_store", lambda: store)
+        monkeypatch.setattr(tools, "_qbcc_licences", {"abn_index": {}, "name_index": {}, "loaded": False,
+                                                      "store": None})
+        tools.qbcc_load_csv()
+        return store
+
+    def test_qbcc_lookup(self, shared):
+        by_abn = tools.qbcc_licence_lookup("56051254301", "")
+        assert [c["name"] for c in by_abn["classes"]] == ["Painting", "Waterproofing"]
+        by_name = tools.qbcc_licence_lookup("", "Protech Coat Pty. Ltd.")
+        assert by_name["licence_number"] == "1001"
+        by_overlap = tools.qbcc_licence_lookup("", "Smith & Sons Plumbing")
+        assert by_overlap["licence_number"] == "2002"
+        assert tools.qbcc_licence_lookup("", "Nonexistent Corp Pty Ltd") is None
+
+    def test_suburbs_match_in_memory_results(self, shared, monkeypatch, sources):
+        from_store = tools.get_suburbs_within_radius(-33.8688, 151.2093, 30)
+        monkeypatch.setattr(shared_data, "get_store", lambda: None)
+        monkeypatch.setattr(tools, "RESOURCES_DIR", sources[0])
+        monkeypatch.setattr(tools, "_suburbs_cache", None)
+        assert tools.get_suburbs_within_radius(-33.8688, 151.2093, 30) == from_store
+        assert [s["name"] for s in from_store] == ["Sydney", "Parramatta"]
+
+    def test_taxonomy_matches_in_memory_results(self, shared, monkeypatch, sources):
+        from_store = tools.get_category_taxonomy_text()
+        monkeypatch.setattr(shared_data, "get_store", lambda: None)
+        monkeypatch.setattr(tools, "RESOURCES_DIR", sources[0])
+        monkeypatch.setattr(tools, "_categories_cache", None)
+        assert tools.get_category_taxonomy_text() == from_store
+        assert tools._load_categories() == TAXONOMY
@@ -0,0 +1,121 @@
+"""Tests for agent/spans.py nested span recording and Chrome trace export."""
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+import server.app as app_module
+from agent import spans
+from agent.graph import _trace
+
+
+@spans.traced()
+async def _slow_tool(delay):
+    await asyncio.sleep(delay)
+    return delay
+
+
+class TestSpans:
+
+    def test_gather_children_overlap_on_separate_tracks(self):
+        async def turn():
+            with spans.recording("s1"):
+                with spans.span("enrich", "enrichment"):
+                    await asyncio.gather(_slow_tool(0.05), _slow_tool(0.05))
+                    spans.add_completed("Google Retry", 0.01)
+
+        asyncio.run(turn())
+        recorded = spans.session_spans("s1")[-1]
+        by_name = {}
+        for s in recorded:
+            by_name.setdefault(s.name, []).append(s)
+        root, enrich = by_name["turn"][0], by_name["enrich"][0]
+        a, b = by_name["_slow_tool"]
+        assert enrich.parent_id == root.span_id
+        assert a.parent_id == b.parent_id == enrich.span_id
+        assert a.track != b.track != enrich.track
+        assert a.start < b.end and b.start < a.end  # overlapped
+        assert by_name["Google Retry"][0].parent_id == enrich.span_id
+        assert {s.trace_id for s in recorded} == {root.trace_id}
+        spans.forget("s1")
+
+    def test_no_recording_is_noop(self):
+        assert asyncio.run(_slow_tool(0)) == 0
+        with spans.span("x") as s:
+            assert s is None
+        spans.add_completed("x", 1.0)
+
+    def test_httpx_hooks_record_request_without_query(self):
+        transport = httpx.MockTransport(lambda request: httpx.Response(204))
+
+        async def turn():
+            async with httpx.AsyncClient(transport=transport, event_hooks=spans.HTTPX_EVENT_HOOKS) as client:
+                with spans.recording("s2"):
+                    await client.get("https://abr.example/search?guid=secret")
+
+        asyncio.run(turn())
+        http = [s for s in spans.session_spans("s2")[-1] if s.cat == "http"][0]
+        assert http.name == "GET abr.example"
+        assert http.args["status"] == 204
+        assert "secret" not in http.args["url"]
+        spans.forget("s2")
+
+    def test_llm_callback_records_call(self):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="hi")]), callbacks=[spans.LLM_CALLBACK])
+
+        async def turn():
+            with spans.recording("s5"):
+                await llm.ainvoke([HumanMessage(content="hello")])
+
+        asyncio.run(turn())
+        llm_span = [s for s in spans.session_spans("s5")[-1] if s.cat == "llm"][0]
+        assert llm_span.parent_id == 1 and llm_span.end is not None
+        spans.forget("s5")
+
+    def test_unfinished_spans_are_closed_and_errors_marked(self):
+        with pytest.raises(ValueError):
+            with spans.recording("s3"):
+                spans._start_leaf("GET slow.example", "http")
+                raise ValueError
+        recorded = spans.session_spans("s3")[-1]
+        assert recorded[0].args["error"] == "ValueError"
+        assert recorded[1].args["unfinished"] is True
+        spans.forget("s3")
+
+    def test_chrome_trace_format(self):
+        with spans.recording("s4"):
+            spans.add_completed("ABR Lookup", 0.2)
+        trace = spans.chrome_trace("s4")
+        complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        assert {e["name"] for e in complete} == {"turn", "ABR Lookup"}
+        abr = next(e for e in complete if e["name"] == "ABR Lookup")
+        assert abr["dur"] == pytest.approx(200_000, abs=1000)
+        assert abr["args"]["parent_id"] == 1
+        assert any(e["ph"] == "M" and e["name"] == "thread_name" for e in trace["traceEvents"])
+        assert spans.chrome_trace("missing") is None
+        spans.forget("s4")
+
+
+class TestDebugTraceEndpoint:
+
+    def test_chat_turn_exports_nested_trace(self, app_client, monkeypatch):
+        monkeypatch.setenv("DEBUG", "1")  # TestClient isn't localhost
+
+        async def fake_verify(state):
+            _trace(state, "ABR Lookup", 0.1, "1 result")
+            return {"current_node": "business_verification",
+                    "messages": [AIMessage(content="Found you!")]}
+
+        monkeypatch.setitem(app_module.NODE_FUNCTIONS, "business_verification",
+                            app_module._with_progress("business_verification", fake_verify))
+        app_module.sessions["tr1"] = app_module._init_base_state("tr1")
+        assert app_client.post("/api/chat", json={"session_id": "tr1", "message": "Acme"}).status_code == 200
+
+        trace = app_client.get("/api/debug-trace/tr1").json()
+        events = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+        assert events["business_verification"]["args"]["parent_id"] == events["turn"]["args"]["span_id"]
+        assert events["ABR Lookup"]["args"]["parent_id"] == events["business_verification"]["args"]["span_id"]
+        assert app_client.get("/api/debug-trace/nope").status_code == 404
+        spans.forget("tr1")
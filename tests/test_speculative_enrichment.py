@@ -0,0 +1,107 @@
+"""Tests for speculative background enrichment in agent/graph.py."""
+import asyncio
+
+import pytest
+
+import agent.graph as graph
+
+
+ABR = {"abn": "51824753556", "display_name": "Smith Plumbing", "legal_name": "SMITH PLUMBING PTY LTD",
+       "postcode": "2150", "state": "NSW", "status": "Active", "entity_type": "Australian Private Company"}
+OTHER = {**ABR, "abn": "11111111111", "display_name": "Smith Plumbing Group", "postcode": "2000"}
+
+
+@pytest.fixture
+def enrich_calls(monkeypatch):
+    calls = []
+
+    async def fake_enrich(state):
+        calls.append(state["business_name"])
+        await asyncio.sleep(0.05)
+        graph._trace(state, "Google Places", 0.05, "found")
+        return {"google_rating": 4.8, "business_website": "https://smithplumbing.com.au"}
+
+    monkeypatch.setattr(graph, "_enrich_business", fake_enrich)
+    monkeypatch.setattr(graph, "_speculative", {})
+    monkeypatch.setattr(graph, "ENRICH_SPECULATIVE_CANDIDATES", 1)
+    return calls
+
+
+def _state():
+    return {"session_id": "abc", "messages": [], "_api_trace": []}
+
+
+class TestSpeculativeEnrichment:
+
+    def test_off_when_not_configured(self, enrich_calls, monkeypatch):
+        monkeypatch.setattr(graph, "ENRICH_SPECULATIVE_CANDIDATES", 0)
+
+        async def run():
+            graph._speculate_enrichment(_state(), [ABR, OTHER])
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        assert enrich_calls == [] and graph._speculative == {}
+
+    def test_confirm_adopts_prefetched_result(self, enrich_calls):
+        async def run():
+            state = _state()
+            graph._speculate_enrichment(state, [ABR, OTHER])
+            await asyncio.sleep(0.1)
+            return state, await graph._confirm_business(ABR, state)
+
+        state, result = asyncio.run(run())
+        assert enrich_calls == ["Smith Plumbing"]  # only the top candidate, only once
+        assert result["google_rating"] == 4.8
+        assert result["business_verified"] is True
+        apis = [t["api"] for t in state["_api_trace"]]
+        assert apis == ["Google Places", "Prefetched Enrichment"]
+        assert graph._speculative == {}
+
+    def test_confirm_joins_in_flight_task(self, enrich_calls):
+        async def run():
+            state = _state()
+            graph._speculate_enrichment(state, [ABR])
+            return await graph._confirm_business(ABR, state)
+
+        result = asyncio.run(run())
+        assert enrich_calls == ["Smith Plumbing"]
+        assert result["business_website"] == "https://smithplumbing.com.au"
+
+    def test_different_pick_runs_fresh_and_cancels(self, enrich_calls):
+        async def run():
+            state = _state()
+            graph._speculate_enrichment(state, [ABR])
+            task, _ = graph._speculative["abc"][next(iter(graph._speculative["abc"]))]
+            result = await graph._confirm_business(OTHER, state)
+            await asyncio.sleep(0)
+            return task, result
+
+        task, result = asyncio.run(run())
+        assert task.cancelled()
+        assert enrich_calls[-1] == "Smith Plumbing Group"
+        assert result["business_name"] == "Smith Plumbing Group"
+
+    def test_new_candidates_replace_stale_tasks(self, enrich_calls):
+        async def run():
+            state = _state()
+            graph._speculate_enrichment(state, [ABR])
+            (old_task, _), = graph._speculative["abc"].values()
+            graph._speculate_enrichment(state, [OTHER])
+            await asyncio.sleep(0)
+            graph.cancel_speculative("abc")
+            return old_task
+
+        old_task = asyncio.run(run())
+        assert old_task.cancelled()
+        assert graph._speculative == {}
+
+    def test_sole_trader_not_prefetched(self, enrich_calls):
+        sole = {**ABR, "display_name": "SMITH, JACK", "legal_name": "SMITH, JACK",
+                "entity_type": "Individual/Sole Trader"}
+
+        async def run():
+            graph._speculate_enrichment(_state(), [sole])
+
+        asyncio.run(run())
+        assert graph._speculative == {}
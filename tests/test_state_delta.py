@@ -0,0 +1,79 @@
+"""Tests for versioned state: JSON-patch chat responses and ETags on GET /api/session."""
+import jsonpatch
+import pytest
+from langchain_core.messages import AIMessage
+
+import server.app as app_module
+
+
+@pytest.fixture
+def client(app_client, monkeypatch):
+    async def fake_run_node(state):
+        state["business_name"] = "Smith Plumbing"
+        state["services"].append({"subcategory_id": 1, "subcategory_name": "Blocked Drains"})
+        state["messages"].append(AIMessage(content="Found you!"))
+        return state
+
+    monkeypatch.setattr(app_module, "run_node", fake_run_node)
+    return app_client
+
+
+class TestStateDelta:
+
+    def test_full_state_without_since_version(self, client):
+        data = client.post("/api/chat", json={"session_id": "abc", "message": "hi"}).json()
+        assert data["state"]["business_name"] == "Smith Plumbing"
+        assert data["state_version"] == 2
+        assert "state_patch" not in data
+
+    def test_patch_applies_to_previous_state(self, client):
+        before = client.get("/api/session/abc").json()
+        data = client.post("/api/chat", json={
+            "session_id": "abc", "message": "hi", "since_version": before["state_version"],
+        }).json()
+        assert "state" not in data
+        after = jsonpatch.apply_patch(before["state"], data["state_patch"])
+        assert after == client.get("/api/session/abc").json()["state"]
+        assert after["services"][0]["subcategory_name"] == "Blocked Drains"
+
+    def test_stale_since_version_gets_full_state(self, client):
+        data = client.post("/api/chat", json={
+            "session_id": "abc", "message": "hi", "since_version": 99,
+        }).json()
+        assert data["state"]["business_name"] == "Smith Plumbing"
+
+
+    def test_failed_turn_invalidates_since_version(self, client, monkeypatch):
+        before = client.get("/api/session/abc").json()
+
+        async def failing_run_node(state):
+            state["business_name"] = "Half Done"
+            raise RuntimeError("node blew up")
+
+        monkeypatch.setattr(app_module, "run_node", failing_run_node)
+        with pytest.raises(RuntimeError):
+            client.post("/api/chat", json={"session_id": "abc", "message": "hi"})
+        assert client.get("/api/session/abc").json()["state_version"] > before["state_version"]
+
+
+class TestSessionETag:
+
+    def test_not_modified_until_state_changes(self, client):
+        resp = client.get("/api/session/abc")
+        etag = resp.headers["etag"]
+        assert client.get("/api/session/abc", headers={"If-None-Match": etag}).status_code == 304
+
+        client.post("/api/chat", json={"session_id": "abc", "message": "hi"})
+        resp = client.get("/api/session/abc", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+    @pytest.mark.parametrize("header", ['"other", W/{etag}', '{etag},"other"', "*"])
+    def test_if_none_match_list_and_wildcard(self, client, header):
+        etag = client.get("/api/session/abc").headers["etag"]
+        resp = client.get("/api/session/abc", headers={"If-None-Match": header.format(etag=etag)})
+        assert resp.status_code == 304
+
+    def test_if_none_match_other_tags(self, client):
+        resp = client.get("/api/session/abc", headers={"If-None-Match": '"abc.99", W/"x"'})
+        assert resp.status_code == 200
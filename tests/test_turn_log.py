@@ -0,0 +1,94 @@
+"""Tests for server/turn_log.py background turn-log writer."""
+import gzip
+import time
+
+from server.turn_log import TurnLogWriter
+
+
+class TestTurnLogWriter:
+
+    def test_batches_land_per_session(self, tmp_path):
+        log = TurnLogWriter(tmp_path, flush_interval=0.05)
+        for i in range(20):
+            log.write("abc", {"turn": i})
+            log.write("def", {"turn": i})
+        assert log.flush()
+        assert [t["turn"] for t in log.read("abc")] == list(range(20))
+        assert (tmp_path / "def.jsonl").read_text().count("\n") == 20
+        log.close()
+
+    def test_write_does_not_touch_disk_inline(self, tmp_path):
+        log = TurnLogWriter(tmp_path, flush_interval=10)
+        log.write("abc", {"turn": 1})
+        # Flushed on the writer thread, not by write() itself
+        log.flush()
+        assert log.read("abc") == [{"turn": 1}]
+        log.close()
+
+    def test_size_rotation_compresses_and_reads_in_order(self, tmp_path):
+        log = TurnLogWriter(tmp_path, max_bytes=200, flush_interval=0.05)
+        for i in range(30):
+            log.write("abc", {"turn": i, "text": "x" * 20})
+            log.flush()
+        segments = sorted(tmp_path.glob("abc.jsonl.*.gz"))
+        assert len(segments) >= 2
+        with gzip.open(segments[0], "rt") as f:
+            assert '"turn": 0' in f.readline()
+        assert [t["turn"] for t in log.read("abc")] == list(range(30))
+        listed = log.list_sessions()
+        assert [e["session_id"] for e in listed] == ["abc"]
+        log.close()
+
+    def test_idle_rotation_uncompressed(self, tmp_path):
+        log = TurnLogWriter(tmp_path, rotate_idle_seconds=0.1, compress=False, flush_interval=0.05)
+        log.write("abc", {"turn": 1})
+        log.flush()
+        deadline = time.time() + 5
+        while (tmp_path / "abc.jsonl").exists() and time.time() < deadline:
+            time.sleep(0.05)
+        assert (tmp_path / "abc.jsonl.1").exists()
+        log.write("abc", {"turn": 2})
+        assert [t["turn"] for t in log.read("abc")] == [1, 2]
+        log.close()
+
+    def test_missing_session(self, tmp_path):
+        assert TurnLogWriter(tmp_path).read("nope") is None
+
+    def test_full_queue_drops_instead_of_blocking(self, tmp_path):
+        log = TurnLogWriter(tmp_path, max_queue=1, flush_interval=10)
+        log._ensure_started = lambda: None  # no consumer
+        log.write("abc", {"turn": 1})
+        log.write("abc", {"turn": 2})
+        assert log.dropped == 1
+
+
+class TestSharedLogDir:
+    """Two writers on one directory stand in for two workers."""
+
+    def test_rotation_waits_for_other_workers(self, tmp_path):
+        a = TurnLogWriter(tmp_path, flush_interval=0.05)
+        b = TurnLogWriter(tmp_path, flush_interval=0.05)
+        with a._dir_lock(exclusive=True):
+            b.write("abc", {"turn": 1})
+            assert not b.flush(timeout=0.3)   # append blocked while a rotates
+        assert b.flush()
+        assert a.read("abc") == [{"turn": 1}]
+        a.close()
+        b.close()
+
+    def test_idle_rotation_skips_file_another_worker_writes(self, tmp_path):
+        a = TurnLogWriter(tmp_path, compress=False, flush_interval=0.05)
+        b = TurnLogWriter(tmp_path, compress=False, flush_interval=0.05)
+        b.write("abc", {"turn": 1})
+        b.flush()
+        a.write("abc", {"turn": 2})
+        a.flush()
+        b._last_write["abc"] -= 7200   # idle as far as b knows
+        b._rotate_idle(time.time())
+        assert (tmp_path / "abc.jsonl").exists() and not (tmp_path / "abc.jsonl.1").exists()
+        assert "abc" not in b._last_write
+        a._rotate_idle(time.time() + 7200)
+        assert (tmp_path / "abc.jsonl.1").exists()
+        assert [t["turn"] for t in b.read("abc")] == [1, 2]
+        a.close()
+        b.close()